@@ -0,0 +1,255 @@
+import os
+import math
+import time
+import asyncio
+import functools
+from fastapi import HTTPException
+from starlette.background import BackgroundTask
+from starlette.responses import StreamingResponse
+from metrics import registry
+
+# --- ADMISSION CONTROL ---
+# Expensive endpoints (chat, research, transcribe) take a Ticket before doing
+# any upstream work:
+#   1. a slot of the caller's per-uid semaphore (one user can't hog the app)
+#   2. a slot of the endpoint's global semaphore (bounds total upstream load)
+#   3. a check that the bucket of every upstream the endpoint calls (Gemini,
+#      Groq, Tavily, YouTube) isn't backed up past the admission deadline
+# Each step may wait, but the whole admission is bounded by ADMIT_QUEUE_SECONDS.
+# After that the request fails fast with 429 and a Retry-After header.
+# Streams keep their ticket until the last byte is sent; ingest jobs keep it
+# until the job finishes.
+#
+# Tokens are charged per upstream call, not per request: every call site
+# (chat, research queries and searches, YouTube fetches, background summaries
+# and embeddings) awaits take_token(upstream) right before calling out, so a
+# 200-video batch costs 200 YouTube tokens. Background work waits for its
+# token instead of failing.
+#
+# Queue depth, in-flight counts, wait time and rejections are in /metrics.
+
+ADMIT_QUEUE_SECONDS = float(os.getenv("ADMIT_QUEUE_SECONDS", 2))
+
+
+def _limit(name, default):
+    return int(os.getenv(name, default))
+
+
+def _rate(name, default):
+    # "rate/burst", e.g. "5/10" = 5 requests per second, bursts of 10
+    rate, _, burst = os.getenv(name, default).partition("/")
+    return float(rate), float(burst or rate)
+
+
+# endpoint -> per-uid concurrency, global concurrency, upstreams it calls
+ENDPOINTS = {
+    "chat": (_limit("ADMIT_CHAT_PER_USER", 2), _limit("ADMIT_CHAT_GLOBAL", 32), ("gemini",)),
+    "research": (_limit("ADMIT_RESEARCH_PER_USER", 1), _limit("ADMIT_RESEARCH_GLOBAL", 8), ("groq", "tavily")),
+    "transcribe": (_limit("ADMIT_TRANSCRIBE_PER_USER", 4), _limit("ADMIT_TRANSCRIBE_GLOBAL", 64), ("youtube",)),
+}
+UPSTREAM_RATES = {
+    "gemini": _rate("RATE_GEMINI", "10/20"),
+    "groq": _rate("RATE_GROQ", "2/5"),
+    "tavily": _rate("RATE_TAVILY", "2/5"),
+    "youtube": _rate("RATE_YOUTUBE", "5/10"),
+}
+
+admission_waiting = registry.gauge(
+    "admission_queue_depth", "Requests waiting for admission.", labels=("endpoint",))
+admission_in_flight = registry.gauge(
+    "admission_in_flight", "Admitted requests still running.", labels=("endpoint",))
+admission_wait = registry.histogram(
+    "admission_wait_seconds", "Time spent waiting for admission (admitted requests).", labels=("endpoint",))
+upstream_token_wait = registry.histogram(
+    "upstream_token_wait_seconds", "Time an upstream call waited for its rate limit token.", labels=("upstream",))
+admission_rejected = registry.counter(
+    "admission_rejected_total", "Requests refused with 429.", labels=("endpoint", "reason"))
+
+
+class TooBusy(HTTPException):
+    def __init__(self, retry_after, reason):
+        retry_after = max(1, math.ceil(retry_after))
+        super().__init__(status_code=429, detail=f"Too many requests ({reason}), retry in {retry_after}s",
+                         headers={"Retry-After": str(retry_after)})
+
+
+class RateLimit:
+    # Token bucket that hands out reservations: a caller may take a token that
+    # only becomes available in the future (tokens go negative) and sleeps until
+    # then, which keeps callers in FIFO order without a lock.
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, max_wait=math.inf):
+        # -> seconds to wait before going ahead, or None if that exceeds max_wait
+        self._refill()
+        wait = max(0.0, (1 - self.tokens) / self.rate)
+        if wait > max_wait:
+            return None
+        self.tokens -= 1
+        return wait
+
+    def refund(self):
+        self.tokens += 1
+
+    def retry_after(self):
+        # Seconds until a token is free (how far the reservations are backed up)
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    async def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # The call never happens, so the token goes back
+                self.refund()
+                raise
+
+
+class Ticket:
+    def __init__(self, controller, endpoint, uid):
+        self.controller = controller
+        self.endpoint = endpoint
+        self.uid = uid
+        self.released = False
+
+    def release(self):
+        # Idempotent: streams release from both the generator and a background task
+        if not self.released:
+            self.released = True
+            self.controller._release(self.endpoint, self.uid)
+
+
+class AdmissionController:
+    def __init__(self):
+        self.global_slots = {}
+        self.user_slots = {}  # (endpoint, uid) -> [semaphore, holders + waiters]
+        self.limits = {name: RateLimit(rate, burst) for name, (rate, burst) in UPSTREAM_RATES.items()}
+
+    async def admit(self, endpoint, uid):
+        per_user, global_limit, upstreams = ENDPOINTS[endpoint]
+        deadline = time.monotonic() + ADMIT_QUEUE_SECONDS
+        started = time.monotonic()
+
+        user = self.user_slots.setdefault((endpoint, uid), [asyncio.Semaphore(per_user), 0])
+        user[1] += 1
+        everyone = self.global_slots.setdefault(endpoint, asyncio.Semaphore(global_limit))
+        admission_waiting.add(endpoint)
+        held = []
+        try:
+            for semaphore, reason in ((user[0], "user"), (everyone, "global")):
+                try:
+                    await asyncio.wait_for(semaphore.acquire(), timeout=max(0.0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    admission_rejected.inc(endpoint, reason)
+                    raise TooBusy(ADMIT_QUEUE_SECONDS, f"{reason} concurrency limit")
+                held.append(semaphore)
+
+            # Fail fast if an upstream is already booked past our deadline;
+            # the calls themselves take their tokens (take_token)
+            for name in upstreams:
+                backlog = self.limits[name].retry_after()
+                if backlog > max(0.0, deadline - time.monotonic()):
+                    admission_rejected.inc(endpoint, name)
+                    raise TooBusy(backlog, f"{name} rate limit")
+        except BaseException:
+            for semaphore in held:
+                semaphore.release()
+            self._leave(endpoint, uid, user)
+            raise
+        finally:
+            admission_waiting.add(endpoint, amount=-1)
+
+        admission_wait.observe(time.monotonic() - started, endpoint)
+        admission_in_flight.add(endpoint)
+        return Ticket(self, endpoint, uid)
+
+    def _release(self, endpoint, uid):
+        user = self.user_slots.get((endpoint, uid))
+        self.global_slots[endpoint].release()
+        admission_in_flight.add(endpoint, amount=-1)
+        if user is not None:
+            user[0].release()
+            self._leave(endpoint, uid, user)
+
+    def _leave(self, endpoint, uid, user):
+        # Drop idle per-user entries so the dict doesn't grow with every uid ever seen
+        user[1] -= 1
+        if user[1] <= 0 and self.user_slots.get((endpoint, uid)) is user:
+            del self.user_slots[(endpoint, uid)]
+
+
+async def take_token(upstream):
+    # One token from `upstream`'s bucket, waiting as long as the bucket needs
+    started = time.monotonic()
+    await admission.limits[upstream].acquire()
+    upstream_token_wait.observe(time.monotonic() - started, upstream)
+
+
+def hold(ticket, body):
+    # Wrap a streaming body so the ticket is released when the stream ends
+    async def wrapped():
+        try:
+            async for item in body:
+                yield item
+        finally:
+            ticket.release()
+    return wrapped()
+
+
+def holding(ticket, fn):
+    # Wrap a job function so the ticket is released when the job ends
+    async def run(job):
+        try:
+            return await fn(job)
+        finally:
+            ticket.release()
+    return run
+
+
+def caller(kwargs):
+    # uid path param, else "uid" in the JSON body. No uid is a 400, not a
+    # shared bucket: limits are per user, and client addresses are shared by
+    # whole classrooms behind one NAT.
+    payload = kwargs.get("payload") or {}
+    uid = kwargs.get("uid") or payload.get("uid")
+    if not uid:
+        raise HTTPException(status_code=400, detail="uid is required")
+    return uid
+
+
+def admitted(endpoint):
+    # Route decorator: admit before the handler runs, keep the ticket for as
+    # long as a streamed response is being sent
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            ticket = await admission.admit(endpoint, caller(kwargs))
+            try:
+                response = await fn(*args, **kwargs)
+            except BaseException:
+                ticket.release()
+                raise
+            if isinstance(response, StreamingResponse):
+                response.body_iterator = hold(ticket, response.body_iterator)
+                # Also covers a client that leaves before the stream starts
+                if response.background is None:
+                    response.background = BackgroundTask(ticket.release)
+            else:
+                ticket.release()
+            return response
+        return wrapper
+    return decorate
+
+
+admission = AdmissionController()
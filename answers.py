@@ -0,0 +1,99 @@
+import os
+import re
+import hashlib
+from cache import LRUCache
+from metrics import registry
+
+# --- CHAT ANSWER CACHE ---
+# Students on the same course ask the same questions about the same videos.
+# A finished chat answer is kept under (content hash of the selected
+# transcripts, normalized question), so the same question over the same
+# transcripts is replayed instead of sent to Gemini again. The key covers
+# transcript content, not source ids: when a selection or transcript changes
+# the key changes, and the old entries simply expire (TTL / LRU).
+#
+# With CHAT_CACHE_SIMILARITY > 0, a near-duplicate question (word-set Jaccard
+# at or above the threshold) over the same transcripts is a hit too.
+#
+# Short questions ("and the second one?") depend on the conversation, not just
+# the transcripts, so they're never cached (CHAT_CACHE_MIN_WORDS).
+#
+# Entries are shared across users and projects, so chat only stores and looks
+# up answers for conversations with no history and no summary yet: a cached
+# answer never comes from a prompt that held someone's conversation.
+
+CHAT_CACHE_TTL = int(os.getenv("CHAT_CACHE_TTL", 3600))
+CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", 2000))
+CHAT_CACHE_SIMILARITY = float(os.getenv("CHAT_CACHE_SIMILARITY", 0))
+CHAT_CACHE_MIN_WORDS = int(os.getenv("CHAT_CACHE_MIN_WORDS", 4))
+SIMILARITY_CANDIDATES = 50  # recent questions compared per transcript selection
+REPLAY_CHARS = 80  # size of the SSE text events a cached answer is replayed in
+
+chat_cache_lookups = registry.counter(
+    "chat_answer_cache_total", "Chat answer cache lookups.", labels=("result",))
+
+
+def normalize(question):
+    return " ".join(re.findall(r"\w+", (question or "").lower()))
+
+
+def sources_key(digests):
+    # Order of the selection doesn't matter
+    return hashlib.sha1("\n".join(sorted(digests)).encode("utf-8")).hexdigest()
+
+
+def replay_pieces(text, size=REPLAY_CHARS):
+    # Same `data: {"text": ...}` events as a live answer, just pre-written
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def _jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class AnswerCache:
+    def __init__(self):
+        self.answers = LRUCache(maxsize=CHAT_CACHE_SIZE, ttl=CHAT_CACHE_TTL)
+        self.recent = LRUCache(maxsize=CHAT_CACHE_SIZE, ttl=CHAT_CACHE_TTL)  # sources key -> [questions]
+
+    def cacheable(self, question):
+        return len(normalize(question).split()) >= CHAT_CACHE_MIN_WORDS
+
+    def get(self, digests, question):
+        # -> {"text", "citations"} or None
+        if not self.cacheable(question):
+            return None
+        key, normalized = sources_key(digests), normalize(question)
+        answer = self.answers.get((key, normalized))
+        if answer is None and CHAT_CACHE_SIMILARITY > 0:
+            words = set(normalized.split())
+            best, best_score = None, CHAT_CACHE_SIMILARITY
+            for candidate in self.recent.get(key) or []:
+                score = _jaccard(words, set(candidate.split()))
+                if score >= best_score:
+                    best, best_score = candidate, score
+            if best is not None:
+                answer = self.answers.get((key, best))
+        chat_cache_lookups.inc("hit" if answer is not None else "miss")
+        return answer
+
+    def set(self, digests, question, text, citations):
+        if not self.cacheable(question) or not text:
+            return
+        key, normalized = sources_key(digests), normalize(question)
+        self.answers.set((key, normalized), {"text": text, "citations": citations})
+        if CHAT_CACHE_SIMILARITY > 0:
+            questions = [q for q in self.recent.get(key) or [] if q != normalized]
+            self.recent.set(key, [normalized] + questions[:SIMILARITY_CANDIDATES - 1])
+
+    def clear(self):
+        self.answers.clear()
+        self.recent.clear()
+
+    def stats(self):
+        return {"answers": self.answers.stats(), "similarity": CHAT_CACHE_SIMILARITY}
+
+
+answer_cache = AnswerCache()
@@ -0,0 +1,144 @@
+import os
+import sys
+import gzip
+import hashlib
+import mimetypes
+from starlette.datastructures import Headers
+from starlette.staticfiles import StaticFiles
+
+# --- STATIC ASSETS ---
+# Templates link assets through `asset_url("css/dashboard.css")`, which returns
+# a content-hashed URL (/static/css/dashboard.3f2a9c1be0d4.css). Hashed URLs
+# never change meaning, so they're served with a one-year `immutable` cache;
+# plain /static/... URLs still work but must revalidate (ETag / 304).
+#
+# `python assets.py` precompresses text assets next to the originals
+# (x.css.gz, and x.css.br when the optional `brotli` package is installed).
+# AssetFiles then serves the best variant the client accepts. Byte ranges (the
+# mascot videos) are handled by Starlette's FileResponse; compressed variants
+# are skipped for Range requests so offsets always refer to the original file.
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+STATIC_URL = "/static"
+ASSET_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE = (".css", ".js", ".svg", ".html", ".json", ".txt", ".map")
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+HASH_CHARS = 12
+
+
+def fingerprinted(path, digest):
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{digest[:HASH_CHARS]}{ext}"
+
+
+class AssetManifest:
+    def __init__(self, directory=STATIC_DIR):
+        self.directory = directory
+        self.urls = {}      # "css/dashboard.css" -> "css/dashboard.3f2a9c1be0d4.css"
+        self.originals = {}  # reverse of urls
+        self.variants = set()  # precompressed files that exist, e.g. "css/dashboard.css.gz"
+        self.scan()
+
+    def scan(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                full = os.path.join(root, name)
+                path = os.path.relpath(full, self.directory).replace(os.sep, "/")
+                if path.endswith(tuple(ext for _, ext in ENCODINGS)):
+                    # Ignore variants older than their source (build not re-run)
+                    source = full.rsplit(".", 1)[0]
+                    if os.path.exists(source) and os.path.getmtime(full) >= os.path.getmtime(source):
+                        self.variants.add(path)
+                    continue
+                with open(full, "rb") as f:
+                    digest = hashlib.sha256(f.read()).hexdigest()
+                self.urls[path] = fingerprinted(path, digest)
+                self.originals[self.urls[path]] = path
+
+    def url(self, path):
+        path = path.lstrip("/")
+        # Unknown files fall back to the plain URL rather than breaking the page
+        return f"{STATIC_URL}/{self.urls.get(path, path)}"
+
+
+def accepted_encodings(header):
+    accepted = set()
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class AssetFiles(StaticFiles):
+    def __init__(self, manifest, **kwargs):
+        super().__init__(directory=manifest.directory, **kwargs)
+        self.manifest = manifest
+
+    async def get_response(self, path, scope):
+        original = self.manifest.originals.get(path)
+        path = original or path
+        headers = Headers(scope=scope)
+
+        response = None
+        if path.endswith(COMPRESSIBLE) and "range" not in headers:
+            accepted = accepted_encodings(headers.get("accept-encoding", ""))
+            for coding, ext in ENCODINGS:
+                if coding in accepted and path + ext in self.manifest.variants:
+                    response = await super().get_response(path + ext, scope)
+                    response.headers["Content-Encoding"] = coding
+                    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+                    if media_type.startswith("text/"):
+                        media_type += "; charset=utf-8"
+                    response.headers["Content-Type"] = media_type
+                    break
+        if response is None:
+            response = await super().get_response(path, scope)
+
+        if path.endswith(COMPRESSIBLE):
+            response.headers["Vary"] = "Accept-Encoding"
+        if original is not None:
+            response.headers["Cache-Control"] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+        else:
+            response.headers["Cache-Control"] = "public, max-age=0, must-revalidate"
+        return response
+
+
+def build(directory=STATIC_DIR):
+    # Writes .gz (and .br if `brotli` is installed) next to each text asset
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+        print("⚠️ [ASSETS] brotli not installed, writing gzip variants only")
+
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(COMPRESSIBLE):
+                continue
+            full = os.path.join(root, name)
+            with open(full, "rb") as f:
+                data = f.read()
+            outputs = [(".gz", lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                outputs.append((".br", lambda d: brotli.compress(d, quality=11)))
+            for ext, compress in outputs:
+                target = full + ext
+                if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(full):
+                    continue
+                compressed = compress(data)
+                # Not worth a variant if it doesn't save anything
+                if len(compressed) >= len(data):
+                    if os.path.exists(target):
+                        os.remove(target)
+                    continue
+                with open(target, "wb") as f:
+                    f.write(compressed)
+                written += 1
+    print(f"✅ [ASSETS] Wrote {written} precompressed files")
+    return written
+
+
+if __name__ == "__main__":
+    build(sys.argv[1] if len(sys.argv) > 1 else STATIC_DIR)
@@ -0,0 +1,123 @@
+import time
+import random
+import asyncio
+from types import SimpleNamespace
+from store import MemoryBackend
+from transcripts import Transcript
+
+# --- FAKE UPSTREAMS ---
+# Local stand-ins with configurable latency, shaped like the SDK objects main.py
+# uses, so the real endpoints run unchanged. Latencies are in seconds; each call
+# gets +/- `jitter` (fraction) of random noise so percentiles aren't degenerate.
+
+
+def _delay(seconds, jitter):
+    return max(0.0, seconds * (1 + random.uniform(-jitter, jitter)))
+
+
+class SlowMemoryBackend:
+    # Firestore stand-in: the in-memory backend plus a blocking per-call delay
+    # (it runs on the store's thread pool, like the real SDK)
+    CALLS = ("get", "set", "update", "delete", "stream", "commit", "transaction")
+
+    def __init__(self, latency=0.01, jitter=0.2):
+        self.inner = MemoryBackend()
+        self.latency = latency
+        self.jitter = jitter
+
+    def __getattr__(self, name):
+        attr = getattr(self.inner, name)
+        if name not in self.CALLS:
+            return attr
+
+        def call(*args, **kwargs):
+            time.sleep(_delay(self.latency, self.jitter))
+            return attr(*args, **kwargs)
+        return call
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGemini:
+    # Mimics client.aio.models.{generate_content_stream, generate_content, embed_content}
+    def __init__(self, first_token=0.3, per_token=0.02, tokens=40, jitter=0.2):
+        self.first_token = first_token
+        self.per_token = per_token
+        self.tokens = tokens
+        self.jitter = jitter
+        self.aio = SimpleNamespace(models=SimpleNamespace(
+            generate_content_stream=self.generate_content_stream,
+            generate_content=self.generate_content,
+            embed_content=self.embed_content,
+        ))
+
+    async def generate_content_stream(self, model, contents):
+        async def stream():
+            await asyncio.sleep(_delay(self.first_token, self.jitter))
+            for i in range(self.tokens):
+                if i:
+                    await asyncio.sleep(_delay(self.per_token, self.jitter))
+                yield _Chunk(f"token{i} ")
+        return stream()
+
+    async def generate_content(self, model, contents):
+        await asyncio.sleep(_delay(self.first_token + self.per_token * self.tokens, self.jitter))
+        return SimpleNamespace(text="Summary of the conversation so far.")
+
+    async def embed_content(self, model, contents):
+        await asyncio.sleep(_delay(self.first_token, self.jitter))
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=[random.random() for _ in range(8)]) for _ in contents])
+
+
+class FakeGroq:
+    # Mimics AsyncGroq().chat.completions.create
+    def __init__(self, latency=0.4, jitter=0.2):
+        self.latency = latency
+        self.jitter = jitter
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages, **kwargs):
+        await asyncio.sleep(_delay(self.latency, self.jitter))
+        text = "\n".join(f"angle {i} {random.random():.6f}" for i in range(3))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+class FakeTavily:
+    # Mimics AsyncTavilyClient().search
+    def __init__(self, latency=0.6, jitter=0.2):
+        self.latency = latency
+        self.jitter = jitter
+
+    async def search(self, query, search_depth="basic", max_results=3):
+        await asyncio.sleep(_delay(self.latency, self.jitter))
+        slug = abs(hash(query)) % 10_000
+        return {"results": [
+            {"url": f"https://example.com/{slug}/{i}", "title": f"{query} #{i}", "content": "...", "score": random.random()}
+            for i in range(max_results)
+        ]}
+
+
+class FakeYouTube:
+    # Replaces videos.get_video_title / videos.fetch_transcript (blocking, run in threads)
+    def __init__(self, title_latency=0.5, transcript_latency=1.0, transcript_words=3000, jitter=0.2):
+        self.title_latency = title_latency
+        self.transcript_latency = transcript_latency
+        self.transcript_words = transcript_words
+        self.jitter = jitter
+
+    def get_video_title(self, url):
+        time.sleep(_delay(self.title_latency, self.jitter))
+        return f"Benchmark video {url[-11:]}"
+
+    def fetch_transcript(self, video_id):
+        time.sleep(_delay(self.transcript_latency, self.jitter))
+        words = ("lecture", "gradient", "entropy", "theorem", "example", "proof", "model", "data")
+        # Snippets of ~8 words, ~3s each, like real captions
+        snippets = []
+        for n in range(0, self.transcript_words, 8):
+            text = " ".join(random.choice(words) for _ in range(min(8, self.transcript_words - n)))
+            snippets.append({"text": text, "start": n / 8 * 3.0, "duration": 3.0})
+        return Transcript.from_snippets(snippets)
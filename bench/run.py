@@ -0,0 +1,279 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from datetime import datetime, timezone
+
+# Before importing the app: no background warm-up of the real SDKs, and only
+# warnings from the app's logs so they don't drown the report
+os.environ.setdefault("STARTUP_WARMUP", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# Admission limits high enough that the bench measures the app, not the 429s
+for name in ("ADMIT_CHAT", "ADMIT_RESEARCH", "ADMIT_TRANSCRIBE"):
+    os.environ.setdefault(f"{name}_PER_USER", "1000")
+    os.environ.setdefault(f"{name}_GLOBAL", "1000")
+for name in ("RATE_GEMINI", "RATE_GROQ", "RATE_TAVILY", "RATE_YOUTUBE"):
+    os.environ.setdefault(name, "100000/100000")
+
+import main  # noqa: E402
+import videos  # noqa: E402
+from store import store  # noqa: E402
+from bench.fakes import SlowMemoryBackend, FakeGemini, FakeGroq, FakeTavily, FakeYouTube  # noqa: E402
+
+# --- OFFLINE BENCHMARK ---
+# Drives the real FastAPI app in-process (straight through ASGI, no sockets)
+# with every upstream replaced by a fake from bench/fakes.py, then reports
+# p50/p95/p99 latency, requests/second and chat time-to-first-token per
+# scenario. Results are written as JSON; pass --baseline to compare runs.
+#
+#   python -m bench.run --requests 200 --concurrency 20 --out bench/results/latest.json
+#   python -m bench.run --baseline bench/results/baseline.json
+
+SCENARIOS = ("create_project", "list_projects", "get_project", "transcribe", "chat", "research")
+USERS = 10
+
+
+# --- ASGI CLIENT ---
+# httpx's ASGITransport buffers the whole body, which would hide TTFT, so
+# requests go through this small driver that timestamps every body chunk.
+async def request(method, path, body=None):
+    payload = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "client": ("bench", 0), "server": ("bench", 80),
+        "headers": [(b"host", b"bench"), (b"content-type", b"application/json"),
+                    (b"content-length", str(len(payload)).encode())],
+    }
+    sent = False
+    finished = asyncio.Event()
+    response = {"status": None, "chunks": []}
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            if message.get("body"):
+                response["chunks"].append((time.perf_counter(), message["body"]))
+            if not message.get("more_body"):
+                finished.set()
+
+    await main.app(scope, receive, send)
+    finished.set()
+    response["body"] = b"".join(chunk for _, chunk in response["chunks"])
+    return response
+
+
+def check(response):
+    if response["status"] >= 400:
+        raise RuntimeError(f"HTTP {response['status']}: {response['body'][:200]!r}")
+    return response
+
+
+# --- SCENARIOS ---
+# Each returns extra per-request measurements (e.g. ttft) or None.
+class Bench:
+    def __init__(self):
+        self.projects = {}  # uid -> (project_id, source_id)
+        self.counter = 0
+
+    def next_video_id(self):
+        self.counter += 1
+        return f"bench{self.counter:06d}"
+
+    def pick(self):
+        uid = random.choice(list(self.projects))
+        return uid, *self.projects[uid]
+
+    async def ingest(self, uid, project_id):
+        video_id = self.next_video_id()
+        queued = json.loads(check(await request("POST", f"/api/{uid}/projects/{project_id}/transcribe",
+                                                {"url": f"https://www.youtube.com/watch?v={video_id}"}))["body"])
+        while True:
+            job = json.loads(check(await request("GET", f"/api/{uid}/jobs/{queued['job_id']}"))["body"])
+            if job["status"] == "done":
+                return video_id
+            if job["status"] == "failed":
+                raise RuntimeError(job["error"])
+            await asyncio.sleep(0.02)
+
+    async def setup(self):
+        for n in range(USERS):
+            uid = f"bench-user-{n}"
+            project = json.loads(check(await request("POST", f"/api/{uid}/projects", {"name": f"Bench {n}"}))["body"])
+            self.projects[uid] = (project["id"], await self.ingest(uid, project["id"]))
+
+    async def create_project(self):
+        uid, _, _ = self.pick()
+        check(await request("POST", f"/api/{uid}/projects", {"name": "Bench extra"}))
+
+    async def list_projects(self):
+        uid, _, _ = self.pick()
+        check(await request("GET", f"/api/{uid}/projects/list"))
+
+    async def get_project(self):
+        uid, project_id, _ = self.pick()
+        check(await request("GET", f"/api/{uid}/projects/{project_id}"))
+
+    async def transcribe(self):
+        uid, project_id, _ = self.pick()
+        await self.ingest(uid, project_id)
+
+    async def chat(self):
+        uid, project_id, source_id = self.pick()
+        # Fresh question each time, otherwise every chat after the first is an answer cache hit
+        question = f"Explain the main theorem with example {random.randrange(10**9)}"
+        started = time.perf_counter()
+        response = check(await request("POST", f"/api/{uid}/projects/{project_id}/chat",
+                                       {"message": question, "selectedIds": [source_id]}))
+        first = next((at for at, chunk in response["chunks"] if b'"text"' in chunk), None)
+        return {"ttft": first - started} if first else None
+
+    async def research(self):
+        # Fresh text each time so the research caches don't turn this into a cache benchmark
+        uid, _, _ = self.pick()
+        text = f"lecture {random.random()} gradient entropy theorem"
+        check(await request("POST", "/api/research/agent", {"uid": uid, "text": text, "stream": True}))
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered) + 0.5) - 1))
+    return round(ordered[rank], 4)
+
+
+def summarize(latencies, errors, wall, extra):
+    summary = {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "rps": round(len(latencies) / wall, 2) if wall else None,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
+    ttfts = [e["ttft"] for e in extra if e and "ttft" in e]
+    if ttfts:
+        summary["ttft_p50"] = percentile(ttfts, 50)
+        summary["ttft_p95"] = percentile(ttfts, 95)
+        summary["ttft_p99"] = percentile(ttfts, 99)
+    return summary
+
+
+async def run_scenario(fn, total, concurrency):
+    latencies, extra, errors = [], [], 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                result = await fn()
+            except Exception as e:
+                errors += 1
+                print(f"⚠️ [BENCH] {fn.__name__} failed: {e}", file=sys.stderr)
+                continue
+            latencies.append(time.perf_counter() - started)
+            extra.append(result)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return summarize(latencies, errors, time.perf_counter() - started, extra)
+
+
+def install_fakes(scale):
+    # `scale` multiplies every fake latency (0 = as fast as the app itself allows)
+    store.factory = lambda: SlowMemoryBackend(latency=0.01 * scale)
+    youtube = FakeYouTube(title_latency=0.5 * scale, transcript_latency=1.0 * scale)
+    videos.get_video_title = youtube.get_video_title
+    videos.fetch_transcript = youtube.fetch_transcript
+    main.ai_client = FakeGemini(first_token=0.3 * scale, per_token=0.02 * scale)
+    main.groq_client = FakeGroq(latency=0.4 * scale)
+    main.tavily_client = FakeTavily(latency=0.6 * scale)
+
+
+async def run(args):
+    bench = Bench()
+    results = {}
+    async with main.app.router.lifespan_context(main.app):
+        await bench.setup()
+        for name in args.scenarios:
+            results[name] = await run_scenario(getattr(bench, name), args.requests, args.concurrency)
+            print(f"📊 [BENCH] {name}: {results[name]}")
+    return results
+
+
+def compare(results, baseline, max_regression):
+    # Higher latency or lower throughput than baseline by more than max_regression fails
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        for key in ("p50", "p95", "p99", "ttft_p95"):
+            if current.get(key) and base.get(key) and current[key] > base[key] * (1 + max_regression):
+                regressions.append(f"{name}.{key}: {base[key]} -> {current[key]}")
+        if current.get("rps") and base.get("rps") and current["rps"] < base["rps"] * (1 - max_regression):
+            regressions.append(f"{name}.rps: {base['rps']} -> {current['rps']}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline Cherseta benchmark with fake upstreams")
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--scenarios", type=lambda s: s.split(","), default=list(SCENARIOS))
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for every fake upstream latency")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="bench/results/latest.json")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.15)
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+def cli(argv=None):
+    args = parse_args(argv)
+    random.seed(args.seed)
+    install_fakes(args.scale)
+
+    results = asyncio.run(run(args))
+
+    report = {
+        "at": datetime.now(timezone.utc).isoformat(),
+        "config": {k: getattr(args, k) for k in ("requests", "concurrency", "scale", "seed")},
+        "scenarios": results,
+    }
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 [BENCH] Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        if regressions:
+            print("❌ [BENCH] Regressions vs baseline:\n  " + "\n  ".join(regressions))
+            return 1
+        print("✅ [BENCH] No regressions vs baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,112 @@
+import hashlib
+from cache import LRUCache, SingleFlight
+from store import store, project_path, SERVER_TIMESTAMP
+from research import normalize_url
+
+# --- BOOKMARKS ---
+# Each bookmark's document id is derived from its normalized URL, so toggling
+# is one keyed read+write in a transaction (no `where("url", ...)` query) and
+# two fast clicks can't create duplicates. Bulk import/export uses batched
+# writes of up to BOOKMARK_BATCH documents.
+#
+# Bookmarks saved before keyed ids (random ids, maybe duplicates), or under an
+# older URL normalization, are re-keyed by migrate() before the first toggle or
+# import on a project in this process. Listing never writes: it shows such
+# docs once per URL until then.
+
+BOOKMARK_BATCH = 400
+BOOKMARK_MIGRATED_CACHE = 4096  # projects this process has already migrated
+
+_migrated = LRUCache(maxsize=BOOKMARK_MIGRATED_CACHE)
+_flights = SingleFlight()
+
+
+def bookmarks_path(uid, project_id):
+    return f"{project_path(uid, project_id)}/bookmarks"
+
+
+def bookmark_id(url):
+    return hashlib.sha1(normalize_url(url).encode("utf-8")).hexdigest()
+
+
+async def toggle(uid, project_id, url, title):
+    await migrate(uid, project_id)
+    path = f"{bookmarks_path(uid, project_id)}/{bookmark_id(url)}"
+
+    def flip(txn):
+        if txn.get(path) is not None:
+            txn.delete(path)
+            return "removed"
+        txn.set(path, {"url": url, "title": title, "timestamp": SERVER_TIMESTAMP})
+        return "added"
+
+    return await store.transaction(flip)
+
+
+async def list_bookmarks(uid, project_id):
+    docs = await store.stream(bookmarks_path(uid, project_id))
+    # One entry per URL; the keyed doc wins over unmigrated copies
+    listed = {}
+    for doc_id, d in docs:
+        key = bookmark_id(d["url"]) if d.get("url") else doc_id
+        if key not in listed or doc_id == key:
+            listed[key] = {"id": doc_id, **d}
+    return list(listed.values())
+
+
+async def migrate(uid, project_id):
+    # Move legacy docs onto their keyed id, once per project per process
+    if _migrated.get((uid, project_id)):
+        return
+    await _flights.do(("migrate", uid, project_id), lambda: _migrate(uid, project_id))
+    _migrated.set((uid, project_id), True)
+
+
+async def _migrate(uid, project_id):
+    collection = bookmarks_path(uid, project_id)
+    docs = await store.stream(collection)
+    legacy = [(doc_id, d) for doc_id, d in docs if d.get("url") and doc_id != bookmark_id(d["url"])]
+    if legacy:
+        keyed = {doc_id for doc_id, _ in docs}
+        ops = []
+        for doc_id, d in legacy:
+            key = bookmark_id(d["url"])
+            if key not in keyed:
+                ops.append(("set", f"{collection}/{key}", d))
+                keyed.add(key)
+            ops.append(("delete", f"{collection}/{doc_id}", None))
+        # A doc's set and delete may land in different batches; the set always
+        # comes first, so a failure part-way leaves a duplicate, never a loss
+        for start in range(0, len(ops), BOOKMARK_BATCH):
+            batch = store.batch()
+            for op, path, data in ops[start:start + BOOKMARK_BATCH]:
+                if op == "set":
+                    batch.set(path, data)
+                else:
+                    batch.delete(path)
+            await batch.commit()
+
+
+async def import_bookmarks(uid, project_id, items):
+    await migrate(uid, project_id)
+    collection = bookmarks_path(uid, project_id)
+    unique = {}
+    for item in items:
+        # Either {"url", "title"} objects or bare URL strings; anything else is skipped
+        if isinstance(item, str):
+            item = {"url": item}
+        if not isinstance(item, dict):
+            continue
+        url = item.get("url")
+        if isinstance(url, str) and url.strip():
+            url = url.strip()
+            unique[bookmark_id(url)] = {"url": url, "title": item.get("title") or url, "timestamp": SERVER_TIMESTAMP}
+
+    keys = list(unique)
+    for start in range(0, len(keys), BOOKMARK_BATCH):
+        batch = store.batch()
+        for key in keys[start:start + BOOKMARK_BATCH]:
+            # merge: re-importing an existing link just refreshes its title
+            batch.set(f"{collection}/{key}", unique[key], merge=True)
+        await batch.commit()
+    return len(keys)
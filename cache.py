@@ -0,0 +1,94 @@
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+
+# --- SHARED IN-PROCESS CACHING HELPERS ---
+
+
+class LRUCache:
+    # `maxsize` is measured in whatever `sizeof` returns (1 per entry by default),
+    # so a transcript cache can be bounded by characters instead of entry count.
+    # With `ttl` (seconds) entries also expire; hits/misses are counted for stats.
+    def __init__(self, maxsize=1024, sizeof=None, ttl=None):
+        self.maxsize = maxsize
+        self.sizeof = sizeof or (lambda value: 1)
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is not None and entry[2] is not None and entry[2] < time.monotonic():
+                self.size -= self.data.pop(key)[1]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.data.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value):
+        weight = self.sizeof(value)
+        if weight > self.maxsize:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self.lock:
+            if key in self.data:
+                self.size -= self.data.pop(key)[1]
+            self.data[key] = (value, weight, expires_at)
+            self.size += weight
+            while self.size > self.maxsize:
+                _, (_, old_weight, _) = self.data.popitem(last=False)
+                self.size -= old_weight
+
+    def pop(self, key, default=None):
+        with self.lock:
+            if key not in self.data:
+                return default
+            value, weight, _ = self.data.pop(key)
+            self.size -= weight
+            return value
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.size = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.data),
+            "size": self.size,
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+
+class SingleFlight:
+    # Collapses concurrent calls for the same key into one in-flight task.
+    def __init__(self):
+        self.calls = {}
+
+    async def do(self, key, fn):
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self.calls[key] = task
+            task.add_done_callback(lambda _: self.calls.pop(key, None))
+        # shield: one waiter giving up must not cancel the fetch for the others
+        return await asyncio.shield(task)
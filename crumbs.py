@@ -0,0 +1,114 @@
+import os
+import asyncio
+from datetime import datetime, timezone
+from store import store, user_path, SERVER_TIMESTAMP
+from logs import get_logger
+
+log = get_logger("crumbs")
+
+# --- CRUMBS LEDGER (write-behind) ---
+# Awarding crumbs used to be one Firestore write per action, all hitting the
+# same user document. Now increments are added up in memory per uid and
+# flushed every CRUMBS_FLUSH_SECONDS (and once more at shutdown). Each flush is
+# one transaction per group of up to CRUMBS_FLUSH_BATCH users: read the docs,
+# apply the decay owed since `last_active`, add the pending crumbs, write back.
+# Crumbs being flushed stay counted (`in_flight`) until their group commits,
+# and go back to pending if it fails; shutdown lets a running flush finish.
+#
+# Decay is otherwise computed lazily at read time, so /api/users/{uid}/xp
+# never writes.
+
+CRUMBS_FLUSH_SECONDS = float(os.getenv("CRUMBS_FLUSH_SECONDS", 5))
+CRUMBS_FLUSH_BATCH = 400  # Firestore allows 500 writes per transaction
+DECAY_PER_HOUR = 5
+
+
+def decayed_crumbs(crumbs, last_active, now=None):
+    # --- CRUMBS DECAY LOGIC ---
+    if not last_active:
+        return crumbs
+
+    # 1. Parse the last active time
+    if isinstance(last_active, str):
+        last_time = datetime.fromisoformat(last_active)
+    else:
+        # If it's a Firestore Timestamp object
+        last_time = last_active
+
+    # 2. Calculate time passed in hours
+    now = now or datetime.now(timezone.utc)
+    hours_passed = (now - last_time).total_seconds() / 3600
+
+    # 3. Calculate decay (5 crumbs per hour)
+    decay = int(hours_passed * DECAY_PER_HOUR)
+    if decay <= 0:
+        return crumbs
+
+    # Subtract decay but allow it to hit 0 or slightly below for 'dead' state
+    return max(-1, crumbs - decay)
+
+
+class CrumbsLedger:
+    def __init__(self):
+        self.pending = {}
+        self.in_flight = {}  # taken by the running flush, not committed yet
+        self.lock = asyncio.Lock()  # one flush at a time
+        self.task = None
+
+    def add(self, uid, amount):
+        self.pending[uid] = self.pending.get(uid, 0) + amount
+
+    def pending_for(self, uid):
+        return self.pending.get(uid, 0) + self.in_flight.get(uid, 0)
+
+    async def flush(self):
+        async with self.lock:
+            if not self.pending:
+                return
+            self.in_flight, self.pending = self.pending, {}
+            uids = list(self.in_flight)
+            try:
+                for start in range(0, len(uids), CRUMBS_FLUSH_BATCH):
+                    group = {uid: self.in_flight[uid] for uid in uids[start:start + CRUMBS_FLUSH_BATCH]}
+                    try:
+                        await store.transaction(lambda txn, group=group: _apply(txn, group))
+                        log.info("✨ [XP] Flushed crumbs", users=len(group))
+                        for uid in group:
+                            del self.in_flight[uid]
+                    except Exception as e:
+                        # Left in in_flight; the finally puts them back for the next flush
+                        log.warning("⚠️ [XP ERR] Flush failed, will retry", error=str(e))
+            finally:
+                for uid, amount in self.in_flight.items():
+                    self.add(uid, amount)
+                self.in_flight = {}
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self.task is not None:
+            # Cancel between flushes, never in the middle of one
+            async with self.lock:
+                self.task.cancel()
+            self.task = None
+        await self.flush()
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(CRUMBS_FLUSH_SECONDS)
+            await self.flush()
+
+
+def _apply(txn, group):
+    paths = [user_path(uid) for uid in group]
+    docs = txn.get_all(paths)
+    now = datetime.now(timezone.utc)
+    for path, doc, amount in zip(paths, docs, group.values()):
+        doc = doc or {}
+        current = decayed_crumbs(doc.get("crumbs", 0), doc.get("last_active"), now)
+        txn.set(path, {"crumbs": current + amount, "last_active": SERVER_TIMESTAMP}, merge=True)
+
+
+crumbs_ledger = CrumbsLedger()
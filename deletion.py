@@ -0,0 +1,111 @@
+import os
+import asyncio
+from store import store, project_path, NotFound, SERVER_TIMESTAMP
+from projects import project_cache
+from logs import get_logger
+
+log = get_logger("deletion")
+
+# --- PROJECT DELETION (tombstone + background reaper) ---
+# Deleting a project used to delete only the project document and orphan its
+# subcollections. Now DELETE marks the project `deleted` (it disappears from
+# the list and every project read at once) and records a marker in
+# `deletions/{uid}:{project_id}`, both in one batch. The reaper then pages
+# through each subcollection, deleting up to DELETE_BATCH_SIZE docs per batched
+# commit with DELETE_THROTTLE_SECONDS between commits, and removes the project
+# doc and the marker last.
+#
+# Every step is idempotent and the markers are re-read at startup, so a
+# deletion cut short by a crash or redeploy resumes where it stopped.
+
+DELETE_BATCH_SIZE = min(int(os.getenv("DELETE_BATCH_SIZE", 400)), 500)  # Firestore allows 500 writes per batch
+DELETE_THROTTLE_SECONDS = float(os.getenv("DELETE_THROTTLE_SECONDS", 0.2))
+DELETE_RETRY_SECONDS = 30
+DELETIONS = "deletions"
+# Everything stored under a project (bookmarks.py, memory.py, notes.py, chat)
+PROJECT_SUBCOLLECTIONS = ("chats", "bookmarks", "meta")
+
+
+def marker_path(uid, project_id):
+    return f"{DELETIONS}/{uid}:{project_id}"
+
+
+class ProjectReaper:
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self.queued = set()
+        self.task = None
+
+    async def tombstone(self, uid, project_id):
+        batch = store.batch()
+        batch.update(project_path(uid, project_id), {"deleted": True, "deleted_at": SERVER_TIMESTAMP})
+        batch.set(marker_path(uid, project_id), {"uid": uid, "project_id": project_id, "deleted_at": SERVER_TIMESTAMP})
+        try:
+            await batch.commit()
+        except NotFound:
+            # Already gone (or never existed); nothing to reap
+            return False
+        project_cache.invalidate(uid, project_id)
+        self.enqueue(uid, project_id)
+        return True
+
+    def enqueue(self, uid, project_id):
+        if (uid, project_id) not in self.queued:
+            self.queued.add((uid, project_id))
+            self.queue.put_nowait((uid, project_id))
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        # Unfinished deletions keep their marker and resume on the next start
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def resume(self):
+        for _, marker in await store.stream(DELETIONS):
+            self.enqueue(marker["uid"], marker["project_id"])
+
+    async def reap(self, uid, project_id):
+        path = project_path(uid, project_id)
+        deleted = 0
+        for name in PROJECT_SUBCOLLECTIONS:
+            collection = f"{path}/{name}"
+            while True:
+                # Deleted docs drop out of the query, so the next page is just the first one again
+                docs = await store.stream(collection, limit=DELETE_BATCH_SIZE)
+                if not docs:
+                    break
+                batch = store.batch()
+                for doc_id, _ in docs:
+                    batch.delete(f"{collection}/{doc_id}")
+                await batch.commit()
+                deleted += len(docs)
+                await asyncio.sleep(DELETE_THROTTLE_SECONDS)
+
+        batch = store.batch()
+        batch.delete(path)
+        batch.delete(marker_path(uid, project_id))
+        await batch.commit()
+        project_cache.invalidate(uid, project_id)
+        log.info("🗑️ [DELETE] Project removed", project_id=project_id, docs=deleted)
+
+    async def _loop(self):
+        try:
+            await self.resume()
+        except Exception as e:
+            log.warning("⚠️ [DELETE] Could not load pending deletions", error=str(e))
+
+        while True:
+            uid, project_id = await self.queue.get()
+            try:
+                await self.reap(uid, project_id)
+                self.queued.discard((uid, project_id))
+            except Exception as e:
+                log.warning("⚠️ [DELETE] Reaping failed, will retry", project_id=project_id, error=str(e))
+                asyncio.get_running_loop().call_later(DELETE_RETRY_SECONDS, self.queue.put_nowait, (uid, project_id))
+
+
+reaper = ProjectReaper()
@@ -0,0 +1,186 @@
+import os
+import time
+import asyncio
+from store import store, user_path, new_id
+from logs import get_logger
+
+log = get_logger("jobs")
+
+# --- BACKGROUND JOBS ---
+# Long-running work (video ingest etc.) is queued here instead of holding the
+# HTTP request open. Jobs run as asyncio tasks gated by a semaphore, so at most
+# INGEST_WORKERS of them do upstream I/O at once; the rest wait as "queued".
+#
+# Jobs run in the process that accepted them, but their status is also written
+# to users/{uid}/jobs/{job_id} on submit, on every stage change and every
+# JOB_HEARTBEAT_SECONDS while running (writes are coalesced, in order). So a
+# poll of /api/{uid}/jobs/{job_id} that lands on another instance, or comes
+# after a restart, still finds it. A stored job that is neither done nor
+# failed and has missed several heartbeats died with its process; it is
+# reported as failed. Stored records carry `expires_at` for a Firestore TTL
+# policy.
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 4))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", 600))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", 30))
+JOB_STALE_SECONDS = JOB_HEARTBEAT_SECONDS * 4
+JOB_POLL_SECONDS = 1  # how often a stream re-reads a job running on another instance
+FINISHED = ("done", "failed")
+
+
+def job_path(uid, job_id):
+    return f"{user_path(uid)}/jobs/{job_id}"
+
+
+class Job:
+    def __init__(self, uid, kind, meta=None):
+        self.id = new_id()
+        self.uid = uid
+        self.kind = kind
+        self.meta = meta or {}
+        self.status = "queued"
+        self.stage = "queued"
+        self.stages = [{"stage": "queued", "at": time.time()}]
+        self.result = None
+        self.error = None
+        self.events = []
+        self.created_at = time.time()
+        self.finished_at = None
+        self.changed = asyncio.Event()
+        self.dirty = False
+        self.writer = None
+
+    def set_stage(self, stage):
+        self.stage = stage
+        self.stages.append({"stage": stage, "at": time.time()})
+        self._notify()
+        self.persist()
+
+    def persist(self):
+        # Schedule a write of the current state; one writer per job keeps
+        # writes in order and folds bursts of changes into one
+        self.dirty = True
+        if self.writer is None or self.writer.done():
+            self.writer = asyncio.create_task(self._write())
+
+    async def flush(self):
+        while self.writer is not None and not self.writer.done():
+            await self.writer
+
+    async def _write(self):
+        while self.dirty:
+            self.dirty = False
+            record = {**self.to_dict(), "uid": self.uid, "updated_at": time.time(),
+                      "expires_at": time.time() + JOB_RETENTION_SECONDS}
+            try:
+                await store.set(job_path(self.uid, self.id), record)
+            except Exception as e:
+                log.warning("⚠️ [JOB] Could not save job status", job_id=self.id, error=str(e))
+
+    def emit(self, event):
+        # Fine-grained progress (e.g. one event per video in a batch ingest)
+        self.events.append(event)
+        self._notify()
+
+    async def follow(self):
+        # Yields every event as it is emitted until the job finishes
+        sent = 0
+        while True:
+            changed = self.changed
+            while sent < len(self.events):
+                yield self.events[sent]
+                sent += 1
+            if self.status in FINISHED:
+                break
+            await changed.wait()
+
+    def _notify(self):
+        # Wake anyone streaming this job's events, then re-arm
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "stages": self.stages,
+            "result": self.result,
+            "error": self.error,
+            "events": len(self.events),
+            **self.meta,
+        }
+
+
+class JobQueue:
+    def __init__(self, workers=INGEST_WORKERS):
+        self.semaphore = asyncio.Semaphore(workers)
+        self.jobs = {}
+        self.tasks = set()
+
+    def submit(self, uid, kind, fn, **meta):
+        # fn(job) is a coroutine function; it reports progress via job.set_stage()
+        self._prune()
+        job = Job(uid, kind, meta)
+        self.jobs[job.id] = job
+        job.persist()
+        task = asyncio.create_task(self._run(job, fn))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return job
+
+    def get(self, uid, job_id):
+        # This process's live job, or None
+        job = self.jobs.get(job_id)
+        if job is None or job.uid != uid:
+            return None
+        return job
+
+    async def status(self, uid, job_id):
+        # Job status dict from this process if it runs here, else from the store
+        job = self.get(uid, job_id)
+        if job is not None:
+            return job.to_dict()
+        record = await store.get(job_path(uid, job_id))
+        if record is None:
+            return None
+        if record.get("status") not in FINISHED and time.time() - record.get("updated_at", 0) > JOB_STALE_SECONDS:
+            record.update(status="failed", stage="failed", error="Job was interrupted, please try again")
+        for field in ("uid", "updated_at", "expires_at"):
+            record.pop(field, None)
+        return record
+
+    async def _run(self, job, fn):
+        async with self.semaphore:
+            job.status = "running"
+            job.persist()
+            heartbeat = asyncio.create_task(self._heartbeat(job))
+            try:
+                job.result = await fn(job)
+                job.status = "done"
+                job.set_stage("done")
+            except Exception as e:
+                log.exception("❌ [JOB] Failed", kind=job.kind, job_id=job.id)
+                job.status = "failed"
+                job.error = str(e)
+                job.set_stage("failed")
+            finally:
+                heartbeat.cancel()
+                job.finished_at = time.time()
+                job.persist()
+                await job.flush()
+
+    async def _heartbeat(self, job):
+        # Keeps the stored record fresh so other instances don't think it died
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            job.persist()
+
+    def _prune(self):
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        for job_id in [j.id for j in self.jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del self.jobs[job_id]
+
+
+jobs = JobQueue()
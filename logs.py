@@ -0,0 +1,187 @@
+import os
+import re
+import sys
+import json
+import time
+import queue
+import random
+import atexit
+import logging
+import logging.handlers
+from metrics import current_route
+
+# --- STRUCTURED LOGGING ---
+# Replaces the print() breadcrumbs. A log call on the event loop only decides
+# whether to keep the event (level for the current route, debug sampling) and
+# drops it on a bounded queue; a background thread does the JSON encoding,
+# secret redaction, truncation and the actual (blocking) write to stdout.
+# If the queue is full, events are dropped and counted rather than blocking.
+#
+#   log = get_logger("videos")
+#   log.info("🍞 [BREADCRUMB] Cache miss, fetching transcript", video_id=video_id)
+#
+# -> {"ts": "...", "level": "INFO", "logger": "videos", "msg": "...", "route": "...", "video_id": "..."}
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# e.g. "/api/{uid}/projects/{project_id}/chat=DEBUG,/metrics=WARNING" (route templates)
+LOG_ROUTE_LEVELS = os.getenv("LOG_ROUTE_LEVELS", "")
+LOG_DEBUG_SAMPLE = float(os.getenv("LOG_DEBUG_SAMPLE", 0.1))
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", 500))
+LOG_MAX_ITEMS = 20
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10_000))
+
+SECRET_ENV_VARS = ("GEMINI_API_KEY", "GROQ_API_KE", "GROQ_API_KEY", "TAVILY_API_KEY", "NOTION_TOKEN", "SERVICE_ACC_KEY")
+SECRET_FIELD_RE = re.compile(r"key|token|secret|password|authorization|credential", re.I)
+SECRET_VALUE_RE = re.compile(r"(?<=Bearer )[\w\-.~+/]+=*|\b(?:tvly-|gsk_|AIza|secret_|ntn_)[\w\-]{8,}")
+REDACTED = "[REDACTED]"
+
+
+def _parse_route_levels(spec):
+    levels = {}
+    for item in spec.split(","):
+        route, _, level = item.strip().rpartition("=")
+        if route and level:
+            levels[route] = logging.getLevelName(level.upper())
+    return levels
+
+
+BASE_LEVEL = logging.getLevelName(LOG_LEVEL)
+ROUTE_LEVELS = _parse_route_levels(LOG_ROUTE_LEVELS)
+
+
+class Redactor:
+    def __init__(self):
+        # Literal values of the app's own secrets, wherever they show up
+        self.secrets = [v for v in (os.getenv(name) for name in SECRET_ENV_VARS) if v and len(v) >= 8]
+
+    def text(self, value):
+        for secret in self.secrets:
+            value = value.replace(secret, REDACTED)
+        value = SECRET_VALUE_RE.sub(REDACTED, value)
+        if len(value) > LOG_MAX_FIELD_CHARS:
+            value = f"{value[:LOG_MAX_FIELD_CHARS]}…(+{len(value) - LOG_MAX_FIELD_CHARS} chars)"
+        return value
+
+    def scrub(self, value, depth=0):
+        if value is None or isinstance(value, (bool, int, float)):
+            return value
+        if isinstance(value, str):
+            return self.text(value)
+        if depth >= 3:
+            return self.text(str(value))
+        if isinstance(value, dict):
+            out = {}
+            for i, (key, item) in enumerate(value.items()):
+                if i >= LOG_MAX_ITEMS:
+                    out["…"] = f"+{len(value) - LOG_MAX_ITEMS} keys"
+                    break
+                out[str(key)] = REDACTED if SECRET_FIELD_RE.search(str(key)) else self.scrub(item, depth + 1)
+            return out
+        if isinstance(value, (list, tuple, set)):
+            items = [self.scrub(item, depth + 1) for item in list(value)[:LOG_MAX_ITEMS]]
+            if len(value) > LOG_MAX_ITEMS:
+                items.append(f"…+{len(value) - LOG_MAX_ITEMS} items")
+            return items
+        return self.text(str(value))
+
+
+class JsonFormatter(logging.Formatter):
+    # Runs on the listener thread
+    def __init__(self):
+        super().__init__()
+        self.redactor = Redactor()
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name.removeprefix("cherseta."),
+            "msg": self.redactor.text(record.getMessage()),
+            "route": getattr(record, "route", None),
+        }
+        entry.update(self.redactor.scrub(getattr(record, "fields", {})))
+        if record.exc_info:
+            entry["exc"] = self.redactor.text(self.formatException(record.exc_info))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Formatting happens on the listener thread, not here
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_root = logging.getLogger("cherseta")
+_handler = None
+_listener = None
+
+
+def setup_logging(stream=None):
+    global _handler, _listener
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+    _handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    _listener = logging.handlers.QueueListener(_handler.queue, output)
+    _listener.start()
+
+    _root.handlers = [_handler]
+    _root.setLevel(logging.DEBUG)  # filtering happens in Logger._log
+    _root.propagate = False
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    # Drains whatever is still queued
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped_events():
+    return _handler.dropped if _handler is not None else 0
+
+
+class Logger:
+    def __init__(self, name):
+        self.logger = logging.getLogger(f"cherseta.{name}")
+
+    def _log(self, level, msg, fields, exc_info=False):
+        route = current_route()
+        if level < ROUTE_LEVELS.get(route, BASE_LEVEL):
+            return
+        # Debug events are high-frequency: keep a sample
+        if level <= logging.DEBUG and random.random() >= LOG_DEBUG_SAMPLE:
+            return
+        self.logger.log(level, msg, exc_info=exc_info, extra={"fields": fields, "route": route})
+
+    def debug(self, msg, **fields):
+        self._log(logging.DEBUG, msg, fields)
+
+    def info(self, msg, **fields):
+        self._log(logging.INFO, msg, fields)
+
+    def warning(self, msg, **fields):
+        self._log(logging.WARNING, msg, fields)
+
+    def error(self, msg, **fields):
+        self._log(logging.ERROR, msg, fields)
+
+    def exception(self, msg, **fields):
+        self._log(logging.ERROR, msg, fields, exc_info=True)
+
+
+def get_logger(name):
+    return Logger(name)
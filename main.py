@@ -1,29 +1,53 @@
 import os
-import uvicorn
-import firebase_admin
-from firebase_admin import credentials, firestore
+import time
+import asyncio
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
-from youtube_transcript_api import YouTubeTranscriptApi
 import re
 from datetime import datetime
-from google import genai
 from fastapi import HTTPException
 import json
-from fastapi.responses import StreamingResponse
-import httpx
+from fastapi.responses import StreamingResponse, JSONResponse
 from fastapi import Body
-from groq import Groq
-from tavily import TavilyClient
-import yt_dlp
 from datetime import datetime, timezone
-from dotenv import load_dotenv
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
+from dotenv import load_dotenv
 
+# Before the local modules: they read their settings from the environment at import
 load_dotenv()
 
+from videos import get_title, get_transcript, get_source_transcript, get_source_timeline, cached_timeline
+from videos import parse_video_id, is_collection_url, expand_collection, remember_title
+from videos import warm_up as videos_warm_up
+from jobs import jobs, JOB_POLL_SECONDS
+import retrieval
+from memory import chat_memory
+import bookmarks
+from research import run_research, cache_stats as research_cache_stats
+from store import store, new_id, user_path, project_path, NotFound, SERVER_TIMESTAMP, ArrayUnion
+from crumbs import crumbs_ledger, decayed_crumbs
+from notion import notion, NotionError
+from projects import project_cache, etag_response, project_summary
+from notes import notes_buffer, NotesConflict
+from deletion import reaper
+from answers import answer_cache, replay_pieces
+from summaries import summarizer, build_context
+from admission import admission, admitted, holding, take_token
+from assets import AssetManifest, AssetFiles
+from metrics import registry, span, chat_ttft, TimingMiddleware
+from logs import get_logger, setup_logging
+
+# JSON lines, written by a background thread (see logs.py)
+setup_logging()
+log = get_logger("main")
+
+# Heavy SDKs (google-genai, groq, tavily, yt_dlp, firebase_admin) are imported
+# on first use, and the Firestore backend is created lazily by store.py, so a
+# cold start only pays for FastAPI. The lifespan warms them up in the background.
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1") != "0"
+
 CRUMBS_PROJECT = 10
 CRUMBS_RESEARCH = 25
 CRUMBS_TRANSCRIPT = 5
@@ -32,89 +56,79 @@ CRUMBS_TRANSCRIPT = 5
 # Locally, you can set this in your terminal: export GEMINI_API_KEY='your_key'
 ai_client = None
 
-def get_video_title(url):
-    print(f"🍞 [BREADCRUMB 1] Entering get_video_title for: {url}")
-    
-    ydl_opts = {
-        'quiet': True,
-        'no_warnings': True,
-        'extract_flat': True, # Only fetch metadata, don't process video
-    }
-    
-    try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            print("🍞 [BREADCRUMB 2] yt_dlp is now fetching metadata...")
-            info = ydl.extract_info(url, download=False)
-            title = info.get('title', 'Untitled Video')
-            print(f"🍞 [BREADCRUMB 3] Success! Found title: {title}")
-            return title
-    except Exception as e:
-        print(f"🍞 [BREADCRUMB ERROR] Title fetch failed: {str(e)}")
-        return "Untitled Video"
-
 def add_crumbs(uid, amount):
     try:
-        # Reference the user document
-        user_ref = db.collection("users").document(uid)
-        
-        # .set with merge=True is the "Safe" way to do this
-        user_ref.set({
-            "crumbs": firestore.Increment(amount),
-            "last_active": firestore.SERVER_TIMESTAMP
-        }, merge=True)
+        # Write-behind: coalesced per uid and flushed in batches (see crumbs.py)
+        crumbs_ledger.add(uid, amount)
         
-        print(f"✨ [XP] Added {amount} crumbs to {uid}")
+        log.debug("✨ [XP] Added crumbs", uid=uid, amount=amount)
     except Exception as e:
         # This print ensures that even if XP fails, we know why, 
         # but we don't 'raise' the error so the main app keeps running.
-        print(f"⚠️ [XP ERR] System glitch: {e}")
+        log.warning("⚠️ [XP ERR] System glitch", error=str(e))
 
 def get_ai_client():
     global ai_client
     # If the client hasn't been created yet, create it now
     if ai_client is None:
         api_key = os.getenv("GEMINI_API_KEY")
-        print("api key =", api_key)
         if not api_key:
             return None
         
         # This is the point where initialization actually happens
+        from google import genai
         ai_client = genai.Client(api_key=api_key)
-        print("🚀 Gemini Client initialized on first use!")
+        log.info("🚀 Gemini Client initialized on first use!")
     
     return ai_client
 
 
 # --- 1. FIREBASE INITIALIZATION ---
-# Ensure your serviceAccountKey.json is in the same folder as main.py
-# if not firebase_admin._apps:
-
-#     cred = credentials.Certificate(os.getenv("SERVICE_ACC_KEY"))#
-
-#     firebase_admin.initialize_app(cred)
-
-# else:
-
-#     firebase_admin.get_app()
-
-
-
-# db = firestore.client()
-
-
-
-# this is my existing code for initiation
-if not firebase_admin._apps:
-    cred = credentials.Certificate(os.getenv("SERVICE_ACC_KEY"))#
-    firebase_admin.initialize_app(cred)
-else:
-    firebase_admin.get_app()
-db = firestore.client()
+# Firebase is initialized inside store.py (see FirestoreBackend). All reads and
+# writes go through `store`, which runs the blocking SDK calls on a bounded
+# thread pool so handlers don't stall the event loop.
 
 # --- 2. INITIALIZE APP & TEMPLATES ---
-app = FastAPI()
-app.mount("/static", StaticFiles(directory="static"), name="static")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    crumbs_ledger.start()
+    notion.start()
+    reaper.start()
+    warmup = asyncio.create_task(warm_up()) if STARTUP_WARMUP else None
+    yield
+    if warmup is not None:
+        warmup.cancel()
+    # Shutdown: don't lose crumbs that haven't been flushed yet
+    await crumbs_ledger.stop()
+    await notes_buffer.flush_all()
+    await reaper.stop()
+    await notion.aclose()
+
+async def warm_up():
+    # Runs after the server is accepting requests; failures only mean the
+    # first real request does the work instead
+    steps = {
+        "store": store.warm_up,
+        "youtube": lambda: asyncio.to_thread(videos_warm_up),
+        "gemini": lambda: asyncio.to_thread(get_ai_client),
+        "research": lambda: asyncio.to_thread(get_research_clients),
+    }
+    for name, step in steps.items():
+        started = time.perf_counter()
+        try:
+            await step()
+            log.info("🔥 [WARMUP] Ready", step=name, seconds=round(time.perf_counter() - started, 2))
+        except Exception as e:
+            log.warning("⚠️ [WARMUP] Skipped", step=name, error=str(e))
+
+app = FastAPI(lifespan=lifespan)
+# Per-route latency histograms; upstream spans are labeled with the same route (metrics.py)
+app.add_middleware(TimingMiddleware)
+# Content-hashed, immutable asset URLs + precompressed variants (assets.py)
+asset_manifest = AssetManifest()
+app.mount("/static", AssetFiles(asset_manifest), name="static")
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["asset_url"] = asset_manifest.url
 
 # app.add_middleware(
 #     CORSMiddleware,
@@ -127,9 +141,14 @@ templates = Jinja2Templates(directory="templates")
 # --- 3. THE FIRESTORE API ENDPOINTS (PRIORITY) ---
 # We move these to the top so FastAPI matches these specific paths first
 #dummy delete it later
+@app.get("/metrics")
+async def get_metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/ping")
 async def ping():
-    print("!!! PING RECEIVED !!!")
+    log.debug("!!! PING RECEIVED !!!")
     return {"message": "pong"}
 
 # CREATE: Saves a project to the specific user's folder
@@ -145,55 +164,56 @@ async def create_project(uid: str, request: Request):
         pass
     # add_crumbs(uid, CRUMBS_PROJECT)
 
-    print(f"--- 1. ENTERED FUNCTION for UID: {uid} ---") # Check if it even starts
+    log.debug("--- 1. ENTERED FUNCTION ---", uid=uid) # Check if it even starts
     try:
         data = await request.json()
-        print(f"--- 2. DATA UNPACKED: {data} ---") # Check if Handshake worked
+        log.debug("--- 2. DATA UNPACKED ---", data=data) # Check if Handshake worked
         
         project_name = data.get("name")
-        print(f"--- 3. NAME EXTRACTED: {project_name} ---") # Check for null values
+        log.debug("--- 3. NAME EXTRACTED ---", name=project_name) # Check for null values
         
         if not project_name:
-             print("--- 3a. ERROR: No name provided! ---")
+             log.warning("--- 3a. ERROR: No name provided! ---", uid=uid)
              return {"error": "No name provided"}, 400
 
         # This is where the Firebase interaction starts
-        project_ref = db.collection("users").document(uid).collection("projects").document()
-        print(f"--- 4. FIREBASE REF CREATED: {project_ref.id} ---") # Check Firebase connection
+        project_id = new_id()
+        log.debug("--- 4. FIREBASE REF CREATED ---", project_id=project_id) # Check Firebase connection
         
         database_payload = {
-            "id": project_ref.id,
+            "id": project_id,
             "name": project_name,
-            "createdAt": firestore.SERVER_TIMESTAMP 
+            "createdAt": SERVER_TIMESTAMP 
         }
         
-        project_ref.set(database_payload)
-        print("--- 5. FIREBASE SAVE SUCCESSFUL ---") # Final confirmation
+        await store.set(project_path(uid, project_id), database_payload)
+        project_cache.invalidate(uid, project_id)
+        log.info("--- 5. FIREBASE SAVE SUCCESSFUL ---", uid=uid, project_id=project_id) # Final confirmation
         
-        return {"id": project_ref.id, "name": project_name}
+        return {"id": project_id, "name": project_name}
         
     except Exception as e:
-        print(f"--- ❌ CRASHED AT: {e} ---") # This tells you WHY
+        log.exception("--- ❌ CRASHED ---", uid=uid) # This tells you WHY
         raise HTTPException(status_code=500, detail=str(e))
 
 # LIST: Fetches only the folders belonging to the logged-in UID
 @app.get("/api/{uid}/projects/list")
 @app.get("/api/{uid}/projects/list/") # Catch trailing slash
-async def list_projects(uid: str):
+async def list_projects(uid: str, request: Request):
     try:
-        print(f"📂 FETCHING LIST: Request for UID: {uid}")
-        docs = db.collection("users").document(uid).collection("projects").stream()
+        log.debug("📂 FETCHING LIST", uid=uid)
+        # Read-through cache of project summaries; ETag lets the dashboard revalidate with a 304
+        docs = await project_cache.list(uid)
         
         projects_list = []
-        for doc in docs:
-            d = doc.to_dict()
+        for d in docs:
             if 'createdAt' in d:
                 del d['createdAt']
             projects_list.append(d)
             
-        return {"projects": projects_list}
+        return etag_response(request, {"projects": projects_list})
     except Exception as e:
-        print(f"❌ LIST ERROR for user {uid}: {e}")
+        log.exception("❌ LIST ERROR", uid=uid)
         return {"projects": []}
 
 # GET ONE: Fetches specific project info
@@ -202,38 +222,85 @@ from datetime import datetime
 
 @app.get("/api/{uid}/projects/{project_id}")
 @app.get("/api/{uid}/projects/{project_id}/")
-async def get_project_data(uid: str, project_id: str):
+async def get_project_data(uid: str, project_id: str, request: Request):
 
     try:
 
-        doc_ref = db.collection("users").document(uid).collection("projects").document(project_id)
-
-        doc = doc_ref.get()
+        d = await project_cache.get(uid, project_id)
 
        
 
-        if doc.exists:
-
-            d = doc.to_dict()
+        if d is not None:
 
             if 'createdAt' in d:
 
                 del d['createdAt']
 
-            return d
+            return etag_response(request, project_summary(d))
 
         raise HTTPException(status_code=404, detail="Project not found")
 
+    except HTTPException:
+
+        raise
+
+    except Exception as e:
+
+        log.exception("❌ GET ERROR", uid=uid, project_id=project_id)
+
+        raise HTTPException(status_code=500, detail=str(e))
+
     except Exception as e:
+        log.exception("❌ GET ERROR", uid=uid, project_id=project_id)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/{uid}/projects/{project_id}/sources/{source_id}/transcript")
+async def get_source_transcript_text(uid: str, project_id: str, source_id: str):
+    project = await project_cache.get(uid, project_id)
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
 
-        print(f"❌ GET ERROR: {e}")
+    source = next((s for s in project.get("sources", []) if (s.get("id") or s.get("video_id")) == source_id), None)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Source not found")
 
+    try:
+        transcript = await get_source_transcript(source)
+    except Exception as e:
+        log.exception("❌ TRANSCRIPT ERROR", source_id=source_id)
         raise HTTPException(status_code=500, detail=str(e))
 
+    return {"id": source_id, "title": source.get("title"), "transcript": transcript}
+
+# Part of a transcript: ?start=&end= (seconds) or ?offset=&limit= (segments)
+SEGMENTS_MAX_LIMIT = 500
+
+@app.get("/api/{uid}/projects/{project_id}/sources/{source_id}/segments")
+async def get_source_segments(uid: str, project_id: str, source_id: str,
+                              start: float = None, end: float = None, offset: int = 0, limit: int = 50):
+    project = await project_cache.get(uid, project_id)
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    source = next((s for s in project.get("sources", []) if (s.get("id") or s.get("video_id")) == source_id), None)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Source not found")
+
+    try:
+        timeline = await get_source_timeline(source)
     except Exception as e:
-        print(f"❌ GET ERROR: {e}")
+        log.exception("❌ TRANSCRIPT ERROR", source_id=source_id)
         raise HTTPException(status_code=500, detail=str(e))
 
+    limit = max(0, min(limit, SEGMENTS_MAX_LIMIT))
+    if start is not None or end is not None:
+        if not timeline.timed:
+            raise HTTPException(status_code=409, detail="This transcript was stored without timings")
+        segments = timeline.between(start or 0, end if end is not None else float("inf"), limit=limit)
+    else:
+        segments = timeline.window(offset, limit)
+    return {"id": source_id, "timed": timeline.timed, "total": len(timeline), "segments": segments}
+
 # --- 4. AUTH GATE ---
 
 @app.post("/verify-token")
@@ -241,7 +308,7 @@ async def verify_token(request: Request):
     data = await request.json()
     # Using 'uid' to match the key sent by login.html
     uid = data.get("uid", "guest_user")
-    print(f"👤 AUTH VERIFIED: Received UID [{uid}]")
+    log.info("👤 AUTH VERIFIED", uid=uid)
     
     return {
         "status": "success", 
@@ -253,20 +320,19 @@ async def verify_token(request: Request):
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
-    return templates.TemplateResponse("get_started.html", {"request": request})
+    return templates.TemplateResponse(request, "get_started.html")
 
 @app.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
-    return templates.TemplateResponse("login.html", {"request": request})
+    return templates.TemplateResponse(request, "login.html")
 
 @app.get("/dashboard", response_class=HTMLResponse)
 async def dashboard(request: Request):
-    return templates.TemplateResponse("dashboard.html", {"request": request})
+    return templates.TemplateResponse(request, "dashboard.html")
 
 @app.get("/project_view/{project_id}", response_class=HTMLResponse)
 async def project_view(request: Request, project_id: str):
-    return templates.TemplateResponse("project_view.html", {
-        "request": request,
+    return templates.TemplateResponse(request, "project_view.html", {
         "project_id": project_id
     })
 
@@ -290,117 +356,287 @@ async def project_view(request: Request, project_id: str):
 # 3. The Transcriber
 
 # --- 7. Bookmarking --- remember this
+# Bookmark docs are keyed by a hash of the normalized URL (see bookmarks.py)
 
 @app.get("/api/{uid}/projects/{project_id}/bookmarks")
 async def get_bookmarks(uid: str, project_id: str):
-    # Match the same nested path
-    bookmarks_ref = db.collection("users").document(uid)\
-                      .collection("projects").document(project_id)\
-                      .collection("bookmarks")
-    
-    docs = bookmarks_ref.stream()
-    return {"bookmarks": [{"id": d.id, **d.to_dict()} for d in docs]}
+    return {"bookmarks": await bookmarks.list_bookmarks(uid, project_id)}
 
 @app.post("/api/{uid}/projects/{project_id}/bookmarks/toggle")
 async def toggle_bookmark(uid: str, project_id: str, payload: dict):
-    print(f"DEBUG [1]: Target User: {uid} | Project: {project_id}")
+    log.debug("Bookmark toggle", uid=uid, project_id=project_id)
     
     url = payload.get("url")
     title = payload.get("title")
+    if not url:
+        return {"status": "error", "message": "No url provided"}
 
     try:
-        # CORRECT PATH: users -> {uid} -> projects -> {project_id} -> bookmarks
-        bookmarks_ref = db.collection("users").document(uid)\
-                          .collection("projects").document(project_id)\
-                          .collection("bookmarks")
-        
-        print(f"DEBUG [2]: Checking nested path for URL: {url}")
-        
-        # Check if URL exists in this specific project's bookmarks
-        existing = bookmarks_ref.where("url", "==", url).limit(1).get()
-        
-        if len(existing) > 0:
-            print(f"DEBUG [3]: Found existing. Removing from {project_id}...")
-            bookmarks_ref.document(existing[0].id).delete()
-            return {"status": "removed"}
-        else:
-            print(f"DEBUG [4]: Not found. Adding to {project_id}...")
-            bookmarks_ref.add({
-                "url": url,
-                "title": title,
-                "timestamp": firestore.SERVER_TIMESTAMP
-            })
-            return {"status": "added"}
+        # One keyed transaction: delete if present, create if not
+        status = await bookmarks.toggle(uid, project_id, url, title)
+        log.debug("Bookmark toggled", project_id=project_id, status=status)
+        return {"status": status}
 
     except Exception as e:
-        print(f"DEBUG [CRASH]: {str(e)}")
+        log.exception("Bookmark toggle failed", project_id=project_id)
         return {"status": "error", "message": str(e)}
 
+@app.post("/api/{uid}/projects/{project_id}/bookmarks/import")
+async def import_bookmarks(uid: str, project_id: str, payload: dict = Body(...)):
+    items = payload.get("bookmarks", [])
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="'bookmarks' must be a list")
+    imported = await bookmarks.import_bookmarks(uid, project_id, items)
+    return {"status": "success", "imported": imported}
+
+@app.get("/api/{uid}/projects/{project_id}/bookmarks/export")
+async def export_bookmarks(uid: str, project_id: str):
+    items = await bookmarks.list_bookmarks(uid, project_id)
+    return {
+        "project_id": project_id,
+        "count": len(items),
+        "bookmarks": [{"url": b.get("url"), "title": b.get("title"), "saved_at": str(b.get("timestamp", ""))} for b in items]
+    }
 
 
-
-
-@app.post("/api/{uid}/projects/{project_id}/transcribe")
+@app.post("/api/{uid}/projects/{project_id}/transcribe", status_code=202)
 async def transcribe_video(uid: str, project_id: str, request: Request):
-    print(f"📥 [BREADCRUMB] Transcribe request received for project: {project_id}")
+    log.debug("📥 [BREADCRUMB] Transcribe request received", project_id=project_id)
     data = await request.json()
     video_url = data.get("url")
 
-    # 1. Fetch Actual Video Title using yt-dlp
-    actual_title = get_video_title(video_url)
-
     try:
         add_crumbs(uid, 30)
     except:
         pass
     
-    # Extract YouTube Video ID using Regex
-    match = re.search(r"(?:v=|\/)([0-9A-Za-z_-]{11}).*", video_url)
-    if not match:
-        print("🍞 [BREADCRUMB ERROR] Invalid YouTube URL detected.")
+    # Extract YouTube Video ID (watch?v=, youtu.be/, shorts/, embed/ ...)
+    video_id = parse_video_id(video_url)
+    if not video_id:
+        log.warning("🍞 [BREADCRUMB ERROR] Invalid YouTube URL detected.", url=video_url)
         raise HTTPException(status_code=400, detail="Invalid YouTube URL")
-    video_id = match.group(1)
 
+    # The actual fetching happens in the background; the client polls the job
+    # Per-user / global limits and the YouTube rate limit (admission.py); held until the job ends
+    ticket = await admission.admit("transcribe", uid)
+    job = jobs.submit(
+        uid, "transcribe",
+        holding(ticket, lambda job: ingest_video(job, uid, project_id, video_id, video_url)),
+        project_id=project_id, video_id=video_id
+    )
+    return {"status": "queued", "job_id": job.id, "video_id": video_id}
+
+
+async def ingest_video(job, uid, project_id, video_id, video_url):
+    # 1. Title (yt-dlp) and transcript run side by side, both cached per video_id
+    job.set_stage("fetching")
+    log.debug("🍞 [BREADCRUMB] Attempting to fetch title + transcript", video_id=video_id)
+    actual_title, full_text = await asyncio.gather(
+        get_title(video_id, video_url),
+        get_transcript(video_id)
+    )
+
+    # 2. Create the "Source" object
+    # The transcript body lives in videos/{video_id} (see videos.py); the project
+    # only keeps a small manifest entry so its document stays light
+    new_source = {
+        "id": video_id,
+        "url": video_url,
+        "title": actual_title, 
+        "size": len(full_text),
+        "timestamp": datetime.now().isoformat() 
+    }
+
+    # 3. Update Firestore using ArrayUnion
+    job.set_stage("saving")
+    log.debug("🍞 [BREADCRUMB] Updating Firestore ArrayUnion...", project_id=project_id)
+    await store.update(project_path(uid, project_id), {
+        "sources": ArrayUnion([new_source])
+    })
+    project_cache.invalidate(uid, project_id)
+
+    # 4. Warm the retrieval index so the first chat on this video is fast
+    job.set_stage("indexing")
     try:
-        print(f"🍞 [BREADCRUMB] Attempting to fetch transcript for ID: {video_id}")
-        # 1. Fetch using the verified instance method
-        ytt_api = YouTubeTranscriptApi()
-        fetched_transcript = ytt_api.fetch(video_id)
-        
-        # Join snippets into one string
-        full_text = " ".join([t.text for t in fetched_transcript])
-        print("🍞 [BREADCRUMB] Transcript successfully joined.")
+        index = await retrieval.index_video(video_id, full_text, client=get_ai_client() if retrieval.USE_EMBEDDINGS else None)
+        # Section + overview summaries are built in the background (summaries.py)
+        summarizer.ensure(index, get_ai_client())
+    except Exception as e:
+        # Not fatal: the index is rebuilt lazily on the first chat
+        log.warning("⚠️ [INDEX] Could not index video", video_id=video_id, error=str(e))
+
+    log.info("✅ [BREADCRUMB] Success! Source added", video_id=video_id, title=actual_title)
+    # Returned as the job result so the frontend can add the squircle instantly
+    return {"new_source": new_source}
+
+
+# --- BATCH / PLAYLIST INGEST ---
+BATCH_COMMIT_SIZE = int(os.getenv("BATCH_COMMIT_SIZE", 10))
+
+@app.post("/api/{uid}/projects/{project_id}/transcribe/batch")
+async def transcribe_batch(uid: str, project_id: str, payload: dict = Body(...)):
+    # Accepts {"urls": [...]} and/or {"url": "<playlist or channel url>"}
+    urls = list(payload.get("urls") or [])
+    if payload.get("url"):
+        urls.append(payload["url"])
+    urls = [u.strip() for u in urls if isinstance(u, str) and u.strip()]
+    if not urls:
+        raise HTTPException(status_code=400, detail="No URLs provided")
+
+    ticket = await admission.admit("transcribe", uid)
+    job = jobs.submit(
+        uid, "transcribe_batch",
+        holding(ticket, lambda job: ingest_batch(job, uid, project_id, urls)),
+        project_id=project_id
+    )
+
+    # Progress streams back as NDJSON; the job keeps running if the client leaves
+    # and can be re-read from /api/{uid}/jobs/{job_id}
+    async def progress():
+        yield json.dumps({"type": "queued", "job_id": job.id}) + "\n"
+        async for event in job.follow():
+            yield json.dumps(event) + "\n"
+        if job.status == "failed":
+            yield json.dumps({"type": "error", "message": job.error}) + "\n"
+
+    return StreamingResponse(progress(), media_type="application/x-ndjson", headers={"X-Job-Id": job.id})
+
+
+async def ingest_batch(job, uid, project_id, urls):
+    # 1. Expand playlists/channels and collect unique video ids
+    job.set_stage("expanding")
+    project = await store.get(project_path(uid, project_id))
+    if project is None or project.get("deleted"):
+        raise ValueError("Project not found")
+    existing = {s.get("id") or s.get("video_id") for s in project.get("sources", [])}
+
+    videos = {}
+    for url in urls:
+        if is_collection_url(url):
+            try:
+                await take_token("youtube")
+                async with span("yt_dlp", "playlist"):
+                    entries = await asyncio.to_thread(expand_collection, url)
+            except Exception as e:
+                job.emit({"type": "video", "url": url, "status": "failed", "error": f"Could not expand playlist: {e}"})
+                continue
+            for entry in entries:
+                remember_title(entry["id"], entry["title"])
+                videos.setdefault(entry["id"], entry["url"])
+        else:
+            video_id = parse_video_id(url)
+            if video_id:
+                videos.setdefault(video_id, url)
+            else:
+                job.emit({"type": "video", "url": url, "status": "failed", "error": "Invalid YouTube URL"})
 
-        # 2. Create the "Source" object
-        # UPDATED: Replaced placeholder title with actual_title
-        new_source = {
-            "id": video_id,
-            "url": video_url,
-            "transcript": full_text,
-            "title": actual_title, 
-            "timestamp": datetime.now().isoformat() 
-        }
+    skipped = [v for v in videos if v in existing]
+    todo = {v: u for v, u in videos.items() if v not in existing}
+    job.emit({"type": "expanded", "total": len(todo), "skipped": skipped, "videos": list(todo)})
 
-        # 3. Update Firestore using ArrayUnion
-        print("🍞 [BREADCRUMB] Updating Firestore ArrayUnion...")
-        project_ref = db.collection("users").document(uid).collection("projects").document(project_id)
-        project_ref.update({
-            "sources": firestore.ArrayUnion([new_source])
-        })
+    # 2. Fetch everything; videos.py caps how many YouTube calls run at once
+    job.set_stage("fetching")
 
-        print(f"✅ [BREADCRUMB] Success! Source added: {actual_title}")
-        # Return the object so the frontend can add the squircle instantly
-        return {"status": "success", "new_source": new_source}
+    async def fetch_one(video_id, url):
+        title, text = await asyncio.gather(get_title(video_id, url), get_transcript(video_id))
+        try:
+            index = await retrieval.index_video(video_id, text)
+            summarizer.ensure(index, get_ai_client())
+        except Exception as e:
+            log.warning("⚠️ [INDEX] Could not index video", video_id=video_id, error=str(e))
+        return {
+            "id": video_id,
+            "url": url,
+            "title": title,
+            "size": len(text),
+            "timestamp": datetime.now().isoformat()
+        }
 
-    except Exception as e:
-        print(f"❌ [BREADCRUMB ERROR] Transcribe Error: {e}")
-        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")      
+    async def fetch_tagged(video_id, url):
+        try:
+            return video_id, await fetch_one(video_id, url), None
+        except Exception as e:
+            return video_id, None, str(e)
+
+    # 3. Commit sources in groups instead of one ArrayUnion per video
+    pending, added, failed = [], 0, 0
+
+    async def commit():
+        nonlocal pending, added
+        if not pending:
+            return
+        group, pending = pending, []
+        await store.update(project_path(uid, project_id), {"sources": ArrayUnion(group)})
+        project_cache.invalidate(uid, project_id)
+        added += len(group)
+        job.emit({"type": "committed", "sources": group, "added": added})
+
+    for finished in asyncio.as_completed([fetch_tagged(v, u) for v, u in todo.items()]):
+        video_id, source, error = await finished
+        if source is None:
+            failed += 1
+            job.emit({"type": "video", "video_id": video_id, "status": "failed", "error": error})
+            continue
+        pending.append(source)
+        job.emit({"type": "video", "video_id": video_id, "status": "done", "title": source["title"]})
+        if len(pending) >= BATCH_COMMIT_SIZE:
+            await commit()
+    await commit()
+
+    if added:
+        add_crumbs(uid, 30 * added)
+    summary = {"type": "done", "added": added, "failed": failed, "skipped": len(skipped)}
+    job.emit(summary)
+    return summary
+
+
+# --- JOB STATUS ---
+@app.get("/api/{uid}/jobs/{job_id}")
+async def get_job_status(uid: str, job_id: str):
+    # Jobs run on the instance that accepted them; the stored status covers the rest
+    job = await jobs.status(uid, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/api/{uid}/jobs/{job_id}/events")
+async def stream_job_status(uid: str, job_id: str):
+    # SSE alternative to polling: one `data:` event per stage change
+    job = jobs.get(uid, job_id)
+    if job is None:
+        # Running elsewhere (or finished before a restart): follow the stored status
+        status = await jobs.status(uid, job_id)
+        if status is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+
+        async def stored_stream():
+            current = status
+            while True:
+                yield f"data: {json.dumps(current)}\n\n"
+                if current["status"] in ("done", "failed"):
+                    break
+                await asyncio.sleep(JOB_POLL_SECONDS)
+                current = await jobs.status(uid, job_id) or {**current, "status": "failed", "error": "Job not found"}
+
+        return StreamingResponse(stored_stream(), media_type="text/event-stream")
+
+    async def event_stream():
+        while True:
+            changed = job.changed
+            yield f"data: {json.dumps(job.to_dict())}\n\n"
+            if job.status in ("done", "failed"):
+                break
+            await changed.wait()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
 
 # --- 7. Chatbot integration ---
 
 # --- NEW CHAT ENDPOINT ---
 @app.post("/api/{uid}/projects/{project_id}/chat")
+@admitted("chat")
 async def chat_with_project(uid: str, project_id: str, request: Request):
+    started = time.perf_counter()
     # STEP 0: Lazy Initialization
     client = get_ai_client()
     if not client:
@@ -409,24 +645,53 @@ async def chat_with_project(uid: str, project_id: str, request: Request):
     data = await request.json()
     user_message = data.get("message")
     selected_ids = data.get("selectedIds", [])
+    # Client-side timestamps: two SERVER_TIMESTAMPs in one batch would tie
+    asked_at = datetime.now(timezone.utc)
 
     # STEP A: Context Retrieval (Selected Transcripts)
-    project_ref = db.collection("users").document(uid).collection("projects").document(project_id)
-    project_data = project_ref.get().to_dict()
+    project_doc = project_path(uid, project_id)
+    project_data = await project_cache.get(uid, project_id)
+    if project_data is None:
+        # Missing or being deleted: don't write chats under it
+        raise HTTPException(status_code=404, detail="Project not found")
     all_sources = project_data.get('sources', [])
     
-    context_list = [s['transcript'] for s in all_sources if (s.get('id') or s.get('video_id')) in selected_ids]
-    context_text = " ".join(context_list) if context_list else "No specific context selected."
-
+    selected_sources = [s for s in all_sources if (s.get('id') or s.get('video_id')) in selected_ids]
+    # Only the top-k transcript chunks for this question go to Gemini (see retrieval.py)
+    indexes = await asyncio.gather(*[
+        retrieval.get_index(s.get('id') or s.get('video_id'), lambda s=s: get_source_transcript(s), client=client)
+        for s in selected_sources
+    ])
     # STEP B: Memory (History) Formatting
-    chat_docs = project_ref.collection("chats").order_by("timestamp").stream()
-    history = []
-    for doc in chat_docs:
-        d = doc.to_dict()
-        history.append({
-            "role": "user" if d["role"] == "user" else "model",
-            "parts": [{"text": d["text"]}]
-        })
+    # Recent turns verbatim + a rolling summary of older ones (see memory.py)
+    memory = await chat_memory.get(uid, project_id)
+    chat_memory.backfill(uid, project_id, memory, client)
+    history = memory.contents()
+    summary_text = f"Summary of the earlier conversation: {memory.summary}\n\n" if memory.summary else ""
+
+    # Same question over the same transcripts: replay the earlier answer (answers.py).
+    # Only for conversations with no history yet: answers are shared across users,
+    # so they must never come from a prompt that held someone's conversation.
+    digests = [index.digest for index in indexes]
+    shareable = bool(selected_sources) and not history and not memory.summary
+    cached = answer_cache.get(digests, user_message) if shareable else None
+    if cached is None:
+        hits = await retrieval.search(list(zip(selected_sources, indexes)), user_message, client=client)
+        # Overviews + best passages + section summaries within the token budget (summaries.py)
+        trees = await asyncio.gather(*[summarizer.get(index) for index in indexes])
+        for index, tree in zip(indexes, trees):
+            if tree is None:
+                summarizer.ensure(index, client)
+        context_text, hits = build_context(list(zip(selected_sources, indexes, trees)), hits)
+        context_text = context_text or "No specific context selected."
+        citations = [{k: h[k] for k in ("source_id", "title", "url", "chunk")} for h in hits]
+        for citation in citations:
+            # Where the passage starts in the video, if the timings are at hand
+            timeline = cached_timeline(citation["source_id"])
+            if timeline is not None and timeline.timed:
+                citation["start"] = timeline.time_at_word(retrieval.chunk_start_word(citation["chunk"]))
+    else:
+        citations = cached["citations"]
 
     # STEP C: Streaming Generator
     async def generate_stream():
@@ -439,36 +704,66 @@ async def chat_with_project(uid: str, project_id: str, request: Request):
             2. If the information is from your own general knowledge, append.
             3. If you are combining both, use.
             4. Always prioritize facts from the 'Context' over your own memory.
+            5. Each Context passage starts with a label like [Video Title · part 3]. When you use a passage, cite its label.
             """
         full_response = ""
+        # Tell the client which transcript chunks were used (ignored by older clients)
+        if citations:
+            yield f"data: {json.dumps({'citations': citations})}\n\n"
+        response_stream = None
         try:
-            # We bundle history + current message into one 'contents' list
-            # Note: gemini-2.5-flash is correct for Dec 2025
-            response_stream = client.models.generate_content_stream(
-                model="gemini-2.5-flash-lite", 
-                contents=history + [{
-                    "role": "user", 
-                    "parts": [{"text": f"System instructions : {system_rules}\n\nContext: {context_text}\n\nQuestion: {user_message}"}]
-                }]
-            )
-
-            for chunk in response_stream:
-                if chunk.text:
-                    full_response += chunk.text
-                    # Standard SSE format: data: {...}\n\n
-                    yield f"data: {json.dumps({'text': chunk.text})}\n\n"
-            
-            # STEP D: Save once the loop finishes successfully
-            project_ref.collection("chats").add({
-                "role": "user", "text": user_message, "timestamp": firestore.SERVER_TIMESTAMP
-            })
-            project_ref.collection("chats").add({
-                "role": "model", "text": full_response, "timestamp": firestore.SERVER_TIMESTAMP
-            })
+            if cached is not None:
+                chat_ttft.observe(time.perf_counter() - started)
+                full_response = cached["text"]
+                for piece in replay_pieces(full_response):
+                    yield f"data: {json.dumps({'text': piece})}\n\n"
+            else:
+                # We bundle history + current message into one 'contents' list
+                # Note: gemini-2.5-flash is correct for Dec 2025
+                # client.aio = async API, so waiting for tokens never blocks the event loop
+                await take_token("gemini")
+                async with span("gemini", "stream"):
+                    response_stream = await client.aio.models.generate_content_stream(
+                        model="gemini-2.5-flash-lite", 
+                        contents=history + [{
+                            "role": "user", 
+                            "parts": [{"text": f"System instructions : {system_rules}\n\n{summary_text}Context: {context_text}\n\nQuestion: {user_message}"}]
+                        }]
+                    )
+
+                    async for chunk in response_stream:
+                        # Tab closed / navigated away: stop paying for tokens nobody reads
+                        if await request.is_disconnected():
+                            log.info("🔌 [CHAT] Client disconnected, cancelling Gemini stream", project_id=project_id)
+                            return
+                        if chunk.text:
+                            if not full_response:
+                                # Time to first token, as the user sees it (retrieval included)
+                                chat_ttft.observe(time.perf_counter() - started)
+                            full_response += chunk.text
+                            # Standard SSE format: data: {...}\n\n
+                            yield f"data: {json.dumps({'text': chunk.text})}\n\n"
+
+                if shareable:
+                    answer_cache.set(digests, user_message, full_response, citations)
+
+            # STEP D: Save both turns in one batched commit once the loop finishes
+            batch = store.batch()
+            chats = f"{project_doc}/chats"
+            batch.set(f"{chats}/{new_id()}", {"role": "user", "text": user_message, "timestamp": asked_at})
+            answered_at = datetime.now(timezone.utc)
+            batch.set(f"{chats}/{new_id()}", {"role": "model", "text": full_response, "timestamp": answered_at})
+            await batch.commit()
+            await chat_memory.append(uid, project_id, user_message, full_response, asked_at, answered_at, client)
 
         except Exception as e:
-            print(f"❌ Streaming Error: {e}")
-            yield f"data: {json.dumps({'text': chunk.text})}\n\n"
+            log.exception("❌ Streaming Error", project_id=project_id)
+            yield f"data: {json.dumps({'text': 'Sorry, I lost my train of thought. Please try again.'})}\n\n"
+
+        finally:
+            # Closing the upstream iterator aborts the HTTP stream to Gemini
+            if response_stream is not None and hasattr(response_stream, "aclose"):
+                await response_stream.aclose()
 
     return StreamingResponse(generate_stream(), media_type="text/event-stream")
 
@@ -480,101 +775,101 @@ async def get_all_chats(uid: str, project_id: str):
     """
     try:
         # Path: users -> {uid} -> projects -> {project_id} -> chats
-        project_ref = db.collection("users").document(uid).collection("projects").document(project_id)
-        
         # We target the 'chats' collection and order by timestamp to keep the flow correct
-        chat_docs = project_ref.collection("chats").order_by("timestamp").stream()
+        chat_docs = await store.stream(f"{project_path(uid, project_id)}/chats", order_by="timestamp")
 
         history = []
-        for doc in chat_docs:
-            d = doc.to_dict()
+        for _, d in chat_docs:
             history.append({
                 "role": d.get("role", "user"), # Defaults to 'user' if role is missing
                 "text": d.get("text", ""),
                 "timestamp": str(d.get("timestamp", "")) # Convert to string for JSON safety
             })
 
-        print(f"📦 [DB] Successfully loaded {len(history)} messages from chats collection.")
+        log.debug("📦 [DB] Loaded chat history", project_id=project_id, messages=len(history))
         return {"history": history}
 
     except Exception as e:
-        print(f"❌ [DB ERROR] History fetch failed: {e}")
+        log.exception("❌ [DB ERROR] History fetch failed", project_id=project_id)
         # Return an empty list so the frontend doesn't crash
         return {"history": []}
 
 
+# Versioned, coalesced notes (notes.py)
+@app.get("/api/{uid}/projects/{project_id}/notes")
+async def get_notes(uid: str, project_id: str):
+    try:
+        return await notes_buffer.get(uid, project_id)
+    except NotFound:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+
 @app.post("/api/{uid}/projects/{project_id}/notes")
 async def update_notes(uid: str, project_id: str, data: dict):
-    # Locate the specific project in your Firestore hierarchy
-    # (Matches the structure we set up: users -> {uid} -> projects -> {id})
-    project_ref = db.collection("users").document(uid).collection("projects").document(project_id)
-    
+    # {"base_version", "title", "patch": {"start", "end", "text"}} from the editor;
+    # {"title", "content"} without base_version still overwrites (older clients)
     try:
-        # We use .update() so we don't accidentally delete the transcript or video data
-        project_ref.update({
-            "notes_html": data.get("content", ""),
-            "notes_title": data.get("title", "Untitled Note"),
-            "updated_at": datetime.now()
-        })
-        return {"status": "success"}
+        version = await notes_buffer.save(
+            uid, project_id,
+            base_version=data.get("base_version"),
+            title=data.get("title"),
+            patch=data.get("patch"),
+            content=data.get("content")
+        )
+        return {"status": "success", "version": version}
+    except NotesConflict as e:
+        return JSONResponse(status_code=409, content={"status": "conflict", **e.current})
+    except NotFound:
+        raise HTTPException(status_code=404, detail="Project not found")
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Bad notes patch: {e}")
     except Exception as e:
-        print(f"❌ Firebase Error: {e}")
+        log.exception("❌ Notes save failed", project_id=project_id)
         return {"status": "error", "message": str(e)}
 
-NOTION_TOKEN = os.getenv("NOTION_TOKEN")
-PARENT_PAGE_ID = os.getenv("PARENT_PAGE_ID")
-
+# Pooled, rate-limited client; long notes are split into blocks (notion.py)
 @app.post("/api/export/notion")
 async def export_to_notion(payload: dict = Body(...)):
     title = payload.get("title", "Chersey Research Log")
     content = payload.get("content", "")
 
-    # Headers required by Notion
-    headers = {
-        "Authorization": f"Bearer {NOTION_TOKEN}",
-        "Content-Type": "application/json",
-        "Notion-Version": "2022-06-28"
-    }
-
-    # Structure the Notion page with a title and a paragraph block
-    notion_data = {
-        "parent": { "page_id": PARENT_PAGE_ID },
-        "properties": {
-            "title": {
-                "title": [{"text": {"content": title}}]
-            }
-        },
-        "children": [
-            {
-                "object": "block",
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": [{"text": {"content": content}}]
-                }
-            }
-        ]
-    }
-
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            "https://api.notion.com/v1/pages", 
-            headers=headers, 
-            json=notion_data
-        )
-        return response.json()
+    try:
+        return await notion.export_page(title, content)
+    except NotionError as e:
+        log.error("❌ [NOTION] Export failed", status=e.status_code, body=e.body)
+        return JSONResponse(status_code=e.status_code, content=e.body)
 
 
 # --- 8. Deep Research Agent ---
-groq_client = Groq(api_key= os.getenv("GROQ_API_KE"))
-tavily_client = TavilyClient(api_key= os.getenv("TAVILY_API_KEY"))
+# Async SDK clients so the Groq call and the parallel Tavily searches (research.py)
+# don't block the event loop. Created on first use, like the Gemini client.
+groq_client = None
+tavily_client = None
+
+def get_research_clients():
+    global groq_client, tavily_client
+    if groq_client is None:
+        from groq import AsyncGroq
+        groq_client = AsyncGroq(api_key= os.getenv("GROQ_API_KE"))
+    if tavily_client is None:
+        from tavily import AsyncTavilyClient
+        tavily_client = AsyncTavilyClient(api_key= os.getenv("TAVILY_API_KEY"))
+    return groq_client, tavily_client
+
+@app.get("/api/chat/cache/stats")
+async def get_chat_cache_stats():
+    return answer_cache.stats()
+
+@app.get("/api/research/cache/stats")
+async def get_research_cache_stats():
+    return research_cache_stats()
 
 @app.post("/api/research/agent")
-async def generate_research(payload: dict = Body(...)):
+@admitted("research")
+async def generate_research(request: Request, payload: dict = Body(...)):
 
     uid = payload.get("uid") 
     
-    # ... your existing AI research logic ...
-    
     # 2. Research Complete! Add 25 Crumbs
     if uid:
         try:
@@ -588,53 +883,30 @@ async def generate_research(payload: dict = Body(...)):
         # Fallback query if no context is provided to prevent Tavily crash
         return {"results": []}
 
-    try:
-        
-        # 1. Groq generates 3 targeted queries with a strict System Prompt
-        completion = groq_client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[
-                {
-                    "role": "system", 
-                    "content": "You are a research assistant. Output ONLY search queries, one per line. No numbers, no intro, no chatter."
-                },
-                {
-                    "role": "user", 
-                    "content": f"Generate 3 deep-dive search queries for this text:\n\n{context_text[:4000]}"
-                }
-            ],
-            temperature=0.3 # Lower temperature for more consistent formatting
-        )
-        
-        raw_output = completion.choices[0].message.content.strip()
-        
-        # --- THE SANITIZER ---
-        # 1. Split by newline
-        # 2. Use regex to remove "1. ", "2) ", etc.
-        # 3. Filter out any empty strings to satisfy Tavily
-        queries = []
-        for line in raw_output.split('\n'):
-            clean_line = re.sub(r'^\d+[\.\)\-\s]+', '', line).strip() 
-            if clean_line:
-                queries.append(clean_line)
-
-        # 2. Tavily searches for each query (Top 3 each = 9 total)
-        final_results = []
-        for query in queries[:3]:
-            print(f"🚀 [AGENT] Searching for: {query}")
-            print(os.getenv("TAVILY_API_KEY"))
+    groq_client, tavily_client = get_research_clients()
+
+    # NDJSON mode: one line per event, so cards render as each search lands
+    if payload.get("stream") or "application/x-ndjson" in request.headers.get("accept", ""):
+        async def event_stream():
             try:
-                # Basic depth is faster for hackathon speed
-                search = tavily_client.search(query=query, search_depth="basic", max_results=3)
-                if "results" in search:
-                    final_results.extend(search['results'])
+                async for event in run_research(groq_client, tavily_client, context_text):
+                    yield json.dumps(event) + "\n"
             except Exception as e:
-                print(f"⚠️ [TAVILY SKIP] Query '{query}' failed: {e}")
+                log.exception("🔥 [CRASH] Research Agent Error")
+                yield json.dumps({"type": "error", "message": str(e)}) + "\n"
+
+        return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+    try:
+        final_results = []
+        async for event in run_research(groq_client, tavily_client, context_text):
+            if event["type"] == "done":
+                final_results = event["results"]
 
         return {"results": final_results}
 
     except Exception as e:
-        print(f"🔥 [CRASH] Research Agent Error: {e}")
+        log.exception("🔥 [CRASH] Research Agent Error")
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -655,46 +927,18 @@ def calculate_level(crumbs):
 
 @app.get("/api/users/{uid}/xp")
 async def get_user_xp(uid: str):
-    print("function is called to fetch user's xp")
-    user_ref = db.collection("users").document(uid)
-    print("database gave back a response")
-    user_doc = user_ref.get()
+    data = await store.get(user_path(uid))
+    # Crumbs earned since the last ledger flush haven't reached Firestore yet
+    pending = crumbs_ledger.pending_for(uid)
     
-    if not user_doc.exists:
-        print("user is newly created/ doesn't exist so creating crumb config")
+    if data is None and not pending:
+        log.debug("User has no crumbs yet", uid=uid)
         return {"crumbs": 0, "level": "Newbie", "status": "dead"}
 
-    data = user_doc.to_dict()
-    crumbs = data.get("crumbs", 0)
-    last_active = data.get("last_active") # Should be a Firestore Timestamp or ISO string
-
-    # --- CRUMBS DECAY LOGIC ---
-    if last_active:
-        # 1. Parse the last active time
-        if isinstance(last_active, str):
-            last_time = datetime.fromisoformat(last_active)
-        else:
-            # If it's a Firestore Timestamp object
-            last_time = last_active 
-
-        # 2. Calculate time passed in hours
-        now = datetime.now(timezone.utc)
-        time_diff = now - last_time
-        hours_passed = time_diff.total_seconds() / 3600
-        
-        # 3. Calculate decay (5 crumbs per hour)
-        decay = int(hours_passed * 5)
-        
-        if decay > 0:
-            # Subtract decay but allow it to hit 0 or slightly below for 'dead' state
-            crumbs = max(-1, crumbs - decay)
-            
-            # Update database with new decayed value and reset last_active to 'now'
-            # to prevent decay from compounding on every single refresh
-            user_ref.update({
-                "crumbs": crumbs,
-                "last_active": firestore.SERVER_TIMESTAMP
-            })
+    data = data or {}
+    # Decay is computed from last_active at read time; nothing is written here
+    # (the ledger materializes it the next time crumbs are added)
+    crumbs = decayed_crumbs(data.get("crumbs", 0), data.get("last_active")) + pending
 
     # Determine mascot state
     status = "alive" if crumbs > 0 else "dead"
@@ -710,15 +954,14 @@ async def get_user_xp(uid: str):
 @app.delete("/api/{uid}/projects/{project_id}")
 async def delete_project(uid: str, project_id: str):
     try:
-        # Reference the specific project document
-        project_ref = db.collection("users").document(uid).collection("projects").document(project_id)
-        
-        # Delete the document
-        project_ref.delete()
+        # Tombstone now; chats, bookmarks, notes etc. are deleted in the background (deletion.py)
+        await reaper.tombstone(uid, project_id)
+        chat_memory.forget(uid, project_id)
+        notes_buffer.forget(uid, project_id)
         
         return {"status": "success", "message": f"Project {project_id} deleted."}
     except Exception as e:
-        print(f"Error deleting project: {e}")
+        log.exception("Error deleting project", project_id=project_id)
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
@@ -730,4 +973,5 @@ if __name__ == "__main__":
     # MANDATORY: Render sets the 'PORT' environment variable
     port = int(os.environ.get("PORT", 8080))
     # MANDATORY: host must be 0.0.0.0 for external access
+    import uvicorn
     uvicorn.run("main:app", host="127.0.0.1", port=8080)
@@ -0,0 +1,183 @@
+import os
+import time
+import asyncio
+from cache import LRUCache
+from metrics import span
+from admission import take_token
+from logs import get_logger
+from store import store, project_path
+
+log = get_logger("memory")
+
+# --- BOUNDED CHAT MEMORY ---
+# Instead of replaying the whole `chats` subcollection on every message, chat
+# sends a sliding window of the most recent turns plus a rolling summary of
+# everything older. The summary is extended incrementally: once the window
+# overflows by MEMORY_SUMMARY_BATCH turns, the oldest ones are folded into it
+# in the background and the result is saved to .../meta/memory.
+#
+# The memory doc records the timestamp of the last summarized turn, so a
+# (re)load reads every turn after it, not just the last window: turns that
+# were waiting for the next fold (or piled up while folds kept failing) are
+# folded in later instead of lost. Only the last window goes to Gemini as
+# history; a backlog is folded FOLD_MAX_TURNS at a time.
+#
+# Each project's memory is cached in-process, so a message costs no Firestore
+# reads once the project is warm. Entries are re-read after MEMORY_TTL_SECONDS
+# in case another instance has served the same project meanwhile.
+
+MEMORY_WINDOW_TURNS = int(os.getenv("MEMORY_WINDOW_TURNS", 12))
+MEMORY_SUMMARY_BATCH = int(os.getenv("MEMORY_SUMMARY_BATCH", 6))
+MEMORY_CACHE_PROJECTS = int(os.getenv("MEMORY_CACHE_PROJECTS", 1000))
+MEMORY_TTL_SECONDS = int(os.getenv("MEMORY_TTL_SECONDS", 600))
+SUMMARY_MODEL = os.getenv("MEMORY_SUMMARY_MODEL", "gemini-2.5-flash-lite")
+FOLD_MAX_TURNS = 50  # turns per summarize call when catching up on a backlog
+
+
+def memory_path(uid, project_id):
+    return f"{project_path(uid, project_id)}/meta/memory"
+
+
+class ChatMemory:
+    def __init__(self, turns, summary="", summarized_count=0, summarized_until=None):
+        self.turns = turns  # [{"role": "user"|"model", "text": str, "at": datetime}], oldest first
+        self.summary = summary
+        self.summarized_count = summarized_count
+        self.summarized_until = summarized_until
+        self.needs_backfill = False
+        self.loaded_at = time.time()
+        self.lock = asyncio.Lock()
+
+    def contents(self):
+        # Gemini `contents` for the recent window (older turns wait for a fold)
+        return [
+            {"role": "user" if t["role"] == "user" else "model", "parts": [{"text": t["text"]}]}
+            for t in self.turns[-MEMORY_WINDOW_TURNS:]
+        ]
+
+
+class MemoryManager:
+    def __init__(self):
+        self.cache = LRUCache(maxsize=MEMORY_CACHE_PROJECTS)
+        self.tasks = set()
+
+    async def get(self, uid, project_id):
+        key = (uid, project_id)
+        memory = self.cache.get(key)
+        if memory is None or time.time() - memory.loaded_at > MEMORY_TTL_SECONDS:
+            memory = await self._load(uid, project_id)
+            self.cache.set(key, memory)
+        return memory
+
+    async def append(self, uid, project_id, user_text, model_text, asked_at, answered_at, client=None):
+        # Called after the turns are written to `chats` (with these timestamps);
+        # a cold project will simply pick them up from Firestore on its next load
+        memory = self.cache.get((uid, project_id))
+        if memory is None:
+            return
+        memory.turns.append({"role": "user", "text": user_text, "at": asked_at})
+        memory.turns.append({"role": "model", "text": model_text, "at": answered_at})
+
+        if client is not None and len(memory.turns) >= MEMORY_WINDOW_TURNS + MEMORY_SUMMARY_BATCH:
+            self._spawn(self._fold(uid, project_id, memory, client))
+
+    def forget(self, uid, project_id):
+        self.cache.pop((uid, project_id))
+
+    async def _load(self, uid, project_id):
+        chats = f"{project_path(uid, project_id)}/chats"
+        state = await store.get(memory_path(uid, project_id)) or {}
+        until = state.get("summarized_until")
+        if until is not None:
+            # Everything not in the summary yet, however much; folds catch up on it
+            docs = await store.stream(chats, order_by="timestamp", after=until)
+            turns = [_turn(d) for _, d in docs]
+            turns_beyond = False
+        else:
+            # One extra doc tells us whether anything exists beyond the window
+            recent = await store.stream(chats, order_by="timestamp", descending=True,
+                                        limit=MEMORY_WINDOW_TURNS + 1)
+            turns = [_turn(d) for _, d in reversed(recent)]
+            turns_beyond = len(turns) > MEMORY_WINDOW_TURNS
+            turns = turns[-MEMORY_WINDOW_TURNS:]
+        memory = ChatMemory(turns, state.get("summary", ""), state.get("summarized_count", 0), until)
+
+        if not state and turns_beyond:
+            # Project predates rolling summaries: summarize its older history once
+            memory.needs_backfill = True
+        return memory
+
+    def backfill(self, uid, project_id, memory, client):
+        # Catch up after a load: summarize pre-summary history once, or fold a backlog
+        if client is None:
+            return
+        if memory.needs_backfill:
+            memory.needs_backfill = False
+            self._spawn(self._backfill(uid, project_id, memory, client))
+        elif len(memory.turns) >= MEMORY_WINDOW_TURNS + MEMORY_SUMMARY_BATCH and not memory.lock.locked():
+            self._spawn(self._fold(uid, project_id, memory, client))
+
+    async def _backfill(self, uid, project_id, memory, client):
+        async with memory.lock:
+            docs = await store.stream(f"{project_path(uid, project_id)}/chats", order_by="timestamp")
+            older = [_turn(d) for _, d in docs]
+            older = older[:max(0, len(older) - len(memory.turns))]
+            if not older:
+                return
+            memory.summary = await _summarize(client, memory.summary, older)
+            memory.summarized_count = len(older)
+            memory.summarized_until = older[-1]["at"]
+            await self._save(uid, project_id, memory)
+
+    async def _fold(self, uid, project_id, memory, client):
+        async with memory.lock:
+            # A big backlog goes in several calls, saved after each one
+            while len(memory.turns) > MEMORY_WINDOW_TURNS:
+                folding = memory.turns[:min(len(memory.turns) - MEMORY_WINDOW_TURNS, FOLD_MAX_TURNS)]
+                summary = await _summarize(client, memory.summary, folding)
+                # Turns may have been appended while we were waiting on Gemini
+                memory.turns = memory.turns[len(folding):]
+                memory.summary = summary
+                memory.summarized_count += len(folding)
+                memory.summarized_until = folding[-1]["at"]
+                await self._save(uid, project_id, memory)
+
+    async def _save(self, uid, project_id, memory):
+        await store.set(memory_path(uid, project_id), {
+            "summary": memory.summary,
+            "summarized_count": memory.summarized_count,
+            "summarized_until": memory.summarized_until
+        })
+
+    def _spawn(self, coro):
+        async def guarded():
+            try:
+                await coro
+            except Exception as e:
+                log.warning("⚠️ [MEMORY] Summary update failed", error=str(e))
+
+        task = asyncio.create_task(guarded())
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+
+def _turn(doc):
+    return {"role": doc.get("role", "user"), "text": doc.get("text", ""), "at": doc.get("timestamp")}
+
+
+async def _summarize(client, summary, turns):
+    transcript = "\n".join(f"{t['role'].upper()}: {t['text']}" for t in turns)
+    prompt = (
+        "You maintain the running memory of a study-assistant conversation. "
+        "Merge the new turns into the existing summary. Keep facts, decisions, "
+        "open questions and the user's goals; drop pleasantries. Reply with the "
+        "updated summary only, at most 250 words.\n\n"
+        f"Existing summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"
+    )
+    await take_token("gemini")
+    async with span("gemini", "summarize"):
+        response = await client.aio.models.generate_content(model=SUMMARY_MODEL, contents=prompt)
+    return (response.text or summary).strip()
+
+
+chat_memory = MemoryManager()
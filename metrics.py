@@ -0,0 +1,209 @@
+import time
+import bisect
+import threading
+import contextvars
+
+# --- METRICS ---
+# Small in-process Prometheus registry (no client library needed):
+#   http_request_duration_seconds{route,method,status}  - TimingMiddleware
+#   upstream_duration_seconds{route,upstream,op}         - span(...) around every external call
+#   upstream_errors_total{route,upstream,op}
+#   chat_ttft_seconds                                    - chat request -> first streamed token
+# `route` is the matched route template (e.g. /api/{uid}/projects), never the raw
+# path, so label cardinality stays bounded. Exposed at GET /metrics.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# The ASGI scope of the request being served; spans read the matched route from it
+_current_scope = contextvars.ContextVar("metrics_scope", default=None)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for label_values, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def add(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self.lock:
+            for label_values, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.series = {}  # label values -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [0] * (len(self.buckets) + 2)
+            bucket = bisect.bisect_left(self.buckets, value)
+            if bucket < len(self.buckets):
+                series[bucket] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for label_values, series in sorted(self.series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    labels = _format_labels(self.labels + ("le",), label_values + (bound,))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labels + ("le",), label_values + ("+Inf",))
+                lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+                labels = _format_labels(self.labels, label_values)
+                lines.append(f"{self.name}_sum{labels} {series[-2]}")
+                lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, *args, **kwargs):
+        metric = Counter(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, *args, **kwargs):
+        metric = Gauge(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_duration = registry.histogram(
+    "http_request_duration_seconds", "Time from request start to the end of the response body.",
+    labels=("route", "method", "status"))
+upstream_duration = registry.histogram(
+    "upstream_duration_seconds", "Latency of calls to external services.",
+    labels=("route", "upstream", "op"))
+upstream_errors = registry.counter(
+    "upstream_errors_total", "External calls that raised.",
+    labels=("route", "upstream", "op"))
+chat_ttft = registry.histogram(
+    "chat_ttft_seconds", "Time from a chat request arriving to its first streamed token.")
+
+
+def route_of(scope):
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def current_route():
+    scope = _current_scope.get()
+    return route_of(scope) if scope is not None else "background"
+
+
+class span:
+    # Times one external call: `async with span("gemini", "generate"):` or `with span(...)`.
+    # Exceptions are counted and re-raised; set `.failed` to count an error response.
+    def __init__(self, upstream, op):
+        self.upstream = upstream
+        self.op = op
+        self.failed = False
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        route = current_route()
+        upstream_duration.observe(time.perf_counter() - self.started, route, self.upstream, self.op)
+        if exc_type is not None or self.failed:
+            upstream_errors.inc(route, self.upstream, self.op)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+class TimingMiddleware:
+    # Pure ASGI so streamed responses (SSE/NDJSON) are timed to their last byte
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = 500
+        token = _current_scope.set(scope)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_scope.reset(token)
+            http_duration.observe(time.perf_counter() - started, route_of(scope), scope["method"], status)
+
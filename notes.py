@@ -0,0 +1,236 @@
+import os
+import zlib
+import asyncio
+from datetime import datetime, timezone
+from logs import get_logger
+from store import store, project_path, NotFound
+from projects import project_cache
+
+log = get_logger("notes")
+
+# --- VERSIONED NOTES ---
+# Notes live in their own document (.../meta/notes) instead of inside the
+# project doc with all the sources. Every save names the version it was based
+# on and normally sends only a patch against it. A save against an old version
+# (another tab saved first) is rejected with NotesConflict instead of
+# overwriting.
+#
+# Saves are coalesced: the server applies them to an in-memory copy, answers at
+# once, and writes the result at most once per NOTES_COALESCE_SECONDS (and at
+# shutdown). That write is a transaction that checks the stored version, so two
+# instances can't silently overwrite each other either. When it finds another
+# instance wrote first, the buffered notes (already acknowledged to the
+# client) are kept, not dropped: every save not based on the stored version
+# gets a 409 carrying it, so the editor can keep its copy (a full overwrite
+# based on the stored version) or load the other one. Bodies over
+# NOTES_COMPRESS_BYTES are stored zlib-compressed.
+#
+# Notes of a project that doesn't exist or is being deleted (tombstoned) are
+# NotFound; the write transaction checks that too, so a late flush can't
+# recreate a project the reaper already removed.
+#
+# Patch offsets are UTF-16 code units, which is what the browser's string
+# indices count.
+
+NOTES_COALESCE_SECONDS = float(os.getenv("NOTES_COALESCE_SECONDS", 2))
+NOTES_COMPRESS_BYTES = int(os.getenv("NOTES_COMPRESS_BYTES", 4096))
+
+
+def notes_path(uid, project_id):
+    return f"{project_path(uid, project_id)}/meta/notes"
+
+
+class NotesConflict(Exception):
+    def __init__(self, current=None):
+        super().__init__("Notes were changed by someone else")
+        self.current = current
+
+
+def encode_body(content):
+    raw = content.encode("utf-8")
+    if len(raw) >= NOTES_COMPRESS_BYTES:
+        return {"content": None, "content_z": zlib.compress(raw, 6), "encoding": "zlib"}
+    return {"content": content, "content_z": None, "encoding": "plain"}
+
+
+def decode_body(doc):
+    if doc.get("encoding") == "zlib":
+        return zlib.decompress(doc["content_z"]).decode("utf-8")
+    return doc.get("content") or ""
+
+
+def apply_patch(base, patch):
+    # patch: {"start", "end", "text"} or a list of them, applied in order;
+    # [start, end) of the current text is replaced by `text`
+    units = base.encode("utf-16-le", "surrogatepass")
+    for op in patch if isinstance(patch, list) else [patch]:
+        start, end, text = int(op["start"]), int(op["end"]), op.get("text") or ""
+        if not 0 <= start <= end <= len(units) // 2:
+            raise ValueError(f"Patch range {start}-{end} is outside the note")
+        units = units[:2 * start] + text.encode("utf-16-le", "surrogatepass") + units[2 * end:]
+    return units.decode("utf-16-le", "surrogatepass")
+
+
+class NotesState:
+    def __init__(self, version, title, content, legacy=False):
+        self.version = version
+        self.title = title
+        self.content = content
+        self.persisted_version = version
+        self.legacy = legacy  # still has a copy in the project doc
+        self.dirty = False
+        self.conflict = None  # snapshot another instance stored over our base, until resolved
+
+    def snapshot(self):
+        return {"version": self.version, "title": self.title, "content": self.content}
+
+
+class NotesBuffer:
+    def __init__(self):
+        self.states = {}  # only notes with unwritten (or in-flight) saves
+        self.timers = {}
+        self.tasks = set()
+
+    async def get(self, uid, project_id):
+        state = self.states.get((uid, project_id)) or await self._load(uid, project_id)
+        snapshot = state.snapshot()
+        if state.conflict is not None:
+            snapshot["conflict"] = state.conflict
+        return snapshot
+
+    async def save(self, uid, project_id, base_version=None, title=None, patch=None, content=None):
+        key = (uid, project_id)
+        state = self.states.get(key)
+        if state is None:
+            loaded = await self._load(uid, project_id)
+            state = self.states.setdefault(key, loaded)
+
+        if state.conflict is not None:
+            # Only a save based on the version another instance stored resolves it
+            if base_version is not None and int(base_version) != state.conflict["version"]:
+                raise NotesConflict(state.conflict)
+            current = state.conflict
+            state.version = state.persisted_version = current["version"]
+            state.title, state.content = current["title"], current["content"]
+            state.legacy, state.conflict = False, None
+        # No base_version = old client doing a full overwrite
+        elif base_version is not None and int(base_version) != state.version:
+            raise NotesConflict(state.snapshot())
+
+        if patch is not None:
+            new_content = apply_patch(state.content, patch)
+        elif content is not None:
+            new_content = content
+        else:
+            new_content = state.content
+
+        state.content = new_content
+        if title is not None:
+            state.title = title
+        state.version += 1
+        state.dirty = True
+        self._schedule(key)
+        return state.version
+
+    def forget(self, uid, project_id):
+        key = (uid, project_id)
+        self.states.pop(key, None)
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+    async def flush_all(self):
+        for key in list(self.states):
+            await self.flush(key)
+
+    def _schedule(self, key):
+        if key not in self.timers:
+            loop = asyncio.get_running_loop()
+            self.timers[key] = loop.call_later(NOTES_COALESCE_SECONDS, self._spawn_flush, key)
+
+    def _spawn_flush(self, key):
+        task = asyncio.create_task(self.flush(key))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def flush(self, key):
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        state = self.states.get(key)
+        if state is None or not state.dirty or state.conflict is not None:
+            return
+
+        uid, project_id = key
+        snapshot = state.snapshot()
+        expected, legacy = state.persisted_version, state.legacy
+        state.dirty = False
+        try:
+            await store.transaction(lambda txn: _write(txn, uid, project_id, snapshot, expected, legacy))
+        except NotesConflict as e:
+            # Another instance wrote first: keep ours buffered until a client resolves it
+            log.warning("⚠️ [NOTES] Conflicting write from another instance", project_id=project_id)
+            state.dirty = True
+            state.conflict = e.current
+            # Never equal to the stored version, so no save based on ours resolves it by accident
+            state.version = max(state.version, e.current["version"]) + 1
+            return
+        except NotFound:
+            log.warning("⚠️ [NOTES] Project is gone, dropping unsaved notes", project_id=project_id)
+            if self.states.get(key) is state:
+                self.states.pop(key)
+            return
+        except Exception as e:
+            log.warning("⚠️ [NOTES] Flush failed, will retry", project_id=project_id, error=str(e))
+            state.dirty = True
+            self._schedule(key)
+            return
+
+        state.persisted_version = snapshot["version"]
+        if legacy:
+            state.legacy = False
+            project_cache.invalidate(uid, project_id)
+        log.debug("📝 [NOTES] Saved", project_id=project_id, version=snapshot["version"])
+        # Saves that arrived during the write keep it buffered (and scheduled)
+        if not state.dirty and self.states.get(key) is state:
+            self.states.pop(key)
+
+    async def _load(self, uid, project_id):
+        project = await project_cache.get(uid, project_id)
+        if project is None:
+            raise NotFound(project_path(uid, project_id))
+        doc = await store.get(notes_path(uid, project_id))
+        if doc is not None:
+            return NotesState(doc.get("version", 0), doc.get("title", "Untitled Note"), decode_body(doc))
+
+        # Notes saved before they had their own document
+        content = project.get("notes_html") or ""
+        return NotesState(0, project.get("notes_title") or "Untitled Note", content, legacy=bool(content))
+
+
+def _stored_snapshot(doc):
+    doc = doc or {}
+    return {"version": doc.get("version", 0), "title": doc.get("title", "Untitled Note"),
+            "content": decode_body(doc)}
+
+
+def _write(txn, uid, project_id, snapshot, expected, legacy):
+    project = txn.get(project_path(uid, project_id))
+    if project is None or project.get("deleted"):
+        raise NotFound(project_path(uid, project_id))
+    path = notes_path(uid, project_id)
+    stored = txn.get(path)
+    if (stored or {}).get("version", 0) != expected:
+        raise NotesConflict(_stored_snapshot(stored))
+    txn.set(path, {
+        "version": snapshot["version"],
+        "title": snapshot["title"],
+        "updated_at": datetime.now(timezone.utc),
+        **encode_body(snapshot["content"])
+    })
+    if legacy:
+        # Drop the old copy so the project doc gets light again
+        txn.update(project_path(uid, project_id), {"notes_html": "", "notes_title": snapshot["title"]})
+
+
+notes_buffer = NotesBuffer()
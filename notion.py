@@ -0,0 +1,189 @@
+import os
+import time
+import asyncio
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import httpx
+from metrics import span
+from logs import get_logger
+
+log = get_logger("notion")
+
+# --- NOTION EXPORT ---
+# One pooled httpx client for the whole process (opened/closed in the app
+# lifespan) instead of a new client + TLS handshake per export.
+#
+# Notion caps a rich-text item at 2000 chars and a request at 100 children, so
+# content is split into paragraph blocks of <= NOTION_TEXT_LIMIT chars; the page
+# is created with the first 100 and the rest are appended in sequential batches
+# (appends must stay in order). Every request takes a token from a bucket
+# sized to Notion's ~3 req/s limit; a 429 drains the bucket for `Retry-After`.
+
+NOTION_TOKEN = os.getenv("NOTION_TOKEN")
+PARENT_PAGE_ID = os.getenv("PARENT_PAGE_ID")
+NOTION_API = "https://api.notion.com/v1"
+NOTION_VERSION = "2022-06-28"
+
+NOTION_TEXT_LIMIT = 2000
+NOTION_CHILDREN_LIMIT = 100
+NOTION_RATE = float(os.getenv("NOTION_RATE", 3))  # requests per second
+NOTION_BURST = int(os.getenv("NOTION_BURST", 3))
+NOTION_MAX_RETRIES = int(os.getenv("NOTION_MAX_RETRIES", 5))
+NOTION_TIMEOUT = float(os.getenv("NOTION_TIMEOUT", 30))
+NOTION_RETRY_AFTER = 1.0  # seconds, when a 429 has no usable Retry-After
+
+
+class NotionError(Exception):
+    def __init__(self, status_code, body):
+        super().__init__(f"Notion returned {status_code}")
+        self.status_code = status_code
+        self.body = body
+
+
+def retry_after_seconds(value, default=NOTION_RETRY_AFTER):
+    # Retry-After is either delay-seconds or an HTTP-date
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def error_body(response):
+    # Notion errors are JSON, but a proxy or gateway in between may not be
+    try:
+        return response.json()
+    except ValueError:
+        return {"message": response.text}
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        # The lock keeps waiters in FIFO order
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        # Server said slow down: nobody sends until the window passes
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+def split_text(text, limit=NOTION_TEXT_LIMIT):
+    # Prefer breaking on paragraph, then line, then word boundaries
+    chunks = []
+    for paragraph in text.split("\n\n"):
+        paragraph = paragraph.strip("\n")
+        while len(paragraph) > limit:
+            cut = max(paragraph.rfind("\n", 0, limit), paragraph.rfind(" ", 0, limit))
+            if cut <= 0:
+                cut = limit
+            chunks.append(paragraph[:cut])
+            paragraph = paragraph[cut:].lstrip("\n ")
+        if paragraph:
+            chunks.append(paragraph)
+    return chunks
+
+
+def paragraph_block(text):
+    return {
+        "object": "block",
+        "type": "paragraph",
+        "paragraph": {"rich_text": [{"type": "text", "text": {"content": text}}]}
+    }
+
+
+def build_blocks(content):
+    return [paragraph_block(chunk) for chunk in split_text(content or "")]
+
+
+class NotionClient:
+    def __init__(self, token=NOTION_TOKEN, parent_page_id=PARENT_PAGE_ID):
+        self.token = token
+        self.parent_page_id = parent_page_id
+        self.bucket = TokenBucket(NOTION_RATE, NOTION_BURST)
+        self.client = None
+
+    def start(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                base_url=NOTION_API,
+                headers={
+                    "Authorization": f"Bearer {self.token}",
+                    "Content-Type": "application/json",
+                    "Notion-Version": NOTION_VERSION
+                },
+                timeout=NOTION_TIMEOUT,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5)
+            )
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def request(self, method, path, json=None):
+        self.start()
+        for attempt in range(NOTION_MAX_RETRIES + 1):
+            await self.bucket.acquire()
+            async with span("notion", method.lower()) as s:
+                response = await self.client.request(method, path, json=json)
+                s.failed = response.status_code >= 400
+            if response.status_code == 429 and attempt < NOTION_MAX_RETRIES:
+                retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+                log.warning("⏳ [NOTION] Rate limited", retry_after=retry_after)
+                self.bucket.pause(retry_after)
+                continue
+            if response.status_code >= 500 and attempt < NOTION_MAX_RETRIES:
+                await asyncio.sleep(2 ** attempt)
+                continue
+            if response.status_code >= 400:
+                raise NotionError(response.status_code, error_body(response))
+            return response.json()
+
+    async def export_page(self, title, content):
+        blocks = build_blocks(content)
+        page = await self.request("POST", "/pages", json={
+            "parent": {"page_id": self.parent_page_id},
+            "properties": {
+                "title": {"title": [{"text": {"content": title[:NOTION_TEXT_LIMIT]}}]}
+            },
+            "children": blocks[:NOTION_CHILDREN_LIMIT]
+        })
+
+        # Remaining blocks go on in order, one batch at a time
+        for start in range(NOTION_CHILDREN_LIMIT, len(blocks), NOTION_CHILDREN_LIMIT):
+            await self.request("PATCH", f"/blocks/{page['id']}/children", json={
+                "children": blocks[start:start + NOTION_CHILDREN_LIMIT]
+            })
+        log.info("🚀 [NOTION] Exported page", title=title, blocks=len(blocks))
+        return page
+
+
+notion = NotionClient()
@@ -0,0 +1,120 @@
+import os
+import json
+import hashlib
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from cache import LRUCache, SingleFlight
+from store import store, user_path, project_path
+
+# --- PROJECT CACHE ---
+# The project page and the dashboard re-fetch the project doc / project list
+# after nearly every action. Both are read through this cache; every handler
+# that writes a project calls invalidate(uid, project_id) right after writing.
+# The TTL bounds staleness when several instances serve the same user.
+#
+# A per-user generation counter stops a read that started before a write from
+# filling the cache with the old document after the invalidation.
+#
+# GET responses carry an ETag over the JSON body; `If-None-Match` gets a 304.
+#
+# The list cache holds project summaries only (see project_summary). Single
+# project docs are kept whole, since legacy docs serve their inline
+# transcripts from them, so that cache is bounded by PROJECT_CACHE_CHARS of
+# inline transcript and notes text, not just by entry count.
+#
+# Projects being deleted in the background (deletion.py) are tombstoned with
+# `deleted: True`; both reads treat them as already gone.
+
+PROJECT_CACHE_TTL = int(os.getenv("PROJECT_CACHE_TTL", 30))
+PROJECT_CACHE_SIZE = int(os.getenv("PROJECT_CACHE_SIZE", 4096))
+PROJECT_CACHE_CHARS = int(os.getenv("PROJECT_CACHE_CHARS", 64_000_000))
+PROJECT_DOC_CHARS = 1024  # rough weight of a manifest-only project doc
+
+
+def doc_chars(doc):
+    # Approximate size of a project doc, dominated by legacy inline text
+    return PROJECT_DOC_CHARS + len(doc.get("notes_html") or "") + sum(
+        len(s.get("transcript") or "") for s in doc.get("sources", []))
+
+
+class ProjectCache:
+    def __init__(self):
+        self.projects = LRUCache(maxsize=PROJECT_CACHE_CHARS, sizeof=doc_chars, ttl=PROJECT_CACHE_TTL)
+        self.lists = LRUCache(maxsize=PROJECT_CACHE_SIZE, ttl=PROJECT_CACHE_TTL)
+        self.generations = {}
+        self.flights = SingleFlight()
+
+    async def get(self, uid, project_id):
+        # A shallow copy, so callers may add/remove top-level keys
+        key = (uid, project_id)
+        doc = self.projects.get(key)
+        if doc is None:
+            doc = await self._load(self.projects, key, uid, lambda: store.get(project_path(uid, project_id)))
+        return dict(doc) if doc is not None and not doc.get("deleted") else None
+
+    async def list(self, uid):
+        docs = self.lists.get(uid)
+        if docs is None:
+            docs = await self._load(self.lists, uid, uid, lambda: self._stream(uid))
+        return [dict(d) for d in docs if not d.get("deleted")]
+
+    async def _stream(self, uid):
+        return [project_summary(d) for _, d in await store.stream(f"{user_path(uid)}/projects")]
+
+    async def _load(self, cache, key, uid, fetch):
+        generation = self.generations.get(uid, 0)
+
+        async def load():
+            value = await fetch()
+            if value is not None and self.generations.get(uid, 0) == generation:
+                cache.set(key, value)
+            return value
+
+        # Readers only share a fetch that started after the latest invalidation
+        return await self.flights.do((id(cache), key, generation), load)
+
+    def invalidate(self, uid, project_id=None):
+        self.generations[uid] = self.generations.get(uid, 0) + 1
+        self.lists.pop(uid)
+        if project_id is not None:
+            self.projects.pop((uid, project_id))
+
+    def stats(self):
+        return {"projects": self.projects.stats(), "lists": self.lists.stats()}
+
+
+def source_manifest(source):
+    transcript = source.get("transcript")
+    return {
+        "id": source.get("id") or source.get("video_id"),
+        "url": source.get("url"),
+        "title": source.get("title"),
+        "timestamp": source.get("timestamp"),
+        "size": source.get("size", len(transcript) if transcript else 0)
+    }
+
+
+def project_summary(doc):
+    # What the project page and the dashboard list get: a source manifest
+    # (transcript bodies are fetched per source on demand) and no notes (they
+    # have their own endpoint, notes.py). Legacy docs still carry both inline.
+    summary = {k: v for k, v in doc.items() if k not in ("notes_html", "notes_title")}
+    summary["sources"] = [source_manifest(s) for s in doc.get("sources", [])]
+    return summary
+
+
+def etag_response(request, payload):
+    # Weak ETag over the serialized body; 304 if the client already has it
+    body = jsonable_encoder(payload)
+    digest = hashlib.sha1(json.dumps(body, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+    etag = f'W/"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(body, headers=headers)
+
+
+project_cache = ProjectCache()
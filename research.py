@@ -0,0 +1,176 @@
+import os
+import re
+import asyncio
+import hashlib
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from cache import LRUCache, SingleFlight
+from metrics import span
+from admission import take_token
+from logs import get_logger
+
+log = get_logger("research")
+
+# --- DEEP RESEARCH AGENT ---
+# Groq turns a transcript excerpt into a few search queries, then every Tavily
+# search runs at once (each with its own timeout). Results are merged by
+# normalized URL, keeping the best score, and reported as each query finishes
+# so the UI can show cards before the slowest search returns.
+#
+# Both the generated query list and each query's Tavily results are cached
+# (TTL + LRU) under a hash of the normalized text, so re-running research on
+# the same source within RESEARCH_CACHE_TTL costs no Groq/Tavily quota.
+
+RESEARCH_MAX_QUERIES = int(os.getenv("RESEARCH_MAX_QUERIES", 3))
+RESEARCH_RESULTS_PER_QUERY = int(os.getenv("RESEARCH_RESULTS_PER_QUERY", 3))
+RESEARCH_QUERY_TIMEOUT = float(os.getenv("RESEARCH_QUERY_TIMEOUT", 8))
+RESEARCH_CONTEXT_CHARS = 4000
+RESEARCH_CACHE_TTL = int(os.getenv("RESEARCH_CACHE_TTL", 3600))
+RESEARCH_CACHE_SIZE = int(os.getenv("RESEARCH_CACHE_SIZE", 2048))
+
+query_cache = LRUCache(maxsize=RESEARCH_CACHE_SIZE, ttl=RESEARCH_CACHE_TTL)
+search_cache = LRUCache(maxsize=RESEARCH_CACHE_SIZE, ttl=RESEARCH_CACHE_TTL)
+_flights = SingleFlight()
+
+# Exact names only: a prefix like "ref" would also strip `reference=`/`refresh=`
+TRACKING_PARAMS = frozenset({"fbclid", "gclid", "ref"})
+TRACKING_PREFIXES = ("utm_",)
+
+
+def cache_key(text):
+    normalized = " ".join(text.lower().split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def cache_stats():
+    return {"queries": query_cache.stats(), "searches": search_cache.stats()}
+
+
+def _is_tracking(param):
+    param = param.lower()
+    return param in TRACKING_PARAMS or param.startswith(TRACKING_PREFIXES)
+
+
+def normalize_url(url):
+    parts = urlsplit((url or "").strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query) if not _is_tracking(k)])
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower() or "https", host, path, query, ""))
+
+
+def sanitize_queries(raw_output):
+    # --- THE SANITIZER ---
+    # 1. Split by newline
+    # 2. Use regex to remove "1. ", "2) ", etc.
+    # 3. Filter out any empty strings to satisfy Tavily
+    queries = []
+    for line in raw_output.split('\n'):
+        clean_line = re.sub(r'^\d+[\.\)\-\s]+', '', line).strip().strip('"')
+        if clean_line and clean_line not in queries:
+            queries.append(clean_line)
+    return queries[:RESEARCH_MAX_QUERIES]
+
+
+async def generate_queries(groq_client, context_text):
+    excerpt = context_text[:RESEARCH_CONTEXT_CHARS]
+    key = cache_key(excerpt)
+    queries = query_cache.get(key)
+    if queries is not None:
+        return queries
+
+    async def generate():
+        queries = await _generate_queries(groq_client, excerpt)
+        if queries:
+            query_cache.set(key, queries)
+        return queries
+
+    return await _flights.do(("queries", key), generate)
+
+
+async def _generate_queries(groq_client, excerpt):
+    # 1. Groq generates 3 targeted queries with a strict System Prompt
+    await take_token("groq")
+    async with span("groq", "queries"):
+        completion = await groq_client.chat.completions.create(
+            model="llama-3.1-8b-instant",
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are a research assistant. Output ONLY search queries, one per line. No numbers, no intro, no chatter."
+                },
+                {
+                    "role": "user",
+                    "content": f"Generate 3 deep-dive search queries for this text:\n\n{excerpt}"
+                }
+            ],
+            temperature=0.3 # Lower temperature for more consistent formatting
+        )
+    return sanitize_queries(completion.choices[0].message.content.strip())
+
+
+async def search_query(tavily_client, query):
+    key = cache_key(query)
+    results = search_cache.get(key)
+    if results is not None:
+        return results
+
+    async def search():
+        log.debug("🚀 [AGENT] Searching", query=query)
+        # Basic depth is faster for hackathon speed
+        await take_token("tavily")
+        async with span("tavily", "search"):
+            response = await asyncio.wait_for(
+                tavily_client.search(query=query, search_depth="basic", max_results=RESEARCH_RESULTS_PER_QUERY),
+                timeout=RESEARCH_QUERY_TIMEOUT
+            )
+        # Only successful searches are cached; timeouts/errors are retried next time
+        results = response.get("results", [])
+        search_cache.set(key, results)
+        return results
+
+    try:
+        return await _flights.do(("search", key), search)
+    except asyncio.TimeoutError:
+        log.warning("⚠️ [TAVILY SKIP] Query timed out", query=query, timeout=RESEARCH_QUERY_TIMEOUT)
+    except Exception as e:
+        log.warning("⚠️ [TAVILY SKIP] Query failed", query=query, error=str(e))
+    return []
+
+
+class ResultSet:
+    def __init__(self):
+        self.by_url = {}
+
+    def merge(self, results):
+        # Returns the results that were new (or improved) for this batch
+        fresh = []
+        for result in results:
+            key = normalize_url(result.get("url"))
+            current = self.by_url.get(key)
+            if current is None or result.get("score", 0) > current.get("score", 0):
+                self.by_url[key] = result
+                fresh.append(result)
+        return fresh
+
+    def ranked(self):
+        return sorted(self.by_url.values(), key=lambda r: r.get("score", 0), reverse=True)
+
+
+async def run_research(groq_client, tavily_client, context_text):
+    # Async generator of progress events: queries -> results (per query) -> done
+    queries = await generate_queries(groq_client, context_text)
+    yield {"type": "queries", "queries": queries}
+
+    merged = ResultSet()
+    searches = [asyncio.ensure_future(search_query(tavily_client, q)) for q in queries]
+    try:
+        for finished in asyncio.as_completed(searches):
+            fresh = merged.merge(await finished)
+            yield {"type": "results", "results": fresh, "ranked": merged.ranked()}
+    finally:
+        for search in searches:
+            search.cancel()
+
+    yield {"type": "done", "results": merged.ranked()}
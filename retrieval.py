@@ -0,0 +1,222 @@
+import os
+import re
+import math
+import asyncio
+import hashlib
+from collections import Counter
+from cache import LRUCache, SingleFlight
+from metrics import span
+from admission import take_token
+from logs import get_logger
+from store import store
+
+log = get_logger("retrieval")
+
+# --- RETRIEVAL INDEX OVER TRANSCRIPTS ---
+# Transcripts are cut into overlapping word windows ("chunks") and scored with
+# BM25 against the chat question, so chat only sends the top-k chunks instead
+# of every selected transcript in full.
+#
+# The index is built at ingest time and kept in an in-process LRU keyed by
+# video_id. Chunking is deterministic, so a cold instance rebuilds it from the
+# (cached) transcript. Optional Gemini embeddings (RETRIEVAL_EMBEDDINGS=1) are
+# persisted under videos/{video_id}/embeddings/{n} and blended with BM25.
+
+CHUNK_WORDS = int(os.getenv("RETRIEVAL_CHUNK_WORDS", 180))
+CHUNK_OVERLAP = int(os.getenv("RETRIEVAL_CHUNK_OVERLAP", 30))
+CHAT_TOP_K = int(os.getenv("CHAT_TOP_K", 8))
+INDEX_CACHE_CHARS = int(os.getenv("RETRIEVAL_INDEX_CACHE_CHARS", 20_000_000))
+USE_EMBEDDINGS = os.getenv("RETRIEVAL_EMBEDDINGS", "0") == "1"
+EMBED_MODEL = os.getenv("RETRIEVAL_EMBED_MODEL", "text-embedding-004")
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "how",
+    "i", "in", "is", "it", "of", "on", "or", "so", "that", "the", "this", "to",
+    "uh", "um", "was", "we", "what", "when", "where", "which", "who", "why",
+    "with", "you", "your",
+}
+
+index_cache = LRUCache(maxsize=INDEX_CACHE_CHARS, sizeof=lambda index: index.size)
+_flights = SingleFlight()
+
+
+def tokenize(text):
+    return [t for t in re.findall(r"\w+", text.lower()) if t not in STOPWORDS]
+
+
+def chunk_text(text, words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    tokens = text.split()
+    if not tokens:
+        return []
+    step = max(1, words - overlap)
+    chunks = []
+    for start in range(0, len(tokens), step):
+        chunks.append(" ".join(tokens[start:start + words]))
+        if start + words >= len(tokens):
+            break
+    return chunks
+
+
+def chunk_start_word(n, words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    # Index of the first word of chunk n in text.split()
+    return n * max(1, words - overlap)
+
+
+class VideoIndex:
+    def __init__(self, video_id, chunks):
+        self.video_id = video_id
+        self.chunks = chunks
+        self.tfs = [Counter(tokenize(chunk)) for chunk in chunks]
+        self.lengths = [sum(tf.values()) for tf in self.tfs]
+        self.size = sum(len(chunk) for chunk in chunks) or 1
+        # Content hash of the transcript (keys the chat answer cache)
+        self.digest = hashlib.sha1("\n".join(chunks).encode("utf-8")).hexdigest()
+        self.vectors = None
+
+
+def build_index(video_id, text):
+    return VideoIndex(video_id, chunk_text(text))
+
+
+async def index_video(video_id, text, client=None):
+    # Called from the ingest job so the first chat after an upload is warm
+    index = await asyncio.to_thread(build_index, video_id, text)
+    if USE_EMBEDDINGS and client is not None:
+        index.vectors = await _load_or_embed(video_id, index.chunks, client)
+    index_cache.set(video_id, index)
+    return index
+
+
+async def get_index(video_id, load_text, client=None):
+    index = index_cache.get(video_id)
+    if index is not None:
+        return index
+
+    async def load():
+        return await index_video(video_id, await load_text(), client=client)
+
+    return await _flights.do(video_id, load)
+
+
+async def search(sources_with_indexes, question, k=CHAT_TOP_K, client=None):
+    # sources_with_indexes: [(source_dict, VideoIndex)]; returns the top-k hits
+    docs = [
+        (source, index, n)
+        for source, index in sources_with_indexes
+        for n in range(len(index.chunks))
+    ]
+    if not docs:
+        return []
+
+    scores = _bm25(docs, tokenize(question or ""))
+    if USE_EMBEDDINGS and client is not None and all(index.vectors for _, index in sources_with_indexes):
+        query_vector = (await _embed(client, [question]))[0]
+        scores = _blend(scores, [_cosine(query_vector, index.vectors[n]) for _, index, n in docs])
+
+    if not any(scores):
+        # Nothing matched (e.g. "summarize this"): sample evenly across sources
+        return _spread(sources_with_indexes, k)
+
+    ranked = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)[:k]
+    return [_hit(docs[i], scores[i]) for i in ranked]
+
+
+def format_context(hits):
+    blocks = []
+    for hit in hits:
+        blocks.append(f"[{hit['title']} · part {hit['chunk'] + 1}]\n{hit['text']}")
+    return "\n\n".join(blocks)
+
+
+def _hit(doc, score):
+    source, index, n = doc
+    return {
+        "source_id": index.video_id,
+        "title": source.get("title") or index.video_id,
+        "url": source.get("url"),
+        "chunk": n,
+        "text": index.chunks[n],
+        "score": round(score, 4),
+    }
+
+
+def _bm25(docs, query_terms):
+    terms = set(query_terms)
+    if not terms:
+        return [0.0] * len(docs)
+
+    total = len(docs)
+    avg_len = sum(index.lengths[n] for _, index, n in docs) / total or 1
+    df = {t: sum(1 for _, index, n in docs if t in index.tfs[n]) for t in terms}
+    idf = {t: math.log(1 + (total - df[t] + 0.5) / (df[t] + 0.5)) for t in terms}
+
+    scores = []
+    for _, index, n in docs:
+        tf, length = index.tfs[n], index.lengths[n]
+        score = 0.0
+        for t in terms:
+            freq = tf.get(t, 0)
+            if freq:
+                score += idf[t] * freq * (BM25_K1 + 1) / (freq + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_len))
+        scores.append(score)
+    return scores
+
+
+def _spread(sources_with_indexes, k):
+    hits = []
+    per_source = max(1, k // max(1, len(sources_with_indexes)))
+    for source, index in sources_with_indexes:
+        count = len(index.chunks)
+        if not count:
+            continue
+        step = max(1, count // per_source)
+        for n in range(0, count, step)[:per_source]:
+            hits.append(_hit((source, index, n), 0.0))
+    return hits[:k]
+
+
+# --- Optional embeddings ---
+def _blend(bm25_scores, cosine_scores):
+    top = max(bm25_scores) or 1
+    return [0.5 * (b / top) + 0.5 * max(c, 0) for b, c in zip(bm25_scores, cosine_scores)]
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+async def _embed(client, texts):
+    vectors = []
+    for start in range(0, len(texts), 100):
+        batch = texts[start:start + 100]
+        await take_token("gemini")
+        async with span("gemini", "embed"):
+            result = await client.aio.models.embed_content(model=EMBED_MODEL, contents=batch)
+        vectors.extend(list(e.values) for e in result.embeddings)
+    return vectors
+
+
+async def _load_or_embed(video_id, chunks, client):
+    collection = f"videos/{video_id}/embeddings"
+    try:
+        stored = await store.stream(collection, order_by="n")
+        if len(stored) == len(chunks):
+            return [d["vector"] for _, d in stored]
+
+        vectors = await _embed(client, chunks)
+        batch = store.batch()
+        for n, vector in enumerate(vectors):
+            batch.set(f"{collection}/{n}", {"n": n, "vector": vector})
+            if len(batch) >= 400:
+                await batch.commit()
+        await batch.commit()
+        return vectors
+    except Exception as e:
+        # Embeddings are an optional boost; BM25 alone still works
+        log.warning("⚠️ [RETRIEVAL] Embeddings unavailable", video_id=video_id, error=str(e))
+        return None
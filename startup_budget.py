@@ -0,0 +1,54 @@
+import os
+import sys
+import json
+import statistics
+import subprocess
+
+# --- STARTUP BUDGET CHECK ---
+# Imports `main` in fresh interpreters and fails (exit 1) if the median import
+# time goes over STARTUP_BUDGET_SECONDS, or if any of the heavy SDKs that are
+# meant to load lazily got pulled in at import time again.
+#
+#   python startup_budget.py
+
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", 1.0))
+STARTUP_BUDGET_RUNS = int(os.getenv("STARTUP_BUDGET_RUNS", 5))
+
+LAZY_MODULES = ("google.genai", "groq", "tavily", "yt_dlp", "youtube_transcript_api", "firebase_admin")
+
+PROBE = f"""
+import sys, time, json
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def measure():
+    here = os.path.dirname(os.path.abspath(__file__))
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=here, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    measure()  # first run fills __pycache__; not counted
+    runs = [measure() for _ in range(STARTUP_BUDGET_RUNS)]
+    median = statistics.median(r["seconds"] for r in runs)
+    loaded = sorted({m for r in runs for m in r["loaded"]})
+
+    print(f"⏱️ [STARTUP] import main: median {median:.3f}s over {len(runs)} runs (budget {STARTUP_BUDGET_SECONDS:.3f}s)")
+    ok = True
+    if median > STARTUP_BUDGET_SECONDS:
+        print("❌ [STARTUP] Over budget")
+        ok = False
+    if loaded:
+        print(f"❌ [STARTUP] Loaded at import time: {', '.join(loaded)}")
+        ok = False
+    if ok:
+        print("✅ [STARTUP] Within budget")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1251 @@
+    // --- 0. BREADCRUMB: IDs CHECK ---
+    const userUid = localStorage.getItem("user_uid");
+    // filter(Boolean) ensures we don't get an empty ID from a trailing slash
+    const projectId = window.location.pathname.split('/').filter(Boolean).pop();
+
+    // This bridges the gaps so your code doesn't throw ReferenceErrors
+    // const collection = (db, ...path) => db.collection(path.join('/'));
+    // const doc = (db, ...path) => db.doc(path.join('/'));
+    // const getDocs = (ref) => ref.get();
+    // const addDoc = (ref, data) => ref.add(data);
+    // const deleteDoc = (ref) => ref.delete();
+    // const serverTimestamp = firebase.firestore.FieldValue.serverTimestamp;
+
+    let selectedContext = [];
+    let allProjectSources = [];
+    
+    console.log("📍 [STEP 1] Script loaded. Checking IDs...");
+    console.log("   - User UID:", userUid);
+    console.log("   - Project ID:", projectId);
+
+    // --- TAB SWITCHING LOGIC ---
+    function switchTab(evt, tabId) {
+        console.log(`📑 [TAB] Switching to: ${tabId}`);
+        let contents = document.getElementsByClassName("tab-content");
+        for (let content of contents) content.classList.remove("active");
+
+        let tabs = document.getElementsByClassName("tab");
+        for (let tab of tabs) tab.classList.remove("active");
+
+        document.getElementById(tabId).classList.add("active");
+        evt.currentTarget.classList.add("active");
+    }
+
+    function truncateTitle(title, limit = 11) {
+        if (title.length > limit) {
+            return title.substring(0, limit) + "...";
+        }
+        return title;
+    }
+
+    // --- TRANSCRIPTS (fetched lazily, the project manifest has no bodies) ---
+    const transcriptCache = {};
+
+    async function fetchTranscript(sourceId) {
+        if (transcriptCache[sourceId] !== undefined) return transcriptCache[sourceId];
+
+        const response = await fetch(`/api/${userUid}/projects/${projectId}/sources/${sourceId}/transcript`);
+        if (!response.ok) throw new Error(`Transcript fetch failed: ${response.status}`);
+
+        const data = await response.json();
+        transcriptCache[sourceId] = data.transcript || "";
+        return transcriptCache[sourceId];
+    }
+
+    // --- POPUP LOGIC ---
+    async function openModal(title, link, sourceId) {
+        console.log(`🖼️ [MODAL] Opening: ${title}`);
+        const transcriptElem = document.getElementById("modal-transcript");
+        document.getElementById("modal-title").innerText = title;
+        document.getElementById("modal-link").href = link;
+        transcriptElem.innerText = "Loading transcript...";
+        document.getElementById("video-modal").style.display = "flex";
+
+        try {
+            transcriptElem.innerText = await fetchTranscript(sourceId);
+        } catch (err) {
+            console.error("❌ [MODAL] Transcript load failed:", err);
+            transcriptElem.innerText = "Could not load the transcript.";
+        }
+    }
+
+    function closeModal() {
+        document.getElementById("video-modal").style.display = "none";
+    }
+
+    // --- 1. Initial Load: Get Project Name and existing Squircles ---
+    async function initializeProject() {
+        console.log("📍 [STEP 2] initializeProject() started...");
+
+        if (!userUid || !projectId) {
+            console.error("❌ [ERROR] Missing critical IDs. Stopping execution.");
+            return;
+        }
+
+        try {
+            console.log(`📍 [STEP 3] Calling Python API: /api/${userUid}/projects/${projectId}`);
+            const response = await fetch(`/api/${userUid}/projects/${projectId}`);
+            
+            console.log("📍 [STEP 4] API Response received. Status:", response.status);
+
+            if (response.ok) {
+                const data = await response.json();
+                console.log("📍 [STEP 5] Data parsed successfully:", data);
+
+                // Save all sources globally so the Context Manager (+) can see them
+                allProjectSources = data.sources || [];
+
+                populateResearchDropdown();
+
+                // --- INSERTED: Fetch saved bookmarks from Firestore ---
+                await loadBookmarks(projectId); 
+
+
+                if (allBookmarks && allBookmarks.length > 0) {
+                    console.log(`📍 [DEBUG] Rendering ${allBookmarks.length} saved bookmarks...`);
+                    renderResearchCards(allBookmarks);
+                } else {
+                    console.log("📍 [DEBUG] No bookmarks found in DB to render.");
+                }
+
+                // --- ADDED LINE: Update the new Right-Anchored Project Title ---
+                const navTitleElem = document.getElementById("project-title-display");
+                if (navTitleElem) {
+                    navTitleElem.innerText = data.name || "Untitled Project";
+                }
+                // -------------------------------------------------------------
+
+                // Update Old Title Display (if you're still using it)
+                const titleElem = document.getElementById("title-display");
+                if (titleElem) {
+                    titleElem.innerText = "🛡️ " + (data.name || "Untitled Project");
+                    console.log("📍 [STEP 6] Title updated on UI.");
+                }
+
+                // Render existing sources in the Bank
+                if (allProjectSources.length > 0) {
+                    console.log(`📍 [STEP 7] Sources found! Count: ${allProjectSources.length}. Sending to renderer...`);
+                    renderVideoBank(allProjectSources);
+                } else {
+                    console.warn("⚠️ [WARNING] No sources found in database.");
+                }
+
+                // Load persistent chat history
+                loadChatHistory(); 
+                
+            } else {
+                console.error(`❌ [ERROR] API returned bad status code: ${response.status}`);
+            }
+        } catch (err) {
+            console.error("❌ [ERROR] Network or JS Crash during initialization:", err);
+        }
+    }
+    
+// --- 2. Render the "Squircles" (Used for History/Reload) ---
+function renderVideoBank(sources) {
+        console.log("📍 [STEP 8] renderVideoBank() loop started...");
+        const grid = document.getElementById("video-grid");
+        
+        if (!grid) {
+            console.error("❌ [FATAL] Could not find #video-grid in the HTML. Renderer stopped.");
+            return;
+        }
+
+        grid.innerHTML = ""; // Clear "No sources" text
+        
+        sources.forEach((src, index) => {
+            console.log(`✨ [STEP 9.${index}] Drawing squircle for:`, src.id || src.video_id);
+            
+            // Check for BOTH keys to be safe
+            const actualId = src.id || src.video_id || "Unknown";
+            const fullTitle = src.title || `Video ${actualId.substring(0,5)}`;
+
+            // --- NEW FUNCTIONALITY: Truncate for UI only ---
+            const charLimit = 11; 
+            let displayTitle = fullTitle;
+            
+            if (fullTitle.length > charLimit) {
+                displayTitle = fullTitle.substring(0, charLimit) + "...";
+                console.log(`🍞 [BREADCRUMB] Truncated title for grid: ${displayTitle}`);
+            }
+            // -----------------------------------------------
+
+            const squircle = document.createElement("div");
+            squircle.className = "video-squircle";
+            
+            // Use the truncated title for the visual grid
+            squircle.innerText = displayTitle;
+            
+            // CRITICAL: Pass 'fullTitle' to the modal so the user sees everything
+            squircle.onclick = () => openModal(fullTitle, src.url, actualId);
+            
+            grid.appendChild(squircle);
+        });
+        
+        console.log("📍 [STEP 10] All history records drawn.");
+    }
+
+    // --- 3. Add Single Squircle (Used for Live Session) ---
+    function addSquircleToGrid(src) {
+        console.log("📍 [LIVE] Adding single squircle to UI...");
+        const grid = document.getElementById("video-grid");
+        if (!grid) return;
+
+        // 1. Get the full, original title
+        const actualId = src.id || src.video_id || "New";
+        const fullTitle = src.title || `Video ${actualId.substring(0,5)}`;
+
+        // 2. APPLY TRUNCATION: Matches your main renderer logic
+        const charLimit = 11; 
+        let displayTitle = fullTitle;
+        
+        if (fullTitle.length > charLimit) {
+            displayTitle = fullTitle.substring(0, charLimit) + "...";
+            console.log(`🍞 [BREADCRUMB] Live-added title truncated to: ${displayTitle}`);
+        }
+
+        const squircle = document.createElement("div");
+        squircle.className = "video-squircle";
+        
+        // 3. Set the truncated text for the visual UI
+        squircle.innerText = displayTitle;
+        
+        // 4. Pass the FULL title to the modal so the user sees everything
+        squircle.onclick = () => {
+            console.log(`🍞 [BREADCRUMB] Opening modal from live-added squircle: ${fullTitle}`);
+            openModal(fullTitle, src.url, actualId);
+        };
+        
+        grid.appendChild(squircle);
+        console.log("📍 [LIVE] UI Updated with new video.");
+    }
+
+    async function processSource() {
+    console.log("🚀 [ACTION] Process Source Button Clicked.");
+    
+    const urlInput = document.getElementById("url-input");
+    const url = urlInput.value;
+    const btn = document.querySelector(".primary-btn"); 
+    const statusText = document.getElementById("video-status"); 
+
+    if (!url) return alert("Please paste a YouTube URL!");
+
+    // Playlists, channels and several pasted links go through the batch ingest
+    const urls = url.split(/[\s,]+/).filter(Boolean);
+    if (urls.length > 1 || /[?&]list=|\/playlist|\/@|\/channel\//.test(url)) {
+        return processBatch(urls, urlInput, btn, statusText);
+    }
+
+    // UI Lock - Prevents double submissions
+    if (btn) {
+        btn.disabled = true;
+        btn.innerText = "⏳ Ingesting...";
+    }
+    if (statusText) statusText.innerText = "🔍 Fetching YouTube Metadata...";
+
+    try {
+        console.log("📍 [TRANS-1] Sending POST request to backend...");
+        const response = await fetch(`/api/${userUid}/projects/${projectId}/transcribe`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ url: url })
+        });
+
+        if (response.ok) {
+            const queued = await response.json();
+            console.log("📍 [TRANS-2] Ingest job queued:", queued.job_id);
+
+            // The backend ingests in the background; poll the job until it finishes
+            const result = await waitForJob(queued.job_id, statusText);
+            console.log("📍 [TRANS-2b] Ingest job finished:", result);
+
+            // --- LIVE UPDATE LOGIC START (No logic tampered, only added) ---
+            
+            // 1. Update the local 'Single Source of Truth' array
+            if (typeof allProjectSources !== 'undefined' && result.new_source) {
+                allProjectSources.push(result.new_source);
+                console.log("🍞 [BREADCRUMB] Local allProjectSources updated.");
+            }
+
+            // 2. Trigger the AI Context list to re-render
+            if (typeof renderContextSelectionList === "function") {
+                renderContextSelectionList();
+                console.log("🍞 [BREADCRUMB] AI Context list re-rendered.");
+            }
+
+            // --- LIVE UPDATE LOGIC END ---
+
+            // 1. Add new squircle to your grid using original function
+            if (typeof addSquircleToGrid === "function") {
+                addSquircleToGrid(result.new_source);
+            }
+            
+            // 2. Update the Active Video Title in the bank
+            const titleDisplay = document.getElementById("current-video-title");
+            if (titleDisplay && result.new_source.title) {
+                titleDisplay.innerText = result.new_source.title;
+            }
+
+            // 3. Reset UI
+            urlInput.value = "";
+            if (statusText) statusText.innerText = "✅ Resource added to Bank!";
+            
+        } else if (response.status === 429) {
+            const wait = response.headers.get("Retry-After") || "a few";
+            if (statusText) statusText.innerText = "";
+            alert(`Too many videos are being added right now. Try again in ${wait}s.`);
+        } else {
+            console.error("❌ [TRANS-ERR] Server returned error status.");
+            alert("Transcription failed. Check if video has captions.");
+        }
+    } catch (err) {
+        console.error("❌ [TRANS-ERR] Ingest failed:", err);
+        if (statusText) statusText.innerText = "";
+        alert("Transcription failed. Check if video has captions.");
+    } finally {
+        // UNLOCK UI
+        if (btn) {
+            btn.disabled = false;
+            btn.innerText = "Process & Save to Bank";
+            console.log("📍 [TRANS-3] Button re-enabled.");
+        }
+    }
+}
+
+    async function processBatch(urls, urlInput, btn, statusText) {
+        if (btn) {
+            btn.disabled = true;
+            btn.innerText = "⏳ Ingesting...";
+        }
+        if (statusText) statusText.innerText = "📜 Expanding playlist...";
+
+        try {
+            const response = await fetch(`/api/${userUid}/projects/${projectId}/transcribe/batch`, {
+                method: "POST",
+                headers: { "Content-Type": "application/json", "Accept": "application/x-ndjson" },
+                body: JSON.stringify({ urls: urls })
+            });
+            if (!response.ok) throw new Error(`Batch ingest failed: ${response.status}`);
+
+            // NDJSON progress: sources arrive in committed groups
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = "";
+            let total = 0, finished = 0, failed = 0;
+
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split("\n");
+                buffer = lines.pop();
+
+                for (const line of lines) {
+                    if (!line.trim()) continue;
+                    const event = JSON.parse(line);
+
+                    if (event.type === "error") throw new Error(event.message);
+                    if (event.type === "expanded") total = event.total;
+                    if (event.type === "video") {
+                        finished += 1;
+                        if (event.status === "failed") failed += 1;
+                    }
+                    if (event.type === "committed") {
+                        event.sources.forEach(src => {
+                            allProjectSources.push(src);
+                            addSquircleToGrid(src);
+                        });
+                        if (typeof renderContextSelectionList === "function") renderContextSelectionList();
+                    }
+                    if (event.type === "done") {
+                        if (statusText) statusText.innerText = `✅ Added ${event.added} videos to Bank` + (event.failed ? ` (${event.failed} failed)` : "");
+                    } else if (statusText && total) {
+                        statusText.innerText = `🔍 Ingesting ${finished}/${total}` + (failed ? ` (${failed} failed)` : "");
+                    }
+                }
+            }
+            urlInput.value = "";
+        } catch (err) {
+            console.error("❌ [BATCH-ERR] Batch ingest failed:", err);
+            if (statusText) statusText.innerText = "";
+            alert("Playlist ingest failed.");
+        } finally {
+            if (btn) {
+                btn.disabled = false;
+                btn.innerText = "Process & Save to Bank";
+            }
+        }
+    }
+
+    const INGEST_STAGE_LABELS = {
+        queued: "⏳ Waiting in the ingest queue...",
+        fetching: "🔍 Fetching YouTube Metadata & Transcript...",
+        saving: "💾 Saving to your Bank...",
+        indexing: "📚 Indexing transcript for chat..."
+    };
+
+    async function waitForJob(jobId, statusText) {
+        while (true) {
+            const response = await fetch(`/api/${userUid}/jobs/${jobId}`);
+            if (!response.ok) throw new Error(`Job lookup failed: ${response.status}`);
+
+            const job = await response.json();
+            if (job.status === "done") return job.result;
+            if (job.status === "failed") throw new Error(job.error || "Ingest failed");
+
+            if (statusText && INGEST_STAGE_LABELS[job.stage]) {
+                statusText.innerText = INGEST_STAGE_LABELS[job.stage];
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000));
+        }
+    }
+
+    function updatePillDisplay() {
+        const container = document.getElementById("context-pill-container");
+        if (!container) return;
+        container.innerHTML = "";
+
+        selectedContext.forEach(source => {
+            const pill = document.createElement("div");
+            pill.className = "context-pill";
+            // Show only first 10 chars in the pill
+            const shortTitle = source.title.length > 10 ? source.title.substring(0, 10) + "..." : source.title;
+            
+            pill.innerHTML = `
+                <span>${shortTitle}</span>
+                <i class="fas fa-times" onclick="removeContext('${source.id}')" style="margin-left:8px; cursor:pointer;"></i>
+            `;
+            container.appendChild(pill);
+        });
+    }
+
+    function removeContext(id) {
+        // 1. Remove from array
+        selectedContext = selectedContext.filter(s => s.id !== id);
+        // 2. Remove gold glow from the squircle in the grid
+        const squircle = document.querySelector(`.video-squircle[data-id="${id}"]`);
+        if (squircle) squircle.classList.remove("selected");
+        // 3. Refresh pills
+        updatePillDisplay();
+    }
+
+    // --- 5. CHAT ASSISTANT LOGIC ---
+    async function sendMessage() {
+    const input = document.getElementById("chat-input");
+    const message = input.value.trim();
+    if (!message) return;
+
+    // 1. Append User Message
+    appendMessage("user", message);
+    input.value = "";
+    autoResize(input);
+
+    // 2. Create the placeholder AI bubble IMMEDIATELY
+    const chatWin = document.getElementById("chat-window");
+    const modelDiv = document.createElement("div");
+    modelDiv.className = "message-bubble model-msg"; // Use your existing class
+    
+    // Create an inner span for the text content
+    const textContainer = document.createElement("span");
+    textContainer.innerHTML = "<i>Chersey is thinking...</i>";
+    modelDiv.appendChild(textContainer);
+    
+    chatWin.appendChild(modelDiv);
+    chatWin.scrollTop = chatWin.scrollHeight;
+
+    try {
+        const response = await fetch(`/api/${userUid}/projects/${projectId}/chat`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ 
+                message: message, 
+                selectedIds: selectedContext.map(c => c.id) 
+            })
+        });
+
+        // Admission control said "not now" (429); nothing was streamed
+        if (response.status === 429) {
+            const wait = response.headers.get("Retry-After") || "a few";
+            textContainer.innerHTML = `<i>Chersey is busy right now. Try again in ${wait}s.</i>`;
+            return;
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let fullText = "";
+
+        // Clear the "Thinking..." text once stream starts
+        textContainer.innerHTML = "";
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+
+            const chunk = decoder.decode(value);
+            const lines = chunk.split("\n");
+
+            lines.forEach(line => {
+                if (line.trim().startsWith("data: ")) {
+                    try {
+                        const jsonStr = line.replace("data: ", "").trim();
+                        const data = JSON.parse(jsonStr);
+                        
+                        if (data.text) {
+                            fullText += data.text;
+                            // UPDATE: Use innerText for streaming (safe and fast)
+                            textContainer.innerText = fullText; 
+                            chatWin.scrollTop = chatWin.scrollHeight;
+                        }
+                    } catch (e) { /* partial chunk */ }
+                }
+            });
+        }
+
+        // 3. FINAL STEP: Now that streaming is done, parse the Markdown and add the "+" button
+        textContainer.innerHTML = marked.parse(fullText);
+        
+        const actionBtn = document.createElement("button");
+        actionBtn.className = "add-to-notes-btn";
+        actionBtn.innerHTML = '<i class="fas fa-plus"></i>';
+        actionBtn.onclick = () => sendToNotes(fullText);
+        modelDiv.appendChild(actionBtn);
+
+    } catch (err) {
+        console.error("❌ Stream Error:", err);
+        textContainer.innerHTML = "<i>Connection lost.</i>";
+    }
+}
+
+        function appendMessage(role, text) {
+        const chatWin = document.getElementById("chat-window");
+        if (!chatWin) return;
+
+        const msgDiv = document.createElement("div");
+        msgDiv.className = `message-bubble ${role === 'user' ? 'user-msg' : 'model-msg'}`;
+        
+        // Convert Markdown to HTML for visual consistency
+        try {
+            msgDiv.innerHTML = marked.parse(text); 
+        } catch (e) {
+            msgDiv.innerText = text;
+        }
+
+        // --- ADD THE "SCRATCHPAD" BUTTON ---
+        if (role === 'model') {
+            const actionBtn = document.createElement("button");
+            actionBtn.className = "add-to-notes-btn";
+            actionBtn.innerHTML = '<i class="fas fa-plus"></i>';
+            actionBtn.title = "Send to Scratchpad";
+            
+            // This captures the 'text' at the moment of creation
+            actionBtn.onclick = () => sendToNotes(text);
+            
+            msgDiv.appendChild(actionBtn);
+        }
+
+        chatWin.appendChild(msgDiv);
+        chatWin.scrollTo({ top: chatWin.scrollHeight, behavior: 'smooth' });
+    }
+
+    async function loadChatHistory() {
+        console.log("📍 [STEP 6] Loading chat history...");
+        try {
+            const response = await fetch(`/api/${userUid}/projects/${projectId}/chats`);
+            if (response.ok) {
+                const data = await response.json();
+                data.history.forEach(m => appendMessage(m.role, m.text));
+            }
+        } catch (err) {
+            console.warn("⚠️ No chat history found or server error.");
+        }
+    }
+
+
+    async function loadChatHistory() {
+        console.log("📍 [STEP 6] Loading chat history from Firestore...");
+        try {
+            // This URL must match your @app.get("/api/{uid}/projects/{project_id}/chats") in main.py
+            const response = await fetch(`/api/${userUid}/projects/${projectId}/chats`);
+            
+            if (response.ok) {
+                const data = await response.json();
+                console.log("📍 [STEP 7] History data received:", data.history);
+
+                const chatWindow = document.getElementById("chat-window");
+                if (!chatWindow) return;
+
+                // 1. Clear the window to prevent message duplication on refresh
+                chatWindow.innerHTML = "";
+
+                // 2. Loop through the documents fetched from the 'chats' collection
+                data.history.forEach(msg => {
+                    // Roles should be 'user' or 'model' to match your Firestore documents
+                    appendMessage(msg.role, msg.text);
+                });
+
+                // 3. Auto-scroll to the bottom so the user sees the latest message
+                chatWindow.scrollTop = chatWindow.scrollHeight;
+                
+                console.log("📍 [STEP 8] Chat UI successfully populated.");
+            } else {
+                console.warn(`⚠️ Failed to fetch history. Status: ${response.status}`);
+            }
+        } catch (err) {
+            console.error("❌ [ERROR] Network crash while loading history:", err);
+        }
+    }
+
+        /**
+     * Adjusts the height of a textarea based on the content length.
+     * @param {HTMLElement} textarea - The textarea element to resize.
+     */
+    function autoResize(textarea) {
+        // 1. Temporarily reset height to 'auto' to get accurate scrollHeight
+        textarea.style.height = 'auto';
+
+        // 2. Set the height to the scrollHeight (the total height of the text inside)
+        // We add 'px' to make it a valid CSS value
+        textarea.style.height = textarea.scrollHeight + 'px';
+        
+        // 3. (Optional) Prevent the container from growing too large
+        // If you want a max height, handle it here or in CSS
+    }
+
+    // --- 6. chat context menu logic ---
+    function toggleContextMenu() {
+        const menu = document.getElementById("context-selection-menu");
+        if (!menu) return;
+        
+        const isHidden = menu.style.display === "none" || menu.style.display === "";
+        
+        if (isHidden) {
+            renderContextSelectionList();
+            menu.style.display = "block";
+        } else {
+            menu.style.display = "none";
+        }
+    }
+
+    function renderContextSelectionList() {
+        const list = document.getElementById("context-list-items");
+        if (!list) return;
+        list.innerHTML = "";
+
+        // allProjectSources must be populated in initializeProject
+        allProjectSources.forEach(src => {
+            const id = src.id || src.video_id;
+            const isActive = selectedContext.some(item => item.id === id);
+            
+            const div = document.createElement("div");
+            div.className = `context-item ${isActive ? 'active' : ''}`;
+            
+            div.innerHTML = `
+                <span>${src.title}</span>
+                <i class="fas ${isActive ? 'fa-check-circle' : 'fa-circle'}" 
+                style="color: ${isActive ? '#ffcc00' : '#444'}; margin-left: 10px;"></i>
+            `;
+            
+            div.onclick = () => {
+                toggleContextItem(src);
+                renderContextSelectionList(); // Refresh the checkmarks
+            };
+            
+            list.appendChild(div);
+        });
+    }
+
+    function toggleContextItem(src) {
+        const id = src.id || src.video_id;
+        const squircle = document.querySelector(`.video-squircle[data-id="${id}"]`);
+        const index = selectedContext.findIndex(item => item.id === id);
+        
+        if (index === -1) {
+            // Add to context
+            selectedContext.push({ id: id, title: src.title });
+            if (squircle) squircle.classList.add("selected");
+        } else {
+            // Remove from context
+            selectedContext.splice(index, 1);
+            if (squircle) squircle.classList.remove("selected");
+        }
+        
+        updatePillDisplay(); // Refresh the rectangular pills in your chat bar
+    }
+
+    function clearAllContext() {
+        selectedContext = [];
+        document.querySelectorAll(".video-squircle").forEach(s => s.classList.remove("selected"));
+        updatePillDisplay();
+        document.getElementById("context-selection-menu").style.display = "none";
+    }
+    
+    // --- EVENT LISTENERS ---
+    window.addEventListener('load', () => {
+        console.log("📍 [STEP 1.5] Window fully loaded. Firing initializeProject...");
+        initializeProject();
+    });
+
+
+    // RHS notepad
+    /** * NOTEPAD LOGIC: Focused on the RHS 
+     */
+     function applyFormat(command) {
+        document.execCommand(command, false, null);
+        document.getElementById("notepad-editor").focus();
+    }
+
+    // Export to Markdown logic
+    function exportMD() {
+        const title = document.getElementById("note-title").value || "Untitled";
+        const content = document.getElementById("notepad-editor").innerText;
+        const blob = new Blob([`# ${title}\n\n${content}`], {type: "text/markdown"});
+        const link = document.createElement("a");
+        link.href = URL.createObjectURL(blob);
+        link.download = `${title}.md`;
+        link.click();
+    }
+
+    /**
+     * BRIDGE LOGIC: Allows LHS to talk to RHS
+     * Call this when you want an AI response to move to your notes!
+     */
+     function sendToNotes(text) {
+        const editor = document.getElementById("notepad-editor");
+        if (!editor) return;
+
+        // 1. Convert Markdown to HTML
+        const htmlSnippet = marked.parse(text);
+
+        // 2. Append the content
+        const noteEntry = `
+            <div class="ai-contribution" style="border-left: 3px solid #bfecac; padding-left: 10px; margin: 15px 0;">
+                ${htmlSnippet}
+            </div>
+            <br>
+        `;
+        editor.innerHTML += noteEntry;
+
+        // 3. THE FIX: Manually trigger the save timer
+        // This starts the 800ms countdown to Firebase
+        if (typeof handleNoteInput === "function") {
+            handleNoteInput();
+        } else {
+            // Fallback: If handleNoteInput isn't ready, call triggerAutoSave directly
+            triggerAutoSave();
+        }
+
+        // 4. Scroll to show the new addition
+        const scrollArea = document.querySelector(".editor-scroll-area");
+        if (scrollArea) scrollArea.scrollTop = scrollArea.scrollHeight;
+    }
+
+    const lhs = document.getElementById('lhs');
+    const rhs = document.getElementById('rhs');
+    const resizer = document.getElementById('drag-bar');
+
+    resizer.addEventListener('mousedown', function(e) {
+        e.preventDefault();
+        document.addEventListener('mousemove', handleMouseMove);
+        document.addEventListener('mouseup', stopResizing);
+        resizer.classList.add('active');
+    });
+
+    function handleMouseMove(e) {
+        // Calculate the new width as a percentage of the screen
+        const containerWidth = document.getElementById('main-container').offsetWidth;
+        const newLhsWidth = (e.clientX / containerWidth) * 100;
+
+        // Set limits (e.g., LHS can't be smaller than 20% or larger than 80%)
+        if (newLhsWidth > 20 && newLhsWidth < 80) {
+            lhs.style.width = `${newLhsWidth}%`;
+            rhs.style.width = `${100 - newLhsWidth}%`;
+        }
+    }
+
+    function stopResizing() {
+        document.removeEventListener('mousemove', handleMouseMove);
+        document.removeEventListener('mouseup', stopResizing);
+        resizer.classList.remove('active');
+    }
+
+    // ... existing applyFormat and exportMD functions ...
+
+    function formatDoc(command, value = null) {
+    const editor = document.getElementById('notepad-editor');
+    
+    if (editor) {
+        // 1. Force focus back to the editor
+        editor.focus();
+        
+        // 2. Execute the format command on the highlighted text
+        document.execCommand(command, false, value);
+        
+        // 3. IMPORTANT: Manually trigger the Auto-Save logic 
+        // because execCommand doesn't always fire the 'input' event
+        if (typeof triggerAutoSave === 'function') {
+            triggerAutoSave(); 
+        }
+    } else {
+        console.error("Could not find notepad-editor. Are you on the right page?");
+    }
+}
+
+// Notes are versioned on the server: each save sends only the changed range
+// (against notesBase, the text of notesVersion) and the version it was based on.
+// A 409 means another tab/device saved in between.
+let notesVersion = 0;
+let notesBase = "";
+let notesBaseTitle = "";
+let notesSaving = false;
+let notesSaveAgain = false;
+
+function diffNotes(before, after) {
+    // Single changed range as UTF-16 offsets (JS string indices), not splitting surrogate pairs
+    let start = 0;
+    const max = Math.min(before.length, after.length);
+    while (start < max && before.charCodeAt(start) === after.charCodeAt(start)) start++;
+    if (start > 0 && isHighSurrogate(before.charCodeAt(start - 1))) start--;
+
+    let end = 0;
+    while (end < max - start &&
+           before.charCodeAt(before.length - 1 - end) === after.charCodeAt(after.length - 1 - end)) end++;
+    if (end > 0 && isLowSurrogate(before.charCodeAt(before.length - end))) end--;
+
+    return { start, end: before.length - end, text: after.slice(start, after.length - end) };
+}
+
+function isHighSurrogate(code) { return code >= 0xD800 && code <= 0xDBFF; }
+function isLowSurrogate(code) { return code >= 0xDC00 && code <= 0xDFFF; }
+
+async function triggerAutoSave() {
+    const editor = document.getElementById("notepad-editor");
+    const titleField = document.getElementById("note-title");
+    const syncStatus = document.getElementById("sync-status");
+
+    if (!editor || !titleField) return;
+
+    // One save in flight; edits made meanwhile go out right after it
+    if (notesSaving) {
+        notesSaveAgain = true;
+        return;
+    }
+
+    // IMPORTANT: Grab innerHTML to keep bold/italic/lists
+    const notesContent = editor.innerHTML; 
+    const notesTitle = titleField.value;
+    if (notesContent === notesBase && notesTitle === notesBaseTitle) return;
+
+    notesSaving = true;
+    if (syncStatus) syncStatus.innerText = "Saving...";
+
+    try {
+        const response = await fetch(`/api/${userUid}/projects/${projectId}/notes`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ 
+                base_version: notesVersion,
+                title: notesTitle, 
+                patch: diffNotes(notesBase, notesContent)
+            })
+        });
+
+        if (response.status === 409) {
+            await resolveNotesConflict(await response.json());
+        } else if (response.ok) {
+            const result = await response.json();
+            notesVersion = result.version;
+            notesBase = notesContent;
+            notesBaseTitle = notesTitle;
+            if (syncStatus) syncStatus.innerText = "Saved to Cloud";
+        } else if (syncStatus) {
+            syncStatus.innerText = "Save failed - Retry later";
+        }
+    } catch (err) {
+        if (syncStatus) syncStatus.innerText = "Offline - Retry later";
+    } finally {
+        notesSaving = false;
+        if (notesSaveAgain) {
+            notesSaveAgain = false;
+            triggerAutoSave();
+        }
+    }
+}
+
+async function resolveNotesConflict(server) {
+    const keepLocal = confirm(
+        "These notes were changed in another tab or device.\n\n" +
+        "OK: keep your version (overwrites the other one)\nCancel: load the other version"
+    );
+    if (keepLocal) {
+        // Rebase onto the server's version by replacing its whole text
+        notesVersion = server.version;
+        notesBase = server.content;
+        notesBaseTitle = server.title;
+        notesSaveAgain = true;
+    } else {
+        applyServerNotes(server);
+        notesSaveAgain = false;
+    }
+    // notesSaveAgain is picked up by the `finally` in triggerAutoSave
+}
+
+function applyServerNotes(notes) {
+    notesVersion = notes.version;
+    notesBase = notes.content || "";
+    notesBaseTitle = notes.title || "";
+    // Inject the HTML tags directly into the contenteditable div
+    document.getElementById("notepad-editor").innerHTML = notesBase;
+    document.getElementById("note-title").value = notesBaseTitle;
+}
+
+async function loadProjectData() {
+    const response = await fetch(`/api/${userUid}/projects/${projectId}/notes`);
+    if (!response.ok) return;
+    applyServerNotes(await response.json());
+}
+
+// This ensures the elements exist before we try to attach listeners
+document.addEventListener('DOMContentLoaded', () => {
+    loadProjectData();
+    const editor = document.getElementById("notepad-editor");
+    const titleField = document.getElementById("note-title");
+
+    if (editor && titleField) {
+        // 1. Listen for typing or formatting in the notepad
+        editor.addEventListener("input", handleNoteInput);
+
+        // 2. Listen for changes in the title
+        titleField.addEventListener("input", handleNoteInput);
+    }
+});
+
+// 1. DOWNLOAD AS PDF
+function downloadPDF() {
+    const element = document.getElementById('notepad-editor');
+    const title = document.getElementById('note-title').value || 'My_Research_Notes';
+    
+    const opt = {
+        margin:       1,
+        filename:     `${title}.pdf`,
+        image:        { type: 'jpeg', quality: 0.98 },
+        html2canvas:  { scale: 2, useCORS: true },
+        jsPDF:        { unit: 'in', format: 'letter', orientation: 'portrait' }
+    };
+
+    // New worker instance to handle the conversion
+    html2pdf().set(opt).from(element).save();
+}
+
+// 2. DOWNLOAD AS MARKDOWN (.md)
+function downloadMarkdown() {
+    const content = document.getElementById('notepad-editor').innerText; // Using innerText to get raw text
+    const title = document.getElementById('note-title').value || 'Notes';
+    
+    const blob = new Blob([content], { type: 'text/markdown' });
+    const url = URL.createObjectURL(blob);
+    const a = document.createElement('a');
+    
+    a.href = url;
+    a.download = `${title}.md`;
+    a.click();
+    URL.revokeObjectURL(url); // Clean up memory
+}
+
+function exportTXT() {
+    // 1. Get the HTML content from the notepad
+    const htmlContent = document.getElementById('notepad-editor').innerHTML;
+    
+    // 2. Convert HTML to plain text (replaces <br> and <div> with newlines)
+    const tempDiv = document.createElement("div");
+    tempDiv.innerHTML = htmlContent;
+    const plainText = tempDiv.textContent || tempDiv.innerText || "";
+
+    // 3. Get the project name for the filename
+    const projectName = document.getElementById('project-title-display').innerText || 'Project_Notes';
+    const fileName = `${projectName.replace(/\s+/g, '_')}_Notes.txt`;
+
+    // 4. Create the Blob and trigger download
+    const blob = new Blob([plainText], { type: 'text/plain' });
+    const link = document.createElement('a');
+    
+    link.href = URL.createObjectURL(blob);
+    link.download = fileName;
+    
+    // Append to body, click, and remove
+    document.body.appendChild(link);
+    link.click();
+    document.body.removeChild(link);
+    
+    console.log("📄 [EXPORT] Text file downloaded successfully.");
+}
+
+
+// Function to show/hide the popup
+function toggleNotionPopup(show) {
+    document.getElementById('notion-popup').style.display = show ? 'flex' : 'none';
+}
+
+async function triggerActualSync() {
+    toggleNotionPopup(false);
+    
+    // Grabbing data from your anchored header and notepad
+    const title = document.getElementById("project-title-display").innerText;
+    const notes = document.getElementById("notepad-editor").innerText;
+
+    // Optional: show a loading state here
+    try {
+        const response = await fetch("/api/export/notion", {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ title, content: notes })
+        });
+
+        const result = await response.json();
+        if (response.ok) {
+            alert("✅ Notes exported to Raghunath's Notion!");
+        } else {
+            console.error("Notion API Error:", result);
+            alert("❌ Export failed. Did you 'Add Connection' in Notion?");
+        }
+    } catch (err) {
+        alert("❌ Connection error. Check backend.");
+    }
+}
+
+// async function loadProjectContext(projectId) {
+//     // 1. Reference the subcollection where your transcripts are stored
+//     const sourcesRef = collection(db, "projects", projectId, "sources");
+    
+//     try {
+//         const querySnapshot = await getDocs(sourcesRef);
+        
+//         // 2. Map the documents into our global 'allProjectSources' array
+//         allProjectSources = querySnapshot.docs.map(doc => ({
+//             id: doc.id,
+//             ...doc.data() // This must contain 'transcript' and 'title' fields
+//         }));
+
+//         console.log("📂 Context Loaded:", allProjectSources.length, "sources found.");
+        
+//         // 3. Immediately fill the research dropdown with these titles
+//         populateResearchDropdown();
+        
+//     } catch (error) {
+//         console.error("Error fetching context:", error);
+//     }
+// }
+
+function populateResearchDropdown() {
+    const selector = document.getElementById("research-context-selector");
+    if (!selector) {
+        console.warn("⚠️ [WARNING] Research selector element not found in DOM.");
+        return;
+    }
+
+    // 1. Clear current options and add the default prompt
+    selector.innerHTML = '<option value="">Select Video Context...</option>';
+
+    // 2. Loop through your globally stored sources
+    allProjectSources.forEach(source => {
+        const option = document.createElement("option");
+        
+        // Use the same unique ID you use for your chatbot context
+        option.value = source.id || source.videoId; 
+        option.textContent = source.title || "Untitled Video";
+        
+        selector.appendChild(option);
+    });
+
+    console.log(`✅ [UI] Research dropdown populated with ${allProjectSources.length} sources.`);
+}
+
+// Add this global variable at the top of your script
+let lastResearchLinks = []; 
+
+async function runDeepResearch() {
+    const selector = document.getElementById("research-context-selector");
+    const selectedId = selector.value;
+    const resultsGrid = document.getElementById("research-results-grid");
+
+    if (!selectedId) return alert("Please select a video context first!");
+
+    resultsGrid.innerHTML = `<div style="text-align:center; padding: 40px; color: #bfecac;">
+                                <i class="fas fa-spinner fa-spin" style="font-size: 2rem; margin-bottom: 10px;"></i>
+                                <p>Llama 3 is analyzing and searching Tavily...</p>
+                             </div>`;
+
+    try {
+        const transcriptText = await fetchTranscript(selectedId);
+        const response = await fetch("/api/research/agent", {
+            method: "POST",
+            headers: { "Content-Type": "application/json", "Accept": "application/x-ndjson" },
+            body: JSON.stringify({ uid: userUid, text: transcriptText, stream: true })
+        });
+
+        if (response.status === 429) {
+            const wait = response.headers.get("Retry-After") || "a few";
+            resultsGrid.innerHTML = `<p style='color: #ff4d4d; text-align: center;'>Research is busy right now. Try again in ${wait}s.</p>`;
+            return;
+        }
+        if (!response.ok) throw new Error("Backend search failed");
+
+        // NDJSON stream: re-render the ranked list every time a search finishes
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        lastResearchLinks = [];
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split("\n");
+            buffer = lines.pop(); // keep a partial line for the next read
+
+            for (const line of lines) {
+                if (!line.trim()) continue;
+                const event = JSON.parse(line);
+
+                if (event.type === "error") throw new Error(event.message);
+                if (event.type === "results" || event.type === "done") {
+                    // --- THE FIX ---
+                    lastResearchLinks = event.ranked || event.results || []; // Store them globally for toggleBookmark to refresh
+                    if (lastResearchLinks.length > 0 || event.type === "done") {
+                        renderResearchCards(lastResearchLinks); // Use the dedicated renderer
+                    }
+                }
+            }
+        }
+        
+    } catch (err) {
+        console.error("❌ Research Error:", err);
+        resultsGrid.innerHTML = "<p style='color: #ff4d4d; text-align: center;'>Failed to connect to AI Agent.</p>";
+    }
+}
+
+
+function renderResearchCards(links) {
+    const container = document.getElementById("research-results-grid");
+    if (!container) return;
+    
+    // Clear the "Select context" placeholder or previous results
+    container.innerHTML = ""; 
+
+    links.forEach((link) => {
+        // 1. Check if this specific URL exists in our loaded bookmarks
+        const isBookmarked = allBookmarks.some(b => b.url === link.url);
+        
+        // 2. Select the correct icon and class based on status
+        const iconClass = isBookmarked ? "fas fa-bookmark" : "far fa-bookmark";
+        const btnClass = isBookmarked ? "bookmark-btn active" : "bookmark-btn";
+
+        // 3. Build the card HTML
+        container.innerHTML += `
+            <div class="research-card" style="background: #1a1a1a; border: 1px solid #333; padding: 15px; border-radius: 10px; margin-bottom: 12px; position: relative;">
+                
+                <button onclick="toggleBookmark('${link.url}', '${link.title.replace(/'/g, "\\'")}')" class="${btnClass}" 
+                        style="position: absolute; top: 10px; right: 10px; background: none; border: none; color: #bfecac; cursor: pointer; font-size: 1.2rem;">
+                    <i class="${iconClass}"></i>
+                </button>
+
+                <h4 style="margin: 0 0 8px 0; color: #fff; font-size: 0.95rem; padding-right: 25px;">${link.title}</h4>
+                
+                <p style="font-size: 0.8rem; color: #888; margin-bottom: 12px;">
+                    ${link.content ? link.content.substring(0, 150) + '...' : 'Saved from previous research.'}
+                </p>
+                
+                <a href="${link.url}" target="_blank" style="color: #bfecac; font-size: 0.85rem; text-decoration: none; font-weight: bold;">
+                    Read Source →
+                </a>
+            </div>
+        `;
+    });
+}
+
+
+let allBookmarks = []; // Global state for persistence
+
+
+async function loadBookmarks(projId) {
+    console.log("⭐ [REMAP] Loading bookmarks via Python API...");
+    try {
+        const response = await fetch(`/api/${userUid}/projects/${projId}/bookmarks`);
+        if (!response.ok) throw new Error("Failed to fetch bookmarks");
+        
+        const data = await response.json();
+        allBookmarks = data.bookmarks || []; 
+        console.log(`✅ Loaded ${allBookmarks.length} bookmarks via Backend.`);
+    } catch (err) {
+        console.error("❌ Backend Bookmark Error:", err);
+    }
+}
+
+async function toggleBookmark(url, title) {
+    console.log("📌 [TOGGLE] Initiating sync with backend...");
+    try {
+        const response = await fetch(`/api/${userUid}/projects/${projectId}/bookmarks/toggle`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ url, title })
+        });
+
+        if (!response.ok) throw new Error("Toggle request failed");
+
+        // 1. Refresh the global allBookmarks array from the database
+        await loadBookmarks(projectId); 
+
+        // 2. SMART RE-RENDER: Decide what to show
+        // If the user just performed a search, keep those search results visible.
+        // If not, show the refreshed saved bookmarks list.
+        if (lastResearchLinks && lastResearchLinks.length > 0) {
+            console.log("♻️ Refreshing search results with new bookmark state...");
+            renderResearchCards(lastResearchLinks);
+        } else {
+            console.log("♻️ Refreshing saved bookmarks view...");
+            renderResearchCards(allBookmarks);
+        }
+        
+    } catch (err) {
+        console.error("❌ Toggle Error:", err);
+    }
+}
+
+function renderSavedBookmarks() {
+    const container = document.getElementById("research-results-grid");
+    if (!container) return;
+
+    // Clear the "Select context to begin" placeholder
+    container.innerHTML = ""; 
+
+    allBookmarks.forEach((link) => {
+        // Since these are from the 'bookmarks' collection, they are ALWAYS active/filled
+        const iconClass = "fas fa-bookmark"; 
+        const btnClass = "bookmark-btn active";
+
+        container.innerHTML += `
+            <div class="research-card" style="background: #1a1a1a; border: 1px solid #bfecac; padding: 15px; border-radius: 10px; margin-bottom: 12px; position: relative;">
+                <button onclick="toggleBookmark('${link.url}', '${link.title.replace(/'/g, "\\'")}')" class="${btnClass}" 
+                        style="position: absolute; top: 10px; right: 10px; background: none; border: none; color: #bfecac; cursor: pointer; font-size: 1.2rem;">
+                    <i class="${iconClass}"></i>
+                </button>
+                <h4 style="margin: 0 0 8px 0; color: #fff; font-size: 0.95rem; padding-right: 25px;">${link.title}</h4>
+                <p style="font-size: 0.8rem; color: #888; margin-bottom: 12px;">(Saved Resource)</p>
+                <a href="${link.url}" target="_blank" style="color: #bfecac; font-size: 0.85rem; text-decoration: none; font-weight: bold;">Read Source →</a>
+            </div>
+        `;
+    });
+}
+
+// CRUMBSSSS!!!
+
+
+
+// The Debouncer (prevents 100 requests per minute)
+let autoSaveTimeout;
+function handleNoteInput() {
+    clearTimeout(autoSaveTimeout);
+    // Wait 800ms after the user stops typing to trigger the save
+    autoSaveTimeout = setTimeout(triggerAutoSave, 800);
+}
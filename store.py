@@ -0,0 +1,380 @@
+import os
+import asyncio
+import secrets
+import string
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from metrics import span
+
+# --- DATA ACCESS LAYER ---
+# Every handler in main.py goes through the `store` object below instead of
+# touching firestore.client() directly. The Firestore SDK is synchronous, so each
+# call is pushed onto a bounded thread pool and awaited; that way one slow round
+# trip only holds one worker thread and the event loop keeps serving requests.
+#
+# Backends:
+#   CHERSETA_STORE=firestore (default) -> real Firestore via firebase_admin
+#   CHERSETA_STORE=memory              -> in-process dicts, for tests/local runs
+
+STORE_MAX_WORKERS = int(os.getenv("STORE_MAX_WORKERS", 32))
+
+
+class NotFound(Exception):
+    pass
+
+
+# --- Write sentinels (backend-neutral versions of firestore.SERVER_TIMESTAMP etc.) ---
+class _ServerTimestamp:
+    def __repr__(self):
+        return "SERVER_TIMESTAMP"
+
+
+SERVER_TIMESTAMP = _ServerTimestamp()
+
+
+class Increment:
+    def __init__(self, amount):
+        self.amount = amount
+
+
+class ArrayUnion:
+    def __init__(self, values):
+        self.values = list(values)
+
+
+def user_path(uid):
+    return f"users/{uid}"
+
+
+def project_path(uid, project_id):
+    return f"users/{uid}/projects/{project_id}"
+
+
+def new_id():
+    # Same shape as Firestore auto-ids (20 alphanumeric chars)
+    alphabet = string.ascii_letters + string.digits
+    return "".join(secrets.choice(alphabet) for _ in range(20))
+
+
+def _split(path):
+    collection, _, doc_id = path.rpartition("/")
+    return collection, doc_id
+
+
+# --- FIRESTORE BACKEND ---
+class FirestoreBackend:
+    def __init__(self):
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+
+        if not firebase_admin._apps:
+            cred = credentials.Certificate(os.getenv("SERVICE_ACC_KEY"))
+            firebase_admin.initialize_app(cred)
+        else:
+            firebase_admin.get_app()
+
+        self.fs = firestore
+        self.client = firestore.client()
+
+    def _convert(self, data):
+        out = {}
+        for key, value in data.items():
+            if value is SERVER_TIMESTAMP:
+                value = self.fs.SERVER_TIMESTAMP
+            elif isinstance(value, Increment):
+                value = self.fs.Increment(value.amount)
+            elif isinstance(value, ArrayUnion):
+                value = self.fs.ArrayUnion(value.values)
+            out[key] = value
+        return out
+
+    def get(self, path):
+        snap = self.client.document(path).get()
+        return snap.to_dict() if snap.exists else None
+
+    def set(self, path, data, merge=False):
+        self.client.document(path).set(self._convert(data), merge=merge)
+
+    def update(self, path, data):
+        from google.api_core.exceptions import NotFound as FsNotFound
+
+        try:
+            self.client.document(path).update(self._convert(data))
+        except FsNotFound as e:
+            raise NotFound(path) from e
+
+    def delete(self, path):
+        self.client.document(path).delete()
+
+    def stream(self, collection, order_by=None, limit=None, descending=False, after=None):
+        query = self.client.collection(collection)
+        if order_by:
+            direction = self.fs.Query.DESCENDING if descending else self.fs.Query.ASCENDING
+            query = query.order_by(order_by, direction=direction)
+            if after is not None:
+                query = query.start_after({order_by: after})
+        if limit:
+            query = query.limit(limit)
+        return [(doc.id, doc.to_dict()) for doc in query.stream()]
+
+    def commit(self, ops):
+        from google.api_core.exceptions import NotFound as FsNotFound
+
+        batch = self.client.batch()
+        for op, path, data, merge in ops:
+            ref = self.client.document(path)
+            if op == "set":
+                batch.set(ref, self._convert(data), merge=merge)
+            elif op == "update":
+                batch.update(ref, self._convert(data))
+            elif op == "delete":
+                batch.delete(ref)
+        try:
+            batch.commit()
+        except FsNotFound as e:
+            # Only an update can miss; report its path like update() does
+            missing = next((path for op, path, _, _ in ops if op == "update"), None)
+            raise NotFound(missing) from e
+
+    def transaction(self, fn):
+        transaction = self.client.transaction()
+
+        @self.fs.transactional
+        def run(transaction):
+            return fn(_FirestoreTxn(self, transaction))
+
+        return run(transaction)
+
+
+class _FirestoreTxn:
+    # What a transaction callback sees; all reads must happen before writes
+    def __init__(self, backend, transaction):
+        self.backend = backend
+        self.transaction = transaction
+
+    def get(self, path):
+        snap = self.backend.client.document(path).get(transaction=self.transaction)
+        return snap.to_dict() if snap.exists else None
+
+    def get_all(self, paths):
+        refs = [self.backend.client.document(p) for p in paths]
+        found = {snap.reference.path: snap.to_dict() for snap in self.backend.client.get_all(refs, transaction=self.transaction) if snap.exists}
+        return [found.get(p) for p in paths]
+
+    def set(self, path, data, merge=False):
+        self.transaction.set(self.backend.client.document(path), self.backend._convert(data), merge=merge)
+
+    def update(self, path, data):
+        self.transaction.update(self.backend.client.document(path), self.backend._convert(data))
+
+    def delete(self, path):
+        self.transaction.delete(self.backend.client.document(path))
+
+
+# --- IN-MEMORY BACKEND ---
+class MemoryBackend:
+    def __init__(self):
+        # collection path -> {doc_id: dict}
+        self.collections = {}
+        self.lock = threading.Lock()
+
+    def _apply(self, current, data):
+        merged = dict(current)
+        for key, value in data.items():
+            if value is SERVER_TIMESTAMP:
+                value = datetime.now(timezone.utc)
+            elif isinstance(value, Increment):
+                value = (merged.get(key) or 0) + value.amount
+            elif isinstance(value, ArrayUnion):
+                existing = list(merged.get(key) or [])
+                value = existing + [v for v in value.values if v not in existing]
+            merged[key] = value
+        return merged
+
+    def get(self, path):
+        collection, doc_id = _split(path)
+        with self.lock:
+            doc = self.collections.get(collection, {}).get(doc_id)
+            return dict(doc) if doc is not None else None
+
+    def _set(self, path, data, merge):
+        collection, doc_id = _split(path)
+        docs = self.collections.setdefault(collection, {})
+        base = docs.get(doc_id, {}) if merge else {}
+        docs[doc_id] = self._apply(base, data)
+
+    def _update(self, path, data):
+        collection, doc_id = _split(path)
+        docs = self.collections.get(collection, {})
+        if doc_id not in docs:
+            raise NotFound(path)
+        docs[doc_id] = self._apply(docs[doc_id], data)
+
+    def _delete(self, path):
+        collection, doc_id = _split(path)
+        self.collections.get(collection, {}).pop(doc_id, None)
+
+    def set(self, path, data, merge=False):
+        with self.lock:
+            self._set(path, data, merge)
+
+    def update(self, path, data):
+        with self.lock:
+            self._update(path, data)
+
+    def delete(self, path):
+        with self.lock:
+            self._delete(path)
+
+    def stream(self, collection, order_by=None, limit=None, descending=False, after=None):
+        with self.lock:
+            items = [(doc_id, dict(d)) for doc_id, d in self.collections.get(collection, {}).items()]
+        if order_by:
+            items = [item for item in items if order_by in item[1]]
+            items.sort(key=lambda item: item[1][order_by], reverse=descending)
+            if after is not None:
+                # Cursor semantics: past `after` in the sort direction
+                items = [item for item in items
+                         if (item[1][order_by] < after if descending else item[1][order_by] > after)]
+        if limit:
+            items = items[:limit]
+        return items
+
+    def commit(self, ops):
+        with self.lock:
+            # Validate first so a failing update leaves the batch unapplied
+            for op, path, _, _ in ops:
+                collection, doc_id = _split(path)
+                if op == "update" and doc_id not in self.collections.get(collection, {}):
+                    raise NotFound(path)
+            for op, path, data, merge in ops:
+                if op == "set":
+                    self._set(path, data, merge)
+                elif op == "update":
+                    self._update(path, data)
+                elif op == "delete":
+                    self._delete(path)
+
+    def transaction(self, fn):
+        # The whole callback runs under the lock, which makes it serializable
+        with self.lock:
+            return fn(_MemoryTxn(self))
+
+
+class _MemoryTxn:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get(self, path):
+        collection, doc_id = _split(path)
+        doc = self.backend.collections.get(collection, {}).get(doc_id)
+        return dict(doc) if doc is not None else None
+
+    def get_all(self, paths):
+        return [self.get(p) for p in paths]
+
+    def set(self, path, data, merge=False):
+        self.backend._set(path, data, merge)
+
+    def update(self, path, data):
+        self.backend._update(path, data)
+
+    def delete(self, path):
+        self.backend._delete(path)
+
+
+# --- ASYNC FACADE ---
+class WriteBatch:
+    def __init__(self, store):
+        self.store = store
+        self.ops = []
+
+    def set(self, path, data, merge=False):
+        self.ops.append(("set", path, data, merge))
+        return self
+
+    def update(self, path, data):
+        self.ops.append(("update", path, data, False))
+        return self
+
+    def delete(self, path):
+        self.ops.append(("delete", path, None, False))
+        return self
+
+    def __len__(self):
+        return len(self.ops)
+
+    async def commit(self):
+        if self.ops:
+            await self.store._run("commit", self.ops)
+        self.ops = []
+
+
+class Store:
+    # `backend` may be a backend or a zero-argument factory. A factory is only
+    # called on first use (on a pool thread), so importing this module doesn't
+    # pay for firebase_admin + credential loading at startup.
+    def __init__(self, backend, max_workers=STORE_MAX_WORKERS):
+        self.factory = backend if callable(backend) else None
+        self._backend = None if callable(backend) else backend
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="store")
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self.lock:
+                if self._backend is None:
+                    self._backend = self.factory()
+        return self._backend
+
+    async def warm_up(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, lambda: self.backend)
+
+    async def _run(self, method, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # Includes time queued for a pool thread, which is what the request waits for
+        async with span("firestore", method):
+            return await loop.run_in_executor(self.executor, lambda: getattr(self.backend, method)(*args, **kwargs))
+
+    async def get(self, path):
+        return await self._run("get", path)
+
+    async def set(self, path, data, merge=False):
+        await self._run("set", path, data, merge=merge)
+
+    async def update(self, path, data):
+        await self._run("update", path, data)
+
+    async def delete(self, path):
+        await self._run("delete", path)
+
+    async def add(self, collection, data):
+        doc_id = new_id()
+        await self.set(f"{collection}/{doc_id}", data)
+        return doc_id
+
+    async def stream(self, collection, order_by=None, limit=None, descending=False, after=None):
+        # `after`: only docs past this `order_by` value (a query cursor)
+        return await self._run("stream", collection, order_by=order_by, limit=limit,
+                               descending=descending, after=after)
+
+    def batch(self):
+        return WriteBatch(self)
+
+    async def transaction(self, fn):
+        # fn(txn) is a plain (sync) function: txn.get/get_all first, then txn.set/update/delete.
+        # It may be retried on contention, so it must not have side effects of its own.
+        return await self._run("transaction", fn)
+
+
+def make_backend(kind=None):
+    kind = (kind or os.getenv("CHERSETA_STORE", "firestore")).lower()
+    if kind == "memory":
+        return MemoryBackend()
+    return FirestoreBackend()
+
+
+store = Store(make_backend)
@@ -0,0 +1,226 @@
+import os
+import math
+import time
+import asyncio
+from datetime import datetime, timezone
+from cache import LRUCache, SingleFlight
+from metrics import span
+from admission import take_token
+from logs import get_logger
+from store import store
+import retrieval
+
+log = get_logger("summaries")
+
+# --- HIERARCHICAL SUMMARIES ---
+# After a video is ingested, a background task summarizes its transcript in two
+# levels: one summary per section (SUMMARY_SECTION_CHUNKS retrieval chunks) and
+# one overview of the whole video built from the section summaries. The
+# result is stored once per video in videos/{video_id}/meta/summaries, next to
+# the transcript. It is tagged with the transcript digest, so a changed
+# transcript is never paired with old summaries. Videos ingested before this
+# existed are summarized the first time they're used in a chat.
+#
+# A video with no stored summaries is remembered for SUMMARY_MISS_TTL, so a
+# busy chat doesn't re-read Firestore on every message while its build runs.
+# A failed build isn't retried on every chat either: the next attempt waits
+# SUMMARY_RETRY_SECONDS, doubling per failure up to SUMMARY_RETRY_MAX_SECONDS
+# (a new transcript starts over).
+#
+# --- CONTEXT BUILDER ---
+# Chat fills a token budget (CHAT_CONTEXT_TOKENS) instead of pasting top-k
+# chunks: an overview of every selected video first, then the best-matching
+# passages verbatim, falling back to a passage's section summary when the
+# verbatim text no longer fits, then other section summaries while budget
+# remains. Ten long videos give a request of bounded size that still covers
+# all of them. Tokens are estimated from characters (no tokenizer round trip).
+
+SUMMARY_SECTION_CHUNKS = int(os.getenv("SUMMARY_SECTION_CHUNKS", 6))
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gemini-2.5-flash-lite")
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", 4))
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", 2000))
+SUMMARY_MISS_TTL = float(os.getenv("SUMMARY_MISS_TTL", 30))
+SUMMARY_RETRY_SECONDS = float(os.getenv("SUMMARY_RETRY_SECONDS", 60))
+SUMMARY_RETRY_MAX_SECONDS = float(os.getenv("SUMMARY_RETRY_MAX_SECONDS", 3600))
+CHAT_CONTEXT_TOKENS = int(os.getenv("CHAT_CONTEXT_TOKENS", 6000))
+CHARS_PER_TOKEN = 4
+
+
+def count_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def summaries_path(video_id):
+    return f"videos/{video_id}/meta/summaries"
+
+
+class SummaryTree:
+    def __init__(self, video_id, digest, section_chunks, sections, overview):
+        self.video_id = video_id
+        self.digest = digest
+        self.section_chunks = section_chunks
+        self.sections = sections  # one summary per `section_chunks` retrieval chunks
+        self.overview = overview
+
+    def section_of(self, chunk):
+        return min(chunk // self.section_chunks, len(self.sections) - 1)
+
+    def to_dict(self):
+        return {
+            "digest": self.digest,
+            "section_chunks": self.section_chunks,
+            "sections": self.sections,
+            "overview": self.overview,
+            "created_at": datetime.now(timezone.utc),
+        }
+
+    @classmethod
+    def from_dict(cls, video_id, doc):
+        return cls(video_id, doc.get("digest"), doc.get("section_chunks") or SUMMARY_SECTION_CHUNKS,
+                   doc.get("sections") or [], doc.get("overview") or "")
+
+
+class Summarizer:
+    def __init__(self):
+        self.cache = LRUCache(maxsize=SUMMARY_CACHE_SIZE)
+        self.missing = LRUCache(maxsize=SUMMARY_CACHE_SIZE, ttl=SUMMARY_MISS_TTL)  # video ids with no stored tree
+        self.failures = LRUCache(maxsize=SUMMARY_CACHE_SIZE)  # (video_id, digest) -> (retry_at, count)
+        self.flights = SingleFlight()
+        self.slots = None  # created lazily: needs a running loop
+        self.tasks = {}
+
+    async def get(self, index):
+        # The stored tree for this index's transcript, or None
+        tree = self.cache.get(index.video_id)
+        if tree is None and not self.missing.get(index.video_id):
+            tree = await self.flights.do(("load", index.video_id), lambda: self._load(index.video_id))
+        return tree if tree is not None and tree.digest == index.digest else None
+
+    def ensure(self, index, client):
+        # Fire-and-forget build (ingest, or first chat on an older video)
+        if client is None or not index.chunks or index.video_id in self.tasks:
+            return
+        key = (index.video_id, index.digest)
+        retry_at, failures = self.failures.get(key, (0, 0))
+        if time.monotonic() < retry_at:
+            return
+
+        async def guarded():
+            try:
+                if await self.get(index) is None:
+                    await self.build(index, client)
+                self.failures.pop(key)
+            except Exception as e:
+                delay = min(SUMMARY_RETRY_MAX_SECONDS, SUMMARY_RETRY_SECONDS * 2 ** failures)
+                self.failures.set(key, (time.monotonic() + delay, failures + 1))
+                log.warning("⚠️ [SUMMARY] Could not summarize video", video_id=index.video_id,
+                            error=str(e), retry_in=delay)
+            finally:
+                self.tasks.pop(index.video_id, None)
+
+        self.tasks[index.video_id] = asyncio.create_task(guarded())
+
+    async def build(self, index, client):
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+        step = SUMMARY_SECTION_CHUNKS
+        sections = [" ".join(index.chunks[i:i + step]) for i in range(0, len(index.chunks), step)]
+
+        async def one(text):
+            async with self.slots:
+                return await _summarize(client, SECTION_PROMPT, text)
+
+        section_summaries = await asyncio.gather(*[one(text) for text in sections])
+        async with self.slots:
+            overview = await _summarize(client, OVERVIEW_PROMPT, "\n\n".join(
+                f"Section {n + 1}: {s}" for n, s in enumerate(section_summaries)))
+
+        tree = SummaryTree(index.video_id, index.digest, step, list(section_summaries), overview)
+        await store.set(summaries_path(index.video_id), tree.to_dict())
+        self.cache.set(index.video_id, tree)
+        self.missing.pop(index.video_id)
+        log.info("🧾 [SUMMARY] Video summarized", video_id=index.video_id, sections=len(sections))
+        return tree
+
+    async def _load(self, video_id):
+        doc = await store.get(summaries_path(video_id))
+        if doc is None:
+            self.missing.set(video_id, True)
+            return None
+        tree = SummaryTree.from_dict(video_id, doc)
+        self.cache.set(video_id, tree)
+        return tree
+
+
+SECTION_PROMPT = (
+    "Summarize this part of a lecture transcript for a student's study notes. "
+    "Keep definitions, key claims, formulas, examples and names. "
+    "Reply with the summary only, at most 120 words."
+)
+OVERVIEW_PROMPT = (
+    "These are summaries of consecutive sections of one lecture video. "
+    "Write an overview of the whole video: its topic, main ideas in order and "
+    "key takeaways. Reply with the overview only, at most 200 words."
+)
+
+
+async def _summarize(client, instructions, text):
+    await take_token("gemini")
+    async with span("gemini", "summarize"):
+        response = await client.aio.models.generate_content(model=SUMMARY_MODEL, contents=f"{instructions}\n\n{text}")
+    return (response.text or "").strip()
+
+
+def build_context(entries, hits, budget=CHAT_CONTEXT_TOKENS):
+    # entries: [(source, index, tree or None)]; hits: ranked retrieval hits.
+    # Returns (context text, the hits it drew on).
+    blocks, used = [], 0
+
+    def add(text):
+        nonlocal used
+        cost = count_tokens(text) + 1
+        if used + cost > budget:
+            return False
+        blocks.append(text)
+        used += cost
+        return True
+
+    titles = {index.video_id: source.get("title") or index.video_id for source, index, _ in entries}
+    trees = {index.video_id: tree for _, index, tree in entries if tree is not None}
+    sections_added = set()
+
+    def add_section(video_id, n):
+        if (video_id, n) in sections_added:
+            return True
+        if add(f"[{titles[video_id]} · section {n + 1} summary]\n{trees[video_id].sections[n]}"):
+            sections_added.add((video_id, n))
+            return True
+        return False
+
+    # 1. Every selected video's overview, best-matching videos first
+    rank = {}
+    for n, hit in enumerate(hits):
+        rank.setdefault(hit["source_id"], n)
+    for video_id in sorted(trees, key=lambda v: rank.get(v, len(hits))):
+        if trees[video_id].overview:
+            add(f"[{titles[video_id]} · overview]\n{trees[video_id].overview}")
+
+    # 2. Best passages verbatim, or their section summary if that's all that fits
+    drawn = []
+    for hit in hits:
+        tree = trees.get(hit["source_id"])
+        if add(retrieval.format_context([hit])):
+            drawn.append(hit)
+        elif tree is not None and tree.sections and add_section(hit["source_id"], tree.section_of(hit["chunk"])):
+            drawn.append(hit)
+
+    # 3. Remaining budget: more section summaries, round-robin across videos
+    for n in range(max((len(t.sections) for t in trees.values()), default=0)):
+        for video_id, tree in trees.items():
+            if n < len(tree.sections) and not add_section(video_id, n):
+                return "\n\n".join(blocks), drawn
+
+    return "\n\n".join(blocks), drawn
+
+
+summarizer = Summarizer()
@@ -0,0 +1,157 @@
+import sys
+import zlib
+import struct
+import bisect
+from array import array
+
+# --- COMPACT TIMESTAMPED TRANSCRIPTS ---
+# A transcript is kept column-wise instead of as one joined string without
+# timings:
+#   text       all segments joined by single spaces, so `.text` is exactly the
+#              transcript string the rest of the app (retrieval, chat) uses
+#   offsets    where each segment starts in `text` (characters)
+#   starts     segment start times, milliseconds
+#   durations  segment durations, milliseconds
+# encode() packs the three arrays (delta-encoded, uint32) and the UTF-8 text
+# into one zlib-compressed blob. decode() unpacks the arrays straight into
+# `array`s; segment dicts are only built for the window or time range asked
+# for.
+#
+# Transcripts stored before timings were kept (plain text) load as a single
+# untimed segment (`timed` is False).
+
+MAGIC = b"CTS1"
+HEADER = struct.Struct("<4sI?")  # magic, segment count, timed
+
+
+def _snippet_fields(snippet):
+    # youtube_transcript_api snippets have attributes; dicts are accepted too
+    if isinstance(snippet, dict):
+        return snippet.get("text", ""), snippet.get("start", 0), snippet.get("duration", 0)
+    return snippet.text, snippet.start, snippet.duration
+
+
+def _pack(values):
+    column = array("I", values)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column.tobytes()
+
+
+def _unpack(data, offset, count):
+    column = array("I")
+    column.frombytes(data[offset:offset + 4 * count])
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column, offset + 4 * count
+
+
+def _deltas(values):
+    return [b - a for a, b in zip([0] + list(values), values)]
+
+
+def _running(deltas):
+    total, out = 0, array("I")
+    for d in deltas:
+        total += d
+        out.append(total)
+    return out
+
+
+class Transcript:
+    def __init__(self, text, offsets, starts=None, durations=None):
+        self.text = text
+        self.offsets = offsets
+        self.starts = starts
+        self.durations = durations
+        self._word_starts = None
+
+    @classmethod
+    def from_snippets(cls, snippets):
+        parts, offsets, starts, durations, length = [], array("I"), array("I"), array("I"), 0
+        for snippet in snippets:
+            text, start, duration = _snippet_fields(snippet)
+            text = " ".join((text or "").split())
+            if not text:
+                continue
+            offsets.append(length)
+            # Kept non-decreasing so the column can be delta-encoded and bisected
+            starts.append(max(starts[-1] if starts else 0, round(start * 1000)))
+            durations.append(max(0, round(duration * 1000)))
+            parts.append(text)
+            length += len(text) + 1
+        return cls(" ".join(parts), offsets, starts, durations)
+
+    @classmethod
+    def from_text(cls, text):
+        return cls(text or "", array("I", [0] if text else []))
+
+    @property
+    def timed(self):
+        return self.starts is not None
+
+    def __len__(self):
+        return len(self.offsets)
+
+    # --- Lookups ---
+    def segment(self, i):
+        end = self.offsets[i + 1] - 1 if i + 1 < len(self.offsets) else len(self.text)
+        segment = {"i": i, "text": self.text[self.offsets[i]:end]}
+        if self.timed:
+            segment["start"] = self.starts[i] / 1000
+            segment["duration"] = self.durations[i] / 1000
+        return segment
+
+    def window(self, offset=0, limit=50):
+        offset = max(0, offset)
+        return [self.segment(i) for i in range(offset, min(len(self), offset + max(0, limit)))]
+
+    def between(self, start, end, limit=500):
+        # Segments overlapping [start, end) seconds
+        if not self.timed or not len(self):
+            return []
+        start_ms, end_ms = start * 1000, end * 1000
+        i = max(0, bisect.bisect_right(self.starts, start_ms) - 1)
+        if self.starts[i] + self.durations[i] <= start_ms:
+            i += 1
+        out = []
+        while i < len(self) and self.starts[i] < end_ms and len(out) < limit:
+            out.append(self.segment(i))
+            i += 1
+        return out
+
+    def time_at_word(self, word):
+        # Start time (seconds) of the segment holding the n-th whitespace word
+        if not self.timed or not len(self):
+            return None
+        if self._word_starts is None:
+            counts, total = array("I"), 0
+            for i in range(len(self)):
+                counts.append(total)
+                total += len(self.segment(i)["text"].split())
+            self._word_starts = counts
+        i = max(0, bisect.bisect_right(self._word_starts, word) - 1)
+        return self.starts[i] / 1000
+
+    # --- Codec ---
+    def encode(self):
+        body = [HEADER.pack(MAGIC, len(self), self.timed), _pack(_deltas(self.offsets))]
+        if self.timed:
+            body += [_pack(_deltas(self.starts)), _pack(self.durations)]
+        body.append(self.text.encode("utf-8"))
+        return zlib.compress(b"".join(body), 6)
+
+    @classmethod
+    def decode(cls, blob):
+        data = zlib.decompress(blob)
+        magic, count, timed = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not a compact transcript")
+        offset = HEADER.size
+        offsets, offset = _unpack(data, offset, count)
+        starts = durations = None
+        if timed:
+            starts, offset = _unpack(data, offset, count)
+            durations, offset = _unpack(data, offset, count)
+            starts = _running(starts)
+        return cls(data[offset:].decode("utf-8"), _running(offsets), starts, durations)
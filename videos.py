@@ -0,0 +1,239 @@
+import os
+import re
+import asyncio
+from datetime import datetime
+from cache import LRUCache, SingleFlight
+from metrics import span
+from admission import take_token
+from logs import get_logger
+from store import store
+from transcripts import Transcript
+
+log = get_logger("videos")
+
+# --- VIDEO METADATA + TRANSCRIPT CACHE ---
+# Content-addressed by YouTube video_id, so the same lecture added to many
+# projects (or by many users) is only fetched from YouTube once.
+#   1. in-process LRU (bounded)
+#   2. persistent copy in the `videos/{video_id}` document; the transcript body
+#      (compact, timestamped and compressed, see transcripts.py) is split across
+#      `videos/{video_id}/chunks/{n}` docs so long videos stay under
+#      Firestore's 1 MiB document limit
+#   3. upstream fetch (yt-dlp / transcript API), one per id at a time
+
+VIDEO_TITLE_CACHE_SIZE = int(os.getenv("VIDEO_TITLE_CACHE_SIZE", 4096))
+VIDEO_TRANSCRIPT_CACHE_CHARS = int(os.getenv("VIDEO_TRANSCRIPT_CACHE_CHARS", 20_000_000))
+# Compressed bytes per chunk doc; leaves room under the 1 MiB document limit
+TRANSCRIPT_CHUNK_BYTES = int(os.getenv("TRANSCRIPT_CHUNK_BYTES", 900_000))
+TRANSCRIPT_FORMAT = "cts1"
+
+# Upper bound on concurrent upstream YouTube calls across the whole process
+YOUTUBE_MAX_CONCURRENCY = int(os.getenv("YOUTUBE_MAX_CONCURRENCY", 8))
+PLAYLIST_MAX_VIDEOS = int(os.getenv("PLAYLIST_MAX_VIDEOS", 200))
+
+UNTITLED = "Untitled Video"
+
+VIDEO_ID_RE = re.compile(r"(?:[?&]v=|youtu\.be/|/shorts/|/embed/|/live/|/v/)([0-9A-Za-z_-]{11})")
+COLLECTION_RE = re.compile(r"[?&]list=|/playlist\b|/@|/channel/|/c/|/user/")
+CHANNEL_TABS = ("/videos", "/streams", "/shorts", "/playlists")
+
+_youtube_slots = asyncio.Semaphore(YOUTUBE_MAX_CONCURRENCY)
+
+title_cache = LRUCache(maxsize=VIDEO_TITLE_CACHE_SIZE)
+transcript_cache = LRUCache(maxsize=VIDEO_TRANSCRIPT_CACHE_CHARS, sizeof=lambda t: len(t.text))
+_flights = SingleFlight()
+
+
+def video_path(video_id):
+    return f"videos/{video_id}"
+
+
+def warm_up():
+    # Called off the event loop after startup so the first ingest doesn't pay
+    # for importing yt_dlp / youtube_transcript_api
+    import yt_dlp  # noqa: F401
+    import youtube_transcript_api  # noqa: F401
+
+
+def parse_video_id(url):
+    match = VIDEO_ID_RE.search(url or "")
+    if match:
+        return match.group(1)
+    # The original, looser pattern (any 11-char id after "/" or "v=")
+    match = re.search(r"(?:v=|\/)([0-9A-Za-z_-]{11}).*", url or "")
+    return match.group(1) if match else None
+
+
+def is_collection_url(url):
+    # Playlists and channels expand into many videos
+    return bool(COLLECTION_RE.search(url or ""))
+
+
+def expand_collection(url):
+    # Flat extraction: lists the entries without resolving each video
+    if re.search(r"/@|/channel/|/c/|/user/", url) and not url.rstrip("/").endswith(CHANNEL_TABS):
+        url = url.rstrip("/") + "/videos"
+
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'extract_flat': 'in_playlist',
+        'playlistend': PLAYLIST_MAX_VIDEOS,
+    }
+    import yt_dlp  # heavy; imported on first use (see warm_up)
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+
+    videos = []
+    for entry in (info.get("entries") or [])[:PLAYLIST_MAX_VIDEOS]:
+        video_id = entry.get("id")
+        if video_id and len(video_id) == 11:
+            videos.append({
+                "id": video_id,
+                "url": f"https://www.youtube.com/watch?v={video_id}",
+                "title": entry.get("title")
+            })
+    return videos
+
+
+def remember_title(video_id, title):
+    # Titles that came for free (e.g. from a playlist listing)
+    if title and title_cache.get(video_id) is None:
+        title_cache.set(video_id, title)
+
+
+def get_video_title(url):
+    log.debug("🍞 [BREADCRUMB 1] Entering get_video_title", url=url)
+
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'extract_flat': True, # Only fetch metadata, don't process video
+    }
+
+    try:
+        import yt_dlp
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            log.debug("🍞 [BREADCRUMB 2] yt_dlp is now fetching metadata...")
+            info = ydl.extract_info(url, download=False)
+            title = info.get('title', UNTITLED)
+            log.debug("🍞 [BREADCRUMB 3] Success! Found title", title=title)
+            return title
+    except Exception as e:
+        log.warning("🍞 [BREADCRUMB ERROR] Title fetch failed", url=url, error=str(e))
+        return UNTITLED
+
+
+def fetch_transcript(video_id):
+    from youtube_transcript_api import YouTubeTranscriptApi
+    ytt_api = YouTubeTranscriptApi()
+    fetched_transcript = ytt_api.fetch(video_id)
+    # Keeps each snippet's start/duration (transcripts.py)
+    return Transcript.from_snippets(fetched_transcript)
+
+
+async def get_title(video_id, url):
+    title = title_cache.get(video_id)
+    if title is not None:
+        return title
+    return await _flights.do(("title", video_id), lambda: _load_title(video_id, url))
+
+
+async def get_transcript(video_id):
+    # Plain text, as used by retrieval and chat
+    return (await get_timeline(video_id)).text
+
+
+async def get_timeline(video_id):
+    transcript = transcript_cache.get(video_id)
+    if transcript is not None:
+        return transcript
+    return await _flights.do(("transcript", video_id), lambda: _load_transcript(video_id))
+
+
+def cached_timeline(video_id):
+    # No I/O: only what's already in memory
+    return transcript_cache.get(video_id)
+
+
+async def _load_title(video_id, url):
+    doc = await store.get(video_path(video_id))
+    if doc and doc.get("title"):
+        title_cache.set(video_id, doc["title"])
+        return doc["title"]
+
+    await take_token("youtube")
+    async with _youtube_slots:
+        async with span("yt_dlp", "title"):
+            title = await asyncio.to_thread(get_video_title, url)
+    # Failed lookups fall back to a placeholder; don't pin that in the cache
+    if title != UNTITLED:
+        await store.set(video_path(video_id), {"title": title, "url": url}, merge=True)
+        title_cache.set(video_id, title)
+    return title
+
+
+async def get_source_transcript(source):
+    # Older projects still carry the transcript inline in their `sources` array
+    if source.get("transcript"):
+        return source["transcript"]
+    return await get_transcript(source.get("id") or source.get("video_id"))
+
+
+async def get_source_timeline(source):
+    if source.get("transcript"):
+        return Transcript.from_text(source["transcript"])
+    return await get_timeline(source.get("id") or source.get("video_id"))
+
+
+async def _load_transcript(video_id):
+    doc = await store.get(video_path(video_id))
+    transcript = await _read_stored_transcript(video_id, doc) if doc else None
+    if transcript is not None:
+        transcript_cache.set(video_id, transcript)
+        return transcript
+
+    log.debug("🍞 [BREADCRUMB] Cache miss, fetching transcript", video_id=video_id)
+    await take_token("youtube")
+    async with _youtube_slots:
+        async with span("youtube_transcript", "fetch"):
+            transcript = await asyncio.to_thread(fetch_transcript, video_id)
+    await _save_transcript(video_id, transcript)
+    transcript_cache.set(video_id, transcript)
+    return transcript
+
+
+async def _read_stored_transcript(video_id, doc):
+    if doc.get("transcript"):
+        return Transcript.from_text(doc["transcript"])
+    if not doc.get("chunks"):
+        return None
+
+    parts = await asyncio.gather(*[
+        store.get(f"{video_path(video_id)}/chunks/{n}") for n in range(doc["chunks"])
+    ])
+    if any(part is None for part in parts):
+        return None
+    if doc.get("format") == TRANSCRIPT_FORMAT:
+        return await asyncio.to_thread(Transcript.decode, b"".join(part["data"] for part in parts))
+    # Stored before timings were kept: plain text chunks
+    return Transcript.from_text("".join(part["text"] for part in parts))
+
+
+async def _save_transcript(video_id, transcript):
+    blob = await asyncio.to_thread(transcript.encode)
+    parts = [blob[i:i + TRANSCRIPT_CHUNK_BYTES] for i in range(0, len(blob), TRANSCRIPT_CHUNK_BYTES)]
+
+    # Chunks and the header that points at them land in one atomic batch
+    batch = store.batch()
+    for n, part in enumerate(parts):
+        batch.set(f"{video_path(video_id)}/chunks/{n}", {"n": n, "data": part})
+    batch.set(video_path(video_id), {
+        "format": TRANSCRIPT_FORMAT,
+        "size": len(transcript.text),
+        "segments": len(transcript),
+        "timed": transcript.timed,
+        "chunks": len(parts),
+        "fetched_at": datetime.now().isoformat()
+    }, merge=True)
+    await batch.commit()